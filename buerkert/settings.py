@@ -29,6 +29,8 @@ ALLOWED_HOSTS = ['*']
 # Application definition
 
 INSTALLED_APPS = [
+    # asgi runserver, serves the websockets of the live view
+    'daphne',
     'buerkert_app.apps.BuerkertAppConfig',
     'django.contrib.admin',
     'django.contrib.auth',
@@ -77,6 +79,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'buerkert.wsgi.application'
+ASGI_APPLICATION = 'buerkert.asgi.application'
 
 X_FRAME_OPTIONS = 'SAMEORIGIN'
 
@@ -150,6 +153,62 @@ SPS_CONF = "res/last_sps_conf.json"
 
 COLLECTOR_CONF = "res/collector_conf.json"
 
+# schedule changes and stop requests for the running collector
+COLLECTOR_CONTROL = "res/collector_control.json"
+
+# seconds to wait for the collector to write its remaining points after a stop request, before it is killed
+COLLECTOR_STOP_TIMEOUT = 10
+
+# acquisition of the collector, "poll" reads every value each cycle, "subscription" gets only changed values
+# from the OPC-UA server, publishing and sampling interval in milliseconds, precision of the written timestamps.
+# with compression only values which changed more than the deadband of their sps port are written, but every sps port
+# at least once per heartbeat in seconds
+COLLECTOR_ACQUISITION = {"mode": "poll", "publishing_interval": 1000, "sampling_interval": 100, "precision": "ms",
+                         "compression": True, "heartbeat": 60}
+
+# latest values of the running collector, read by the live view instead of the OPC-UA server
+COLLECTOR_SNAPSHOT = "res/collector_snapshot.json"
+
+# default interval between two samples of the collector in milliseconds, can be set per batch
+COLLECTOR_SAMPLE_INTERVAL = 1000
+
+# the collector serves its runtime metrics in prometheus format on this port of the docker host
+COLLECTOR_METRICS_PORT = 9101
+COLLECTOR_METRICS_URL = f"http://10.154.4.38:{COLLECTOR_METRICS_PORT}/metrics"
+
+# seconds the sps ports found on the OPC-UA server are cached for the start page, they are scanned again in the
+# background afterwards
+SPS_SCAN_TTL = 300
+
+# one background poller reads the live values for all clients every LIVE_POLL_INTERVAL seconds, it stops after
+# LIVE_POLL_IDLE_TIMEOUT seconds without a client
+LIVE_POLL_INTERVAL = 2
+LIVE_POLL_IDLE_TIMEOUT = 60
+
+# the web app shares one InfluxDB client per process, timeout of a request in milliseconds, maximal number of
+# pooled connections and duration in seconds from which a query is logged as slow
+INFLUX_TIMEOUT = 10_000
+INFLUX_POOL_SIZE = 10
+INFLUX_SLOW_QUERY = 2
+
+# query results of the batch view are cached up to BATCH_CACHE_SIZE bytes, the least recently used are removed first.
+# results of ended batches never change and don´t expire, results of a running batch expire after BATCH_CACHE_TTL
+# seconds
+BATCH_CACHE_SIZE = 256 * 1024 * 1024
+BATCH_CACHE_TTL = 30
+
+# maximal number of points per trace, when zoomed into the batch chart the resolution is chosen to stay below
+BATCH_POINT_BUDGET = 2000
+# with LTTB downsampling the min/max envelope is queried with this many times the point budget and reduced after
+BATCH_LTTB_OVERSAMPLING = 4
+
+# a background task writes mean, min, max and count of every ROLLUP_RESOLUTIONS window of the batches into the buckets
+# "<bucket>_<resolution>" every ROLLUP_INTERVAL seconds, coarse views of rolled up batches are read from them.
+# one run reads at most ROLLUP_CHUNK hours of raw data per batch, less after runs which failed, e.g. by INFLUX_TIMEOUT
+ROLLUP_RESOLUTIONS = ["10s", "1m", "10m", "1h"]
+ROLLUP_INTERVAL = 60
+ROLLUP_CHUNK = 24
+
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
 F_SCHEMA_PATH = "buerkert_app/static/buerkert_app/img/buerkert_funktionsschema.jpg"
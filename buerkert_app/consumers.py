@@ -0,0 +1,80 @@
+import asyncio
+import json
+import math
+
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from buerkert_app.templatetags.tag_utils import resolve_unit
+from buerkert_app.utils.live_poller import live_poller
+from buerkert_app.utils.utils import idents_to_ios, ios_to_displays
+
+
+def snapshot_to_rows(snapshot):
+    """
+    :param snapshot: Snapshot of the LivePoller.
+    :return: List of dictionaries with 'sps_port', 'display', 'unit_display', 'unit' and 'value' of every configured
+        sps port, sorted like the live table.
+    """
+    rows = []
+    for display in sorted(ios_to_displays(idents_to_ios(snapshot['values'])), key=lambda x: x['sps_port']):
+        try:
+            unit = resolve_unit(display.get('unit'))
+        except (AttributeError, TypeError):
+            unit = {"display": "", "unit": ""}
+        value = display['value']
+        if isinstance(value, float) and not math.isfinite(value):
+            # not valid in json
+            value = None
+        rows.append({"sps_port": display['sps_port'], "display": display.get('display'),
+                     "unit_display": unit['display'], "unit": unit['unit'], "value": value})
+    return rows
+
+
+class LiveConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Pushes the live values to the browser. After connecting the client gets the whole table once, then only the
+    values which changed since the last message, e.g. {"values": {"I-1": 1.5}, "time": "..."}.
+    """
+    # seconds between two checks for a new snapshot, a check doesn´t read anything from the PLC
+    check_interval = 0.2
+
+    async def connect(self):
+        await self.accept()
+        self.task = asyncio.create_task(self.push())
+
+    async def disconnect(self, code):
+        if task := getattr(self, "task", None):
+            task.cancel()
+
+    async def push(self):
+        # waits for the first snapshot if the poller was idle
+        snapshot = await live_poller.aget_snapshot()
+        last_time = None
+        last_values = {}
+        last_ports = None
+        last_messages = None
+        while True:
+            if snapshot['time'] != last_time:
+                last_time = snapshot['time']
+                rows = snapshot_to_rows(snapshot)
+                message = {"time": snapshot['time']}
+                if (ports := [row['sps_port'] for row in rows]) != last_ports:
+                    # new or changed configuration, render the whole table
+                    message["rows"] = rows
+                    last_ports = ports
+                else:
+                    message["values"] = {row['sps_port']: row['value'] for row in rows
+                                         if last_values.get(row['sps_port']) != row['value']}
+                if (messages := [str(m) for m in snapshot['messages']]) != last_messages:
+                    message["messages"] = last_messages = messages
+                last_values = {row['sps_port']: row['value'] for row in rows}
+                if "rows" in message or "messages" in message or message["values"]:
+                    await self.send_json(message)
+            await asyncio.sleep(self.check_interval)
+            # keeps the poller running as long as a client is connected
+            snapshot = live_poller.get_snapshot(wait=0)
+
+    @classmethod
+    async def encode_json(cls, content):
+        # datetimes and other values of the OPC-UA server as strings
+        return json.dumps(content, default=str, separators=(",", ":"))
@@ -1,23 +1,50 @@
-from math import ceil as up
+import json
 
 import dash_bootstrap_components as dbc
+import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-from dash import dcc, html, Input, Output, dash_table, State
+from dash import dcc, html, Input, Output, dash_table, State, no_update
+from django.utils import timezone
 from django_plotly_dash import DjangoDash
-from influxdb_client import InfluxDBClient
 from influxdb_client.client.exceptions import InfluxDBError
 
-from buerkert.settings import DATABASES
+from buerkert.settings import DATABASES, BATCH_POINT_BUDGET, BATCH_LTTB_OVERSAMPLING
+from buerkert_app.models import Batch
+from buerkert_app.utils.downsampling import lttb
+from buerkert_app.utils.influx import influx
+from buerkert_app.utils.query_cache import batch_cache
+from buerkert_app.utils.rollups import is_rolled_up, rollup_for, rollup_bucket
+from buerkert_app.utils.table_query import filter_frame, sort_frame, table_page
 from res.units import Units
 
 RESOLUTION_RANGE = ['1s', '10s', '30s', '1m', '10m', '30m', '1h']
+# resolutions of a zoomed chart in seconds, few steps so zooming nearby windows hits the query cache
+ZOOM_RESOLUTIONS = [(0.1, '100ms'), (1, '1s'), (2, '2s'), (5, '5s'), (10, '10s'), (30, '30s'), (60, '1m'),
+                    (120, '2m'), (300, '5m'), (600, '10m'), (1800, '30m'), (3600, '1h'), (7200, '2h'),
+                    (21600, '6h'), (86400, '1d')]
+# downsampling modes of the chart, means flatten short spikes, the min/max envelope and LTTB keep them
+DOWNSAMPLING = {"mean": "Mittelwert", "minmax": "Min/Max", "lttb": "LTTB"}
+# columns of the query results, the others aren´t transferred
+COLUMNS = ["_time", "_value", "_field", "sensor_id", "display"]
+# columns of the table, only the rows of the current page are sent to the browser
+TABLE_COLUMNS = [{"name": "Sensor-ID", "id": "sensor_id"}, {"name": "Sensor-Name", "id": "display"},
+                 {"name": "Einheit", "id": "unit"}, {"name": "Zeitstempel", "id": "_time"},
+                 {"name": "Wert", "id": "_value", "type": "numeric"}]
 
 
 class BatchDash:
     def __init__(self, name, request, batch_id):
         self.request = request
         self.batch_id = batch_id
+        batch = Batch.objects.filter(batch_id=str(batch_id)).first()
+        # data of an ended batch never changes, its query results are cached without expiry
+        self.ended = bool(batch and batch.status in (Batch.FINISHED, Batch.STOPPED))
+        # coarse windows of a rolled up batch are read from the rollup buckets
+        self.rolled_up = bool(batch and is_rolled_up(batch))
+        # length of the batch in seconds, None without a catalog entry
+        self.duration = (min(batch.end or timezone.now(), timezone.now()) - batch.start).total_seconds() \
+            if batch else None
         check_col = "_field"
         x = "_time"
         y = "_value"
@@ -26,40 +53,48 @@ class BatchDash:
         if not (size := self.get_influx_size()):
             raise InfluxDBError(message=f"Keine Daten mit der Batch-ID {self.batch_id} gefunden")
         slider_value = min(((len(RESOLUTION_RANGE) - 1), int(size / 7500)))
-        df = self.get_influx_df(RESOLUTION_RANGE[slider_value])
-        tb = df.copy()
-        tb["unit"] = tb.apply(lambda row: getattr(Units, row['_field']).choice()[1], axis=1)
+        # fields and sensors of the batch, the values are only queried for the selection
+        series = self.get_influx_series()
+        fields = list(series[check_col].unique())
+        sensors = series.drop_duplicates("sensor_id").sort_values("sensor_id")
+        table_resolution = RESOLUTION_RANGE[slider_value]
 
         app = DjangoDash(name, external_stylesheets=[dbc.themes.BOOTSTRAP])  # replaces dash.Dash
         app.css.append_css({"external_url": "/static/buerkert_app/css/main.css"})
         page_size = 100
+        rows, page_count = table_page(self.get_table_df(table_resolution, fields[:1]), 0, page_size)
 
         app.layout = html.Div([
             dcc.Checklist(
                 id="checklist",
-                options=units_resolve(df[check_col].unique()),
-                value=df[check_col].unique()[:1],
+                options=units_resolve(fields),
+                value=fields[:1],
                 inline=True,
                 labelStyle={"margin": "10px"}
             ),
+            dcc.Dropdown(options={row.sensor_id: f"{row.display} ({row.sensor_id})" for row in sensors.itertuples()},
+                         value=[], id="sensors", multi=True, placeholder="Alle Sensoren", className="px-3"),
             html.Div([
                 html.Div("Auflösung", className="px-3"),
                 dcc.Slider(marks={idx: value for idx, value in enumerate(RESOLUTION_RANGE)},
                            id='resolution-slider', min=0, max=len(RESOLUTION_RANGE) - 1, step=1, value=slider_value, ),
+                html.Div("Verdichtung", className="px-3"),
+                dcc.RadioItems(options=DOWNSAMPLING, value="mean", id="downsampling", inline=True,
+                               labelStyle={"margin": "10px"}),
             ]),
             dbc.Spinner(dcc.Graph(id="graph"), fullscreen=True, color="success"),
+            # zoomed time window of the chart, None for the whole batch
+            dcc.Store(id="x-window"),
             html.Div([dbc.Button("Zeige Tabelle", id="collapse_table", className="me-md-2", n_clicks=0),
-                      dbc.Button("Export Tabelle", id="export_table", className="me-md-2")],
+                      dbc.Button("Export Tabelle", id="export_table", className="me-md-2"),
+                      dcc.Download(id="download_table")],
                      className="d-grid gap-2 d-md-flex justify-content-md-end mb-2 pt-2"),
-            dbc.Collapse([dash_table.DataTable(tb.to_dict('records'), id='batch_table', filter_action='native',
-                                               export_format='xlsx',
-                                               page_size=page_size,
-                                               columns=[{"name": "Sensor-ID", "id": "sensor_id"},
-                                                        {"name": "Sensor-Name", "id": "display"},
-                                                        {"name": "Einheit", "id": "unit"},
-                                                        {"name": "Zeitstempel", "id": "_time"},
-                                                        {"name": "Wert", "id": "_value"}]),
-                          dbc.Pagination(id="pagination", max_value=up(tb.shape[0] / page_size),
+            # paged, filtered and sorted by the server
+            dbc.Collapse([dash_table.DataTable(rows, id='batch_table', columns=TABLE_COLUMNS,
+                                               page_action='custom', page_current=0, page_size=page_size,
+                                               page_count=page_count, filter_action='custom', filter_query='',
+                                               sort_action='custom', sort_mode='multi', sort_by=[]),
+                          dbc.Pagination(id="pagination", max_value=page_count,
                                          first_last=True, previous_next=True, fully_expanded=False,
                                          className="justify-content-center mt-2"),
                           ],
@@ -67,36 +102,73 @@ class BatchDash:
                          )
         ])
 
-        app.clientside_callback(
-            """
-            function(n_clicks) {
-                if (n_clicks > 0)
-                    document.querySelector("#batch_table button.export").click()
-                return ""
-            }
-            """,
-            Output("export_table", "data-dummy"),
-            [Input("export_table", "n_clicks")]
-        )
+        @app.callback(
+            Output("download_table", "data"),
+            Input("export_table", "n_clicks"),
+            [State("checklist", "value"),
+             State("sensors", "value"),
+             State("batch_table", "filter_query"),
+             State("batch_table", "sort_by")],
+            prevent_initial_call=True)
+        def export_table(n_clicks, values, sensors, filter_query, sort_by):
+            # all filtered rows, not only the page in the browser
+            data = sort_frame(filter_frame(self.get_table_df(table_resolution, values, sensors), filter_query), sort_by)
+            data = data[[column["id"] for column in TABLE_COLUMNS]].rename(
+                columns={column["id"]: column["name"] for column in TABLE_COLUMNS})
+            return dcc.send_data_frame(data.to_csv, f"batch_{self.batch_id}.csv", sep=";", decimal=",", index=False)
 
         @app.callback(
             Output("batch_table", "page_current"),
             [Input("pagination", "active_page")],
         )
         def change_page(page):
-            return page - 1 if page else 1
+            return page - 1 if page else 0
+
+        @app.callback(
+            Output("x-window", "data"),
+            Input("graph", "relayoutData"))
+        def update_window(relayout):
+            # only a change of the x-axis queries again, None after a double click shows the whole batch
+            window = zoom_window(relayout)
+            return no_update if window is False else window
+
+        @app.callback(
+            Output("resolution-slider", "disabled"),
+            Input("downsampling", "value"))
+        def toggle_slider(downsampling):
+            # lttb sizes the resolution by the point budget, without catalog entry it falls back to the slider
+            return downsampling == "lttb" and bool(self.duration)
 
         @app.callback(
             Output("graph", "figure"),
             [Input("checklist", "value"),
-             Input("resolution-slider", "value")])
-        def update_line_chart(values, resolution):
-            df = self.get_influx_df(RESOLUTION_RANGE[resolution])
+             Input("sensors", "value"),
+             Input("resolution-slider", "value"),
+             Input("x-window", "data"),
+             Input("downsampling", "value")])
+        def update_line_chart(values, sensors, resolution, window, downsampling):
             fig = go.Figure()
+            if not values:
+                return fig
+            # lttb selects from the finer min/max envelope
+            budget = BATCH_POINT_BUDGET * BATCH_LTTB_OVERSAMPLING if downsampling == "lttb" else BATCH_POINT_BUDGET
+            mode = "mean" if downsampling == "mean" else "minmax"
+            if window:
+                # only the visible time window, as fine as the point budget allows
+                seconds = (pd.Timestamp(window[1]) - pd.Timestamp(window[0])).total_seconds()
+                df = self.get_influx_df(zoom_resolution(seconds, budget), values, sensors, window, mode)
+            elif downsampling == "lttb" and self.duration:
+                # the whole batch with the same oversampled budget as a window, lttb ignores the slider
+                df = self.get_influx_df(zoom_resolution(self.duration, budget), values, sensors, mode=mode)
+            else:
+                df = self.get_influx_df(RESOLUTION_RANGE[resolution], values, sensors, mode=mode)
             layout_dict = {}
             for i, value in enumerate(values, 1):
                 v_name = f"({getattr(Units, value).value[0]})" if len(values) > 1 else ""
-                for (_, sensor_name), group_df in df.loc[df[check_col] == value].groupby(group):
+                for (_, sensor_name), group_df in df.loc[df[check_col] == value].groupby(group) if len(df) else []:
+                    if downsampling == "lttb":
+                        group_df = group_df.dropna(subset=[y])
+                        group_df = group_df.iloc[lttb(group_df[x].astype("int64"), group_df[y], BATCH_POINT_BUDGET)]
                     fig.add_trace(
                         go.Scatter(x=group_df[x], y=group_df[y], name=f"{sensor_name}{v_name}", yaxis=f"y{i}"))
                     fig['data'][-1]['showlegend'] = True
@@ -107,22 +179,21 @@ class BatchDash:
                                             "side": "left" if i % 2 else "right", }
                 if i > 1:
                     layout_dict[f"yaxis{i}"].update({"overlaying": "y"})
-            fig.update_layout(**layout_dict)
+            # keeps the zoom of the user when the figure is replaced
+            fig.update_layout(uirevision=str(self.batch_id), **layout_dict)
             return fig
 
         @app.callback(
-            Output("batch_table", "data"),
-            Input("checklist", "value"))
-        def update_line_chart(values):
-            data = tb[tb["_field"].isin(values)]
-            return data.to_dict('records')
-
-        @app.callback(
-            Output("pagination", "max_value"),
-            Input("checklist", "value")
-        )
-        def change_pagination(values):
-            return up(tb[tb["_field"].isin(values)].shape[0] / page_size)
+            [Output("batch_table", "data"), Output("batch_table", "page_count"), Output("pagination", "max_value")],
+            [Input("checklist", "value"),
+             Input("sensors", "value"),
+             Input("batch_table", "page_current"),
+             Input("batch_table", "filter_query"),
+             Input("batch_table", "sort_by")])
+        def update_table(values, sensors, page, filter_query, sort_by):
+            data = sort_frame(filter_frame(self.get_table_df(table_resolution, values, sensors), filter_query), sort_by)
+            rows, page_count = table_page(data, page, page_size)
+            return rows, page_count, page_count
 
         @app.callback(
             [Output("collapseTable", "is_open"), Output("collapse_table", "children")],
@@ -135,28 +206,197 @@ class BatchDash:
                 return not is_open, label
             return is_open, "Zeige Tabelle"
 
-    def get_influx_df(self, resolution="1m"):
-        with InfluxDBClient(**DATABASES["influx"]) as client:
-            query_api = client.query_api()
-            query = f"""from(bucket: "{DATABASES["influx"]["bucket"]}")
-                          |> range(start: 0)
-                          |> filter(fn: (r) => r._measurement == "{self.batch_id}")
-                          |> aggregateWindow(every: {resolution}, fn: mean, createEmpty: false)
-                          |> yield(name: "mean")
-                     """
+    def get_influx_df(self, resolution="1m", fields=None, sensors=None, window=None, mode="mean"):
+        """
+        :param resolution: Width of the windows.
+        :param fields: Fields of the result, None for all fields.
+        :param sensors: Sensor IDs of the result, None for all sensors.
+        :param window: Tuple of start and stop as ISO strings in UTC, None for the whole batch.
+        :param mode: "mean" for the mean of every window, "minmax" for the minimum and maximum of every window at
+         their original time.
+        :return: DataFrame with the COLUMNS of the batch. Every field is cached on its own per batch, resolution,
+         sensors, mode and window, so selecting another field only queries the new one.
+        """
+        sensors = tuple(sorted(sensors)) if sensors else None
+        rollup = rollup_for(resolution) if self.rolled_up else None
+
+        def key(field):
+            return (str(self.batch_id), resolution, field, sensors, mode) + (tuple(window) if window else ())
+
+        def query(selected):
+            return as_frame(influx.query_data_frame(
+                influx_query(self.batch_id, resolution, selected, sensors, window, mode, rollup), "batch_df"))
+
+        if not fields:
+            return batch_cache.get_or_query(key(None), lambda: query(None), final=self.ended)
+        frames = {field: batch_cache.get(key(field)) for field in fields}
+        if missing := [field for field, df in frames.items() if df is None]:
+            df = query(missing)
+            for field in missing:
+                frames[field] = df[df["_field"] == field].reset_index(drop=True)
+                batch_cache.put(key(field), frames[field], final=self.ended)
+        return pd.concat(frames.values(), ignore_index=True) if len(frames) > 1 else frames[fields[0]]
+
+    def get_table_df(self, resolution, fields, sensors=None):
+        """
+        :param resolution: Width of the mean windows.
+        :param fields: Fields of the table.
+        :param sensors: Sensor IDs of the table, None for all sensors.
+        :return: DataFrame of the table with the unit of every row and the time as text, cached like the query.
+        """
+        if not fields:
+            return pd.DataFrame(columns=[column["id"] for column in TABLE_COLUMNS])
 
-            return query_api.query_data_frame(query)
+        def table():
+            if not len(df := self.get_influx_df(resolution, fields, sensors)):
+                return pd.DataFrame(columns=[column["id"] for column in TABLE_COLUMNS])
+            units = {field: getattr(Units, field).choice()[1] for field in df["_field"].unique()}
+            return pd.DataFrame({"sensor_id": df["sensor_id"], "display": df["display"],
+                                 "unit": df["_field"].map(units), "_time": df["_time"].astype(str),
+                                 "_value": df["_value"]}).reset_index(drop=True)
+
+        key = (str(self.batch_id), resolution, tuple(sorted(fields)), tuple(sorted(sensors)) if sensors else None,
+               "table")
+        return batch_cache.get_or_query(key, table, final=self.ended)
+
+    def get_influx_series(self):
+        """
+        :return: DataFrame with '_field', 'sensor_id' and 'display' of every series of the batch, only the last point
+         of every series is read.
+        """
+        query = f"""from(bucket: "{DATABASES["influx"]["bucket"]}")
+                    |> range(start: 0)
+                    |> filter(fn: (r) => r._measurement == "{self.batch_id}")
+                    |> last()
+                    |> keep(columns: ["_field", "sensor_id", "display"])
+                    """
+        return batch_cache.get_or_query((str(self.batch_id), "series", None),
+                                        lambda: influx.query_data_frame(query, "batch_series"), final=self.ended)
 
     def get_influx_size(self):
-        with InfluxDBClient(**DATABASES["influx"]) as client:
-            query_api = client.query_api()
-            query = f"""from(bucket: "{DATABASES["influx"]["bucket"]}") 
-                        |> range(start: 0) 
-                        |> filter(fn: (r) => r._measurement == "{self.batch_id}")
-                        |> count()
-                        """
-            if result := query_api.query(query):
+        query = f"""from(bucket: "{DATABASES["influx"]["bucket"]}")
+                    |> range(start: 0)
+                    |> filter(fn: (r) => r._measurement == "{self.batch_id}")
+                    |> count()
+                    """
+
+        def count():
+            if result := influx.query(query, "batch_size"):
                 return result[0].records[0].values['_value']
+            return 0
+
+        return batch_cache.get_or_query((str(self.batch_id), "size", None), count, final=self.ended)
+
+
+def influx_query(batch_id, resolution, fields=None, sensors=None, window=None, mode="mean", rollup=None):
+    """
+    :param batch_id: The ID of the batch.
+    :param resolution: Width of the windows.
+    :param fields: Fields of the result, None for all fields.
+    :param sensors: Sensor IDs of the result, None for all sensors.
+    :param window: Tuple of start and stop as ISO strings in UTC, None for the whole batch.
+    :param mode: "mean" or "minmax", see BatchDash.get_influx_df.
+    :param rollup: Resolution of the rollup bucket which is read, None for the raw data.
+    :return: The Flux query with the COLUMNS of the selection.
+    """
+    time_range = f"start: {window[0]}, stop: {window[1]}" if window else "start: 0"
+    bucket = rollup_bucket(rollup) if rollup else DATABASES["influx"]["bucket"]
+    # the selection is filtered by the InfluxDB, not in pandas
+    data = f"""from(bucket: "{bucket}")
+                  |> range({time_range})
+                  |> filter(fn: (r) => r._measurement == {json.dumps(str(batch_id))})"""
+    if fields:
+        data += f"""
+                  |> filter(fn: (r) => {flux_any("_field", fields)})"""
+    if sensors:
+        data += f"""
+                  |> filter(fn: (r) => {flux_any("sensor_id", sensors)})"""
+    if mode == "minmax":
+        if rollup:
+            # the rollups contain the minimum and maximum of their windows as own series
+            mins = 'data |> filter(fn: (r) => r.stat == "min") |> min()'
+            maxs = 'data |> filter(fn: (r) => r.stat == "max") |> max()'
+        else:
+            mins, maxs = "data |> min()", "data |> max()"
+        return f"""data = {data}
+                  |> window(every: {resolution})
+             union(tables: [{mins}, {maxs}])
+                  |> group(columns: ["_measurement", "_field", "sensor_id", "display"])
+                  |> sort(columns: ["_time"])
+                  |> keep(columns: {json.dumps(COLUMNS)})
+                  |> yield(name: "minmax")
+             """
+    if rollup:
+        # the means of the rollup windows weighted by their number of points, sum(mean * count) / sum(count)
+        return f"""{data}
+                  |> filter(fn: (r) => r.stat == "mean" or r.stat == "count")
+                  |> group(columns: ["_measurement", "_field", "sensor_id", "display"])
+                  |> pivot(rowKey: ["_time"], columnKey: ["stat"], valueColumn: "_value")
+                  |> window(every: {resolution})
+                  |> reduce(identity: {{sum: 0.0, count: 0.0}},
+                            fn: (r, accumulator) => ({{sum: accumulator.sum + r.mean * r.count,
+                                                      count: accumulator.count + r.count}}))
+                  |> map(fn: (r) => ({{r with _time: r._stop, _value: r.sum / r.count}}))
+                  |> window(every: inf)
+                  |> keep(columns: {json.dumps(COLUMNS)})
+                  |> yield(name: "mean")
+             """
+    return f"""{data}
+                  |> aggregateWindow(every: {resolution}, fn: mean, createEmpty: false)
+                  |> keep(columns: {json.dumps(COLUMNS)})
+                  |> yield(name: "mean")
+             """
+
+
+def as_frame(result):
+    """
+    :param result: Result of query_data_frame, a DataFrame or a list of DataFrames.
+    :return: One DataFrame with the COLUMNS.
+    """
+    if isinstance(result, list):
+        result = pd.concat(result, ignore_index=True) if result else pd.DataFrame()
+    return result if "_field" in result else pd.DataFrame(columns=COLUMNS)
+
+
+def zoom_window(relayout):
+    """
+    :param relayout: relayoutData of the graph.
+    :return: Tuple of start and stop of the visible x-axis as ISO strings in UTC, None if the whole batch is shown,
+     False if the x-axis didn´t change.
+    """
+    if not relayout:
+        return False
+    if relayout.get("xaxis.autorange"):
+        return None
+    if "xaxis.range[0]" in relayout and "xaxis.range[1]" in relayout:
+        start, stop = relayout["xaxis.range[0]"], relayout["xaxis.range[1]"]
+    elif "xaxis.range" in relayout:
+        start, stop = relayout["xaxis.range"]
+    else:
+        return False
+    # plotly shows the utc times of the influxdb without timezone
+    return tuple(pd.Timestamp(value).tz_localize(None).strftime("%Y-%m-%dT%H:%M:%S.%fZ") for value in (start, stop))
+
+
+def zoom_resolution(seconds, budget=BATCH_POINT_BUDGET):
+    """
+    :param seconds: Length of the visible time window.
+    :param budget: Maximal number of points per trace.
+    :return: The finest resolution of ZOOM_RESOLUTIONS with at most budget points in the window.
+    """
+    for step, resolution in ZOOM_RESOLUTIONS:
+        if seconds / step <= budget:
+            return resolution
+    return ZOOM_RESOLUTIONS[-1][1]
+
+
+def flux_any(column, values):
+    """
+    :param column: Column of the record.
+    :param values: Accepted values.
+    :return: Flux predicate which is true if the column has one of the values, false without values.
+    """
+    return " or ".join(f"r.{column} == {json.dumps(str(value))}" for value in values) or "false"
 
 
 def units_resolve(units):
@@ -0,0 +1,246 @@
+import datetime
+import json
+import re
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+from django.test import TestCase
+from django.utils import timezone
+from django_plotly_dash.dash_wrapper import get_local_stateless_by_name
+
+from buerkert_app.dashes.batch_dash import BatchDash, zoom_window, zoom_resolution, flux_any, influx_query
+from buerkert_app.models import Batch
+from buerkert_app.utils.query_cache import batch_cache
+
+SERIES = pd.DataFrame({"_field": ["PRESSURE", "TEMPERATURE"], "sensor_id": ["I-1", "I-2"],
+                       "display": ["Druck", "Temperatur"]})
+
+
+class FakeInflux:
+    """
+    Answers the queries of BatchDash with two points per selected field and keeps the selected fields of every
+    query.
+    """
+
+    def __init__(self):
+        self.queried_fields = []
+
+    def query(self, query, name):
+        return [MagicMock(records=[MagicMock(values={"_value": 100})])]
+
+    def query_data_frame(self, query, name):
+        if name == "batch_series":
+            return SERIES
+        fields = re.findall(r'r\._field == "(\w+)"', query)
+        self.queried_fields.append(fields)
+        return pd.DataFrame({"_time": pd.to_datetime([0, 1] * len(fields), unit="s", utc=True),
+                             "_value": [1.0, 2.0] * len(fields), "_field": [f for f in fields for _ in range(2)],
+                             "sensor_id": "I-1", "display": "Druck"})
+
+
+class TestGetInfluxDf(TestCase):
+
+    def setUp(self):
+        self.influx = FakeInflux()
+        patcher = patch('buerkert_app.dashes.batch_dash.influx', self.influx)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        batch_cache.invalidate()
+        self.addCleanup(batch_cache.invalidate)
+        self.dash = BatchDash("test_batch_dash", None, "5")
+        self.influx.queried_fields.clear()
+
+    def test_query_only_new_fields(self):
+        self.assertEqual(len(self.dash.get_influx_df("1m", ["PRESSURE"])), 2)
+
+        # selecting another field queries only that field
+        df = self.dash.get_influx_df("1m", ["PRESSURE", "TEMPERATURE"])
+        self.assertEqual(df["_field"].tolist(), ["PRESSURE", "PRESSURE", "TEMPERATURE", "TEMPERATURE"])
+        self.assertEqual(self.dash.get_influx_df("1m", ["TEMPERATURE"])["_field"].tolist(), ["TEMPERATURE"] * 2)
+        self.assertEqual(self.influx.queried_fields, [["PRESSURE"], ["TEMPERATURE"]])
+
+    def test_cache_key(self):
+        self.dash.get_influx_df("1m", ["PRESSURE"])
+        # other resolution, sensors, mode or window are queried again
+        self.dash.get_influx_df("10m", ["PRESSURE"])
+        self.dash.get_influx_df("1m", ["PRESSURE"], sensors=["I-1"])
+        self.dash.get_influx_df("1m", ["PRESSURE"], mode="minmax")
+        self.dash.get_influx_df("1m", ["PRESSURE"], window=("2023-01-01T00:00:00.000000Z",
+                                                            "2023-01-01T01:00:00.000000Z"))
+        self.dash.get_influx_df("1m", ["PRESSURE"], sensors=["I-1"])
+        self.assertEqual(len(self.influx.queried_fields), 5)
+
+    def test_field_without_data(self):
+        self.influx.query_data_frame = MagicMock(return_value=pd.DataFrame())
+
+        df = self.dash.get_influx_df("1m", ["PRESSURE", "TEMPERATURE"])
+
+        self.assertEqual(len(df), 0)
+        self.assertIn("_field", df)
+        self.dash.get_influx_df("1m", ["PRESSURE"])
+        self.influx.query_data_frame.assert_called_once()
+
+
+class TestLineChart(TestCase):
+
+    def setUp(self):
+        patcher = patch('buerkert_app.dashes.batch_dash.influx', FakeInflux())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        batch_cache.invalidate()
+        self.addCleanup(batch_cache.invalidate)
+        end = timezone.now()
+        Batch.objects.create(batch_id="5", start=end - datetime.timedelta(days=7), end=end, status=Batch.FINISHED)
+
+    def callback(self, name):
+        app = get_local_stateless_by_name("test_line_chart")
+        return next(func for _, func in app._callback_sets if func.__name__ == name)
+
+    @patch.object(BatchDash, 'get_influx_df', return_value=pd.DataFrame(columns=["_field"]))
+    def test_lttb_point_budget(self, get_influx_df):
+        BatchDash("test_line_chart", None, "5")
+        update_line_chart = self.callback("update_line_chart")
+
+        # the whole batch of 7 days with 4 times 2000 points for lttb, the slider otherwise
+        update_line_chart(["PRESSURE"], [], 0, None, "lttb")
+        self.assertEqual(get_influx_df.call_args.args[0], "2m")
+        update_line_chart(["PRESSURE"], [], 0, None, "minmax")
+        self.assertEqual(get_influx_df.call_args.args[0], "1s")
+        # a window uses the same budget
+        update_line_chart(["PRESSURE"], [], 0, ["2023-01-01T00:00:00Z", "2023-01-08T00:00:00Z"], "lttb")
+        self.assertEqual(get_influx_df.call_args.args[0], "2m")
+        self.assertTrue(self.callback("toggle_slider")("lttb"))
+        self.assertFalse(self.callback("toggle_slider")("mean"))
+
+    @patch.object(BatchDash, 'get_influx_df', return_value=pd.DataFrame(columns=["_field"]))
+    def test_lttb_without_catalog(self, get_influx_df):
+        Batch.objects.all().delete()
+        BatchDash("test_line_chart", None, "5")
+
+        self.callback("update_line_chart")(["PRESSURE"], [], 2, None, "lttb")
+        self.assertEqual(get_influx_df.call_args.args[0], "30s")
+        self.assertFalse(self.callback("toggle_slider")("lttb"))
+
+
+class TestFluxAny(TestCase):
+
+    def test_values(self):
+        self.assertEqual(flux_any("_field", []), "false")
+        self.assertEqual(flux_any("_field", ["PRESSURE"]), 'r._field == "PRESSURE"')
+        self.assertEqual(flux_any("sensor_id", ["I-1", 2]), 'r.sensor_id == "I-1" or r.sensor_id == "2"')
+
+    def test_quoting(self):
+        # values are flux string literals, quotes and backslashes can´t end the string
+        self.assertEqual(flux_any("sensor_id", ['I-1" or true or "', "a\\b"]),
+                         'r.sensor_id == "I-1\\" or true or \\"" or r.sensor_id == "a\\\\b"')
+
+
+class TestInfluxQuery(TestCase):
+
+    def test_all_fields_and_sensors(self):
+        query = influx_query("5", "1m")
+
+        self.assertIn('r._measurement == "5"', query)
+        self.assertIn("range(start: 0)", query)
+        self.assertNotIn("r._field", query)
+        self.assertNotIn("r.sensor_id", query)
+        self.assertIn("aggregateWindow(every: 1m, fn: mean, createEmpty: false)", query)
+        # empty selections are no filter
+        self.assertEqual(influx_query("5", "1m", [], []), query)
+
+    def test_selection(self):
+        query = influx_query("5", "1m", ["PRESSURE"], ["I-1", "I-2"])
+
+        self.assertIn('filter(fn: (r) => r._field == "PRESSURE")', query)
+        self.assertIn('filter(fn: (r) => r.sensor_id == "I-1" or r.sensor_id == "I-2")', query)
+        query = influx_query("5", "1m", ["PRESSURE", "LEVEL"])
+        self.assertIn('filter(fn: (r) => r._field == "PRESSURE" or r._field == "LEVEL")', query)
+
+    def test_quoting(self):
+        query = influx_query('5" or true or "', "1m", sensors=['I-1"'])
+
+        self.assertIn('r._measurement == "5\\" or true or \\""', query)
+        self.assertIn('r.sensor_id == "I-1\\""', query)
+
+    def test_window_and_minmax(self):
+        query = influx_query("5", "10s", window=("2023-01-01T00:00:00.000000Z", "2023-01-01T01:00:00.000000Z"),
+                             mode="minmax")
+
+        self.assertIn("range(start: 2023-01-01T00:00:00.000000Z, stop: 2023-01-01T01:00:00.000000Z)", query)
+        self.assertIn("window(every: 10s)", query)
+        self.assertIn('yield(name: "minmax")', query)
+
+    def test_rollup(self):
+        query = influx_query("5", "10m", rollup="1m")
+
+        self.assertIn('from(bucket: "sample-bucket2_1m")', query)
+        # the mean of the rollup windows weighted by their number of points
+        self.assertIn('filter(fn: (r) => r.stat == "mean" or r.stat == "count")', query)
+        self.assertIn("sum: accumulator.sum + r.mean * r.count", query)
+        self.assertIn("_value: r.sum / r.count", query)
+        self.assertNotIn("fn: mean", query)
+        query = influx_query("5", "10m", mode="minmax", rollup="1m")
+        self.assertIn('r.stat == "min"', query)
+        self.assertIn('r.stat == "max"', query)
+
+    def test_rollup_pivot(self):
+        query = influx_query("5", "10m", rollup="1m")
+        stages = [stage.strip() for stage in query.split("|>")]
+        pivot = next(i for i, stage in enumerate(stages) if stage.startswith("pivot("))
+        group = re.fullmatch(r'group\(columns: (\[.*?\])(?:, mode: "(\w+)")?\)', stages[pivot - 1])
+        row_key, column_key, value_column = re.fullmatch(
+            r'pivot\(rowKey: (\[.*?\]), columnKey: (\[.*?\]), valueColumn: "(\w+)"\)', stages[pivot]).groups()
+        # rows of the rollup bucket as read by range, mean and count of two windows and two sensors
+        rows = pd.DataFrame([{"_start": 0, "_stop": 9, "_time": time, "_measurement": "5", "_field": "PRESSURE",
+                              "sensor_id": sensor, "display": sensor, "stat": stat, "_value": value}
+                             for time in (1, 2) for sensor in ("I-1", "I-2")
+                             for stat, value in (("mean", 1.5), ("count", 6.0))])
+
+        # group like flux, in mode except by all other columns, then pivot every table by its row key
+        columns = json.loads(group.group(1))
+        if group.group(2) == "except":
+            columns = [column for column in rows.columns if column not in columns]
+        pivoted = pd.concat(table.pivot(index=json.loads(row_key), columns=json.loads(column_key)[0],
+                                        values=value_column).reset_index()
+                            for _, table in rows.groupby(columns))
+        # every row has the mean and the count of one rollup window
+        self.assertEqual(len(pivoted), 4)
+        self.assertFalse(pivoted[["mean", "count"]].isna().any().any())
+        self.assertEqual(columns, ["_measurement", "_field", "sensor_id", "display"])
+
+
+class TestZoomWindow(TestCase):
+
+    def test_unchanged_x_axis(self):
+        self.assertIs(zoom_window(None), False)
+        self.assertIs(zoom_window({}), False)
+        self.assertIs(zoom_window({"autosize": True}), False)
+        self.assertIs(zoom_window({"yaxis.range[0]": 1, "yaxis.range[1]": 2}), False)
+        self.assertIs(zoom_window({"xaxis.range[0]": "2023-01-01 10:00:00"}), False)
+
+    def test_autorange(self):
+        # double click shows the whole batch
+        self.assertIsNone(zoom_window({"xaxis.autorange": True, "yaxis.autorange": True}))
+
+    def test_range(self):
+        expected = ("2023-01-01T10:00:00.500000Z", "2023-01-01T11:00:00.000000Z")
+        self.assertEqual(zoom_window({"xaxis.range[0]": "2023-01-01 10:00:00.5",
+                                      "xaxis.range[1]": "2023-01-01 11:00"}), expected)
+        self.assertEqual(zoom_window({"xaxis.range": ["2023-01-01 10:00:00.5", "2023-01-01 11:00:00"]}), expected)
+        self.assertEqual(zoom_window({"xaxis.range": ["2023-01-01T10:00:00.5+00:00", "2023-01-01T11:00:00Z"]}),
+                         expected)
+
+
+class TestZoomResolution(TestCase):
+
+    def test_finest_resolution_within_budget(self):
+        self.assertEqual(zoom_resolution(60, budget=2000), "100ms")
+        self.assertEqual(zoom_resolution(200, budget=2000), "100ms")
+        self.assertEqual(zoom_resolution(201, budget=2000), "1s")
+        self.assertEqual(zoom_resolution(3600, budget=2000), "2s")
+        self.assertEqual(zoom_resolution(3600, budget=8000), "1s")
+        self.assertEqual(zoom_resolution(7 * 86400, budget=2000), "10m")
+        self.assertEqual(zoom_resolution(365 * 86400, budget=2000), "6h")
+
+    def test_longer_than_coarsest(self):
+        self.assertEqual(zoom_resolution(10 * 365 * 86400, budget=2000), "1d")
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 06:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Batch',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('batch_id', models.CharField(max_length=64, unique=True)),
+                ('start', models.DateTimeField(db_index=True)),
+                ('end', models.DateTimeField(blank=True, null=True)),
+                ('channels', models.JSONField(blank=True, default=list)),
+                ('point_count', models.BigIntegerField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('scheduled', 'Geplant'), ('recording', 'Aufzeichnung'), ('finished', 'Beendet'), ('stopped', 'Abgebrochen')], default='scheduled', max_length=16)),
+            ],
+            options={
+                'ordering': ['-start'],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.2 on 2026-10-18 07:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('buerkert_app', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='batch',
+            name='rolled_up',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class Batch(models.Model):
+    """
+    Catalog of the recorded batches, written when a batch is started and finalized when it ends, so the batch list
+    doesn´t need to scan the InfluxDB.
+    """
+    SCHEDULED = "scheduled"
+    RECORDING = "recording"
+    FINISHED = "finished"
+    STOPPED = "stopped"
+    STATUS_CHOICES = [(SCHEDULED, "Geplant"), (RECORDING, "Aufzeichnung"), (FINISHED, "Beendet"),
+                      (STOPPED, "Abgebrochen")]
+
+    batch_id = models.CharField(max_length=64, unique=True)
+    start = models.DateTimeField(db_index=True)
+    end = models.DateTimeField(null=True, blank=True)
+    # used sps ports with their display name and unit
+    channels = models.JSONField(default=list, blank=True)
+    # number of points in the InfluxDB, counted when the batch is finalized
+    point_count = models.BigIntegerField(null=True, blank=True)
+    status = models.CharField(max_length=16, choices=STATUS_CHOICES, default=SCHEDULED)
+    # the rollup buckets contain the batch up to this time
+    rolled_up = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ["-start"]
+
+    def __str__(self):
+        return f"{self.batch_id} ({self.get_status_display()})"
@@ -0,0 +1,7 @@
+from django.urls import path
+
+from buerkert_app.consumers import LiveConsumer
+
+websocket_urlpatterns = [
+    path("ws/live/", LiveConsumer.as_asgi(), name='live_ws'),
+]
@@ -0,0 +1,104 @@
+// renders the live table from the websocket of the LiveConsumer, falls back to polling the html table
+(function () {
+    const body = document.getElementById("live-values");
+    const alerts = document.getElementById("live-messages");
+    if (!body) {
+        return;
+    }
+    let opened = false;
+    let fallback = null;
+
+    function format(value) {
+        if (typeof value === "number" && !Number.isInteger(value)) {
+            return value.toFixed(2);
+        }
+        return value === null ? "" : String(value);
+    }
+
+    function renderRows(rows) {
+        body.replaceChildren();
+        for (const row of rows) {
+            const tr = document.createElement("tr");
+            const th = document.createElement("th");
+            th.scope = "row";
+            th.style.width = "5ch";
+            th.textContent = row.sps_port;
+            const display = document.createElement("td");
+            display.textContent = row.display;
+            const unit = document.createElement("td");
+            unit.textContent = row.unit_display;
+            const value = document.createElement("td");
+            value.dataset.spsPort = row.sps_port;
+            value.dataset.unit = row.unit;
+            value.textContent = format(row.value) + " " + row.unit;
+            tr.append(th, display, unit, value);
+            body.append(tr);
+        }
+    }
+
+    function renderValues(values) {
+        for (const [spsPort, value] of Object.entries(values)) {
+            const cell = body.querySelector(`td[data-sps-port="${CSS.escape(spsPort)}"]`);
+            if (cell) {
+                cell.textContent = format(value) + " " + cell.dataset.unit;
+            }
+        }
+    }
+
+    function renderMessages(messages) {
+        alerts.replaceChildren();
+        for (const message of messages) {
+            const div = document.createElement("div");
+            div.className = "alert alert-danger";
+            div.role = "alert";
+            div.textContent = message;
+            alerts.append(div);
+        }
+    }
+
+    function poll() {
+        // server without websockets, e.g. wsgi, render the html table every 2s like before
+        if (fallback) {
+            return;
+        }
+        const load = () => fetch(body.dataset.fallbackUrl, {headers: {"HX-Request": "true"}})
+            .then(response => response.text())
+            .then(html => {
+                alerts.replaceChildren();
+                body.innerHTML = html;
+            });
+        load();
+        fallback = setInterval(load, 2000);
+    }
+
+    function connect() {
+        const scheme = window.location.protocol === "https:" ? "wss://" : "ws://";
+        const socket = new WebSocket(scheme + window.location.host + body.dataset.wsUrl);
+        socket.onopen = () => {
+            opened = true;
+        };
+        socket.onmessage = event => {
+            const message = JSON.parse(event.data);
+            if (message.rows) {
+                renderRows(message.rows);
+            }
+            if (message.values) {
+                renderValues(message.values);
+            }
+            if (message.messages) {
+                renderMessages(message.messages);
+            }
+        };
+        socket.onclose = () => {
+            if (opened) {
+                // server restarted or connection lost, reconnect
+                opened = false;
+                setTimeout(connect, 2000);
+            } else {
+                poll();
+            }
+        };
+    }
+
+    connect();
+})();
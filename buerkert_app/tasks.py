@@ -0,0 +1,23 @@
+from background_task import background
+
+from buerkert import settings
+from buerkert_app.utils.rollups import update_rollups
+
+
+@background(schedule=0)
+def rollup_batches():
+    """
+     Writes the rollups of the running and the not yet rolled up batches, run by "manage.py process_tasks".
+
+    :return: None
+    """
+    print(f"rolled up {update_rollups()} batches")
+
+
+def schedule_rollups():
+    """
+     Schedules the rollup task every ROLLUP_INTERVAL seconds, replaces an already scheduled one.
+
+    :return: None
+    """
+    rollup_batches(repeat=settings.ROLLUP_INTERVAL, remove_existing_tasks=True)
@@ -0,0 +1,43 @@
+from unittest.mock import patch, AsyncMock
+
+from channels.testing import WebsocketCommunicator
+from django.test import TestCase
+
+from buerkert_app.consumers import LiveConsumer, snapshot_to_rows
+
+
+class TestLiveConsumer(TestCase):
+
+    @patch.object(LiveConsumer, "check_interval", 0.01)
+    @patch("buerkert_app.consumers.snapshot_to_rows")
+    @patch("buerkert_app.consumers.live_poller")
+    async def test_push_deltas(self, mock_poller, mock_rows):
+        snapshots = [{"values": [], "messages": [], "time": 1}, {"values": [], "messages": [], "time": 2}]
+        mock_poller.aget_snapshot = AsyncMock(side_effect=lambda: snapshots[0])
+        mock_poller.get_snapshot.side_effect = lambda wait=5: snapshots[0] if len(snapshots) == 2 else snapshots[-1]
+        mock_rows.return_value = [{"sps_port": "I-1", "value": 1.5}, {"sps_port": "I-2", "value": 2.0}]
+        communicator = WebsocketCommunicator(LiveConsumer.as_asgi(), "/ws/live/")
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        # whole table first
+        message = await communicator.receive_json_from()
+        self.assertEqual(message["rows"], mock_rows.return_value)
+        self.assertEqual(message["messages"], [])
+
+        # then only the changed values
+        mock_rows.return_value = [{"sps_port": "I-1", "value": 1.5}, {"sps_port": "I-2", "value": 3.0}]
+        snapshots.pop(0)
+        message = await communicator.receive_json_from()
+        self.assertEqual(message, {"time": 2, "values": {"I-2": 3.0}})
+        await communicator.disconnect()
+
+    @patch("buerkert_app.consumers.ios_to_displays")
+    @patch("buerkert_app.consumers.idents_to_ios")
+    def test_snapshot_to_rows(self, _, mock_displays):
+        mock_displays.return_value = [{"sps_port": "I-2", "display": "Temp", "unit": "NOT_A_UNIT", "value": 2.0},
+                                      {"sps_port": "I-1", "display": "Druck", "unit": "", "value": float("nan")}]
+        rows = snapshot_to_rows({"values": [], "messages": [], "time": None})
+        self.assertEqual([row["sps_port"] for row in rows], ["I-1", "I-2"])
+        self.assertIsNone(rows[0]["value"])
+        self.assertEqual(rows[1]["unit"], "")
@@ -0,0 +1,175 @@
+import datetime
+
+from django.db.models import IntegerField, Max
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from buerkert.settings import DATABASES, DATE_FORMAT
+from buerkert_app.models import Batch
+from buerkert_app.utils.influx import influx
+
+
+def parse_label_date(value):
+    """
+    :param value: Date string in DATE_FORMAT and local time like the container labels, a datetime or None.
+    :return: The aware datetime or None.
+    """
+    if not value:
+        return None
+    if isinstance(value, str):
+        value = datetime.datetime.strptime(value, DATE_FORMAT)
+    return timezone.make_aware(value) if timezone.is_naive(value) else value
+
+
+def record_batch_start(batch_dict, sps_list):
+    """
+     Adds a started batch to the catalog, or updates it if the batch ID is started again.
+
+    :param batch_dict: Dictionary with 'batch_id', 'start' and optional 'end' of the batch.
+    :param sps_list: List of dictionaries of the used sps ports with 'sps_port', 'display' and 'unit'.
+    :return: The Batch.
+    """
+    start = parse_label_date(batch_dict['start'])
+    channels = [{"sps_port": sps['sps_port'], "display": sps.get('display'), "unit": sps.get('unit')}
+                for sps in sps_list]
+    batch, _ = Batch.objects.update_or_create(
+        batch_id=str(batch_dict['batch_id']),
+        defaults={"start": start, "end": parse_label_date(batch_dict.get('end')), "channels": channels,
+                  "point_count": None,
+                  "status": Batch.RECORDING if start <= timezone.now() else Batch.SCHEDULED})
+    return batch
+
+
+def count_query(batch):
+    """
+    :param batch: The Batch.
+    :return: Flux query of the number of points of the batch, only the time range of the batch is read.
+    """
+    stop = (batch.end or timezone.now()) + datetime.timedelta(minutes=1)
+    return f'''
+    from(bucket: "{DATABASES["influx"]["bucket"]}")
+      |> range(start: {batch.start.isoformat()}, stop: {stop.isoformat()})
+      |> filter(fn: (r) => r._measurement == "{batch.batch_id}")
+      |> count()
+      |> group()
+      |> sum()
+    '''
+
+
+def count_points(batch):
+    """
+    :param batch: The Batch.
+    :return: Number of points of the batch in the InfluxDB.
+    """
+    tables = influx.query(count_query(batch), "count_points")
+    return sum(record.get_value() or 0 for table in tables for record in table.records)
+
+
+async def acount_points(batch):
+    """
+     Like count_points, but doesn´t block the event loop.
+
+    :param batch: The Batch.
+    :return: Number of points of the batch in the InfluxDB.
+    """
+    tables = await influx.aquery(count_query(batch), "count_points")
+    return sum(record.get_value() or 0 for table in tables for record in table.records)
+
+
+def close_batch(batch, status, end):
+    # end and status of a finalized batch, the count is added after
+    batch.end = end or batch.end or timezone.now()
+    batch.status = status
+
+
+def finalize_batch(batch_id, status=Batch.FINISHED, end=None):
+    """
+     Marks a batch as ended and stores its number of points.
+
+    :param batch_id: The ID of the batch.
+    :param status: Batch.FINISHED if the end time was reached, Batch.STOPPED if it was stopped before.
+    :param end: End of the batch, None keeps the planned end or uses now.
+    :return: The Batch, None if the batch is not in the catalog.
+    """
+    if not (batch := Batch.objects.filter(batch_id=str(batch_id)).first()):
+        return None
+    close_batch(batch, status, end)
+    try:
+        batch.point_count = count_points(batch)
+    except Exception as e:
+        # the catalog is finalized anyway, the count is only informative
+        print(f"can´t count points of {batch_id}: {e}")
+    batch.save()
+    return batch
+
+
+async def afinalize_batch(batch_id, status=Batch.FINISHED, end=None):
+    """
+     Async version of finalize_batch.
+
+    :param batch_id: The ID of the batch.
+    :param status: Batch.FINISHED if the end time was reached, Batch.STOPPED if it was stopped before.
+    :param end: End of the batch, None keeps the planned end or uses now.
+    :return: The Batch, None if the batch is not in the catalog.
+    """
+    if not (batch := await Batch.objects.filter(batch_id=str(batch_id)).afirst()):
+        return None
+    close_batch(batch, status, end)
+    try:
+        batch.point_count = await acount_points(batch)
+    except Exception as e:
+        # the catalog is finalized anyway, the count is only informative
+        print(f"can´t count points of {batch_id}: {e}")
+    await batch.asave()
+    return batch
+
+
+async def finalize_ended_batches():
+    """
+     Finalizes the batches whose end time passed, the collector removes itself at the end without notice.
+
+    :return: None
+    """
+    async for batch in Batch.objects.filter(status__in=[Batch.SCHEDULED, Batch.RECORDING], end__lt=timezone.now()):
+        await afinalize_batch(batch.batch_id)
+    await Batch.objects.filter(status=Batch.SCHEDULED, start__lte=timezone.now()).aupdate(status=Batch.RECORDING)
+
+
+async def import_batches():
+    """
+     Fills the catalog with the batches already stored in the InfluxDB, needed once for batches recorded before the
+    catalog existed. Start, end and number of points are read in one query.
+
+    :return: Number of imported batches.
+    """
+    # without the values, fields of different types can be grouped into one table per batch
+    query = f'''
+    data = from(bucket: "{DATABASES["influx"]["bucket"]}")
+      |> range(start: 0)
+      |> keep(columns: ["_measurement", "_time"])
+      |> group(columns: ["_measurement"])
+    data |> min(column: "_time") |> yield(name: "start")
+    data |> max(column: "_time") |> yield(name: "end")
+    data |> count(column: "_time") |> yield(name: "point_count")
+    '''
+    tables = await influx.aquery(query, "import_batches")
+    # batch ID -> {'start': ..., 'end': ..., 'point_count': ...}
+    batches = {}
+    for table in tables:
+        for record in table.records:
+            batches.setdefault(str(record.get_measurement()), {})[record['result']] = record['_time']
+    imported = 0
+    for batch_id, values in batches.items():
+        _, created = await Batch.objects.aget_or_create(batch_id=batch_id,
+                                                        defaults={**values, "status": Batch.FINISHED})
+        imported += created
+    return imported
+
+
+async def get_next_batch_id():
+    """
+    :return: The highest numeric batch ID in the catalog plus one, 1 for an empty catalog.
+    """
+    last_id = (await Batch.objects.filter(batch_id__regex=r"^\d+$")
+               .annotate(number=Cast("batch_id", IntegerField())).aaggregate(Max("number")))['number__max']
+    return (last_id or 0) + 1
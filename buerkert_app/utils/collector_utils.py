@@ -1,12 +1,18 @@
 import datetime
 import json
+import os
 import warnings
 
+import aiohttp
 import docker
+from django.utils import timezone
 from influxdb_client.client.warnings import MissingPivotFunction
 
 from buerkert import settings
-from buerkert.settings import DATE_FORMAT, COLLECTOR_CONF
+from buerkert.settings import DATE_FORMAT, COLLECTOR_CONF, COLLECTOR_CONTROL
+from buerkert_app.models import Batch
+from buerkert_app.tasks import schedule_rollups
+from buerkert_app.utils.batch_catalog import record_batch_start, finalize_batch
 from buerkert_app.utils.utils import get_io_ident
 
 warnings.simplefilter("ignore", MissingPivotFunction)
@@ -24,18 +30,40 @@ def create_config_file(batch_dict, sps_list):
     # filters only config that are used
     sps_list = list(filter(lambda sps: sps.pop('use', False), sps_list))
     data = {"batch_id": batch_id, "sps_list": sps_list, "io_ident": get_io_ident(), "url": settings.OPCUA_URL,
-            "db": settings.DATABASES['influx']}
+            "db": settings.DATABASES['influx'], "acquisition": settings.COLLECTOR_ACQUISITION,
+            "sample_interval": batch_dict.get('sample_interval') or settings.COLLECTOR_SAMPLE_INTERVAL,
+            "start": batch_dict['start'].strftime(DATE_FORMAT),
+            "end": batch_dict['end'].strftime(DATE_FORMAT) if batch_dict.get('end') else None,
+            "metrics_port": settings.COLLECTOR_METRICS_PORT}
     with open(COLLECTOR_CONF, "w") as fd:
         json.dump(data, fd, indent=2)
+    # reset requests from the last batch
+    write_control(batch_id)
 
 
-def create_container(batch_id, start, end):
+def write_control(batch_id, **kwargs):
+    """
+     Write a request for the running collector into the control file, the collector reads it on its next cycle.
+
+    :param batch_id: The ID of the batch the request is for.
+    :param kwargs: The requested changes, e.g. end (str in DATE_FORMAT or None) or stop (bool).
+    :return: None
+    """
+    data = {"batch_id": batch_id, **kwargs}
+    # replace the file at once, so the collector never reads a half written file
+    with open(f"{COLLECTOR_CONTROL}.tmp", "w") as fd:
+        json.dump(data, fd)
+    os.replace(f"{COLLECTOR_CONTROL}.tmp", COLLECTOR_CONTROL)
+
+
+def create_container(batch_id, start, end, **kwargs):
     """
      Create a Docker container with given batch ID, start and end date.
 
     :param batch_id: The ID of the batch.
     :param start: The start date of the batch.
     :param end: The end date of the batch (optional).
+    :param kwargs: Additional keyword arguments of the batch form (not used in this method)
     :return: A tuple indicating whether the container was successfully created and the labels for the container.
     """
     # connect to docker host
@@ -67,9 +95,14 @@ def start_container(batch_dict):
     # start container with parameters from batch_dict and bind volumes
     client.containers.run(image="influxdb_collector:dev", name=f"influxdb_collector_{batch_dict['batch_id']}",
                           network_mode='host', labels=batch_dict, auto_remove=True, detach=True,
-                          volumes=['/var/run/:/var/run/',
-                                   'shared_res:/home/app/influxdb_collector/res'])
+                          volumes=['shared_res:/home/app/influxdb_collector/res'])
     print(f"startet for {batch_dict['batch_id']}, stops at {batch_dict['end'] if batch_dict['end'] else 'never'}")
+    # add to the batch catalog with the used sps ports of the collector config
+    with open(COLLECTOR_CONF, "r") as fd:
+        sps_list = json.load(fd)['sps_list']
+    record_batch_start(batch_dict, sps_list)
+    # rollups are written while the batch runs and afterwards
+    schedule_rollups()
 
 
 def stop_container():
@@ -80,11 +113,16 @@ def stop_container():
     """
     # connect to docker host
     client = docker.DockerClient(base_url='unix://var/run/docker.sock')
-    # kill all collector containers
+    # ask the collectors to stop, they write their remaining points and exit, kill them if they don´t
     for container in list(
             filter(lambda con: con.name.startswith("influxdb_collector"), client.containers.list(all=True))):
         if container.status == "running":
-            container.kill()
+            write_control(container.labels['batch_id'], stop=True)
+            try:
+                container.wait(timeout=settings.COLLECTOR_STOP_TIMEOUT)
+            except Exception:
+                container.kill()
+            finalize_batch(container.labels['batch_id'], Batch.STOPPED, end=timezone.now())
         else:
             # remove if they didn´t remove themself
             container.remove()
@@ -108,3 +146,37 @@ def is_container_running():
         return labels, labels['start'] <= datetime.datetime.now() < \
                        (labels['end'] if labels['end'] else datetime.datetime.max)
     return None, None
+
+
+async def get_collector_metrics():
+    """
+     Reads the runtime metrics of the running collector from its metrics endpoint.
+
+    :return: A dictionary with the average duration of every stage in milliseconds, the counters and the time of the
+     last successful sample.
+    :raises aiohttp.ClientError: If the collector can´t be reached.
+    """
+    async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=1)) as session:
+        async with session.get(settings.COLLECTOR_METRICS_URL, raise_for_status=True) as response:
+            text = await response.text()
+    # prometheus text format, one sample per line, comments start with #
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    stages = {}
+    for stage in ("opc_read", "mapping", "influx_write"):
+        count = samples.get(f'collector_stage_seconds_count{{stage="{stage}"}}')
+        total = samples.get(f'collector_stage_seconds_sum{{stage="{stage}"}}')
+        stages[stage] = total / count * 1000 if count else None
+    last_sample = samples.get("collector_last_sample_timestamp_seconds")
+    return {"stages": stages,
+            "cycles": int(samples.get("collector_cycles_total", 0)),
+            "overruns": int(samples.get("collector_overruns_total", 0)),
+            "skipped_ticks": int(samples.get("collector_skipped_ticks_total", 0)),
+            "points_written": int(samples.get("collector_points_written_total", 0)),
+            "points_dropped": int(samples.get("collector_points_dropped_total", 0)),
+            "spool_lines": int(samples.get("collector_spool_lines", 0)),
+            "reconnects": int(samples.get("collector_reconnects_total", 0)),
+            "last_sample": datetime.datetime.fromtimestamp(last_sample) if last_sample else None}
@@ -0,0 +1,36 @@
+import numpy as np
+
+
+def lttb(x, y, threshold):
+    """
+     Largest-Triangle-Three-Buckets, selects the points which keep the visual shape of a series. The first and last
+    point are always kept, of every bucket between the point is kept which spans the largest triangle with the point
+    kept before and the mean of the next bucket, so peaks and edges stay visible.
+
+    :param x: Numeric x values, ascending.
+    :param y: Numeric y values without NaN.
+    :param threshold: Number of points to keep.
+    :return: Array with the indexes of the kept points, ascending.
+    """
+    length = len(x)
+    if threshold >= length or threshold < 3:
+        return np.arange(length)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    # points between the first and last point in threshold - 2 buckets
+    edges = np.linspace(1, length - 1, threshold - 1).astype(int)
+    indexes = np.empty(threshold, dtype=int)
+    indexes[0], indexes[-1] = 0, length - 1
+    last = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        # mean of the next bucket, the last point for the last bucket
+        if bucket + 2 < len(edges):
+            next_start, next_stop = edges[bucket + 1], edges[bucket + 2]
+        else:
+            next_start, next_stop = length - 1, length
+        mean_x, mean_y = x[next_start:next_stop].mean(), y[next_start:next_stop].mean()
+        areas = np.abs((x[last] - mean_x) * (y[start:stop] - y[last]) - (x[last] - x[start:stop]) * (mean_y - y[last]))
+        last = start + int(np.argmax(areas))
+        indexes[bucket + 1] = last
+    return indexes
@@ -0,0 +1,141 @@
+import asyncio
+import atexit
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+from influxdb_client import InfluxDBClient
+from influxdb_client.client.influxdb_client_async import InfluxDBClientAsync
+
+from buerkert import settings
+
+
+class InfluxClientManager:
+    """
+    Process wide InfluxDB clients of the web app. The sync client and its keep-alive connection pool are created once
+    and shared by all requests, the async client is bound to an event loop, created once per loop and closed with the
+    loop. The duration of every query is recorded per name, slow queries are logged.
+    """
+
+    def __init__(self, config, timeout=10_000, pool_size=10, slow_query=2):
+        """
+        :param config: Dictionary with 'url', 'org', 'token' and 'bucket' of the InfluxDB.
+        :param timeout: Timeout of a request in milliseconds.
+        :param pool_size: Maximal number of pooled connections.
+        :param slow_query: Seconds from which a query is logged.
+        """
+        self.config = {key: value for key, value in config.items() if key != "bucket"}
+        self.bucket = config.get("bucket")
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.slow_query = slow_query
+        # query name -> {'count', 'total', 'max'} in seconds
+        self.latency = {}
+        self._client = None
+        self._async_clients = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        :return: The shared InfluxDBClient, created with the first access.
+        """
+        with self._lock:
+            if self._client is None:
+                self._client = InfluxDBClient(**self.config, timeout=self.timeout,
+                                              connection_pool_maxsize=self.pool_size)
+            return self._client
+
+    async def async_client(self):
+        """
+        :return: The InfluxDBClientAsync of the running event loop, created with the first access in the loop and
+            closed when the loop shuts down.
+        """
+        loop = asyncio.get_running_loop()
+        if (entry := self._async_clients.get(loop)) is None:
+            client = InfluxDBClientAsync(**self.config, timeout=self.timeout, connection_pool_maxsize=self.pool_size)
+            # asyncio.run and async_to_sync close the async generators of a loop before they close it
+            guard = self._close_on_shutdown(client)
+            await anext(guard)
+            entry = self._async_clients[loop] = (client, guard)
+        return entry[0]
+
+    @staticmethod
+    async def _close_on_shutdown(client):
+        try:
+            yield
+        finally:
+            await client.close()
+
+    def query(self, query, name="query"):
+        """
+        :param query: The Flux query.
+        :param name: Name under which the duration is recorded.
+        :return: The result as list of FluxTables.
+        """
+        with self.timed(name):
+            return self.client.query_api().query(query)
+
+    def query_data_frame(self, query, name="query"):
+        """
+        :param query: The Flux query.
+        :param name: Name under which the duration is recorded.
+        :return: The result as pandas DataFrame, a list of DataFrames for differently shaped tables.
+        """
+        with self.timed(name):
+            return self.client.query_api().query_data_frame(query)
+
+    async def aquery(self, query, name="query"):
+        """
+        :param query: The Flux query.
+        :param name: Name under which the duration is recorded.
+        :return: The result as list of FluxTables.
+        """
+        with self.timed(name):
+            return await (await self.async_client()).query_api().query(query)
+
+    @contextmanager
+    def timed(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - started
+            with self._lock:
+                stats = self.latency.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0})
+                stats["count"] += 1
+                stats["total"] += duration
+                stats["max"] = max(stats["max"], duration)
+            if duration >= self.slow_query:
+                print(f"slow influx query {name}: {duration:.2f} s")
+
+    def close(self):
+        """
+         Closes the sync client and its connections, the next query opens a new one. Async clients of loops which are
+        stopped but not closed, e.g. the loop of the ASGI server at exit, are closed in their loop.
+
+        :return: None
+        """
+        with self._lock:
+            client, self._client = self._client, None
+        if client:
+            client.close()
+        for loop, (_, guard) in list(self._async_clients.items()):
+            if not loop.is_closed() and not loop.is_running():
+                self._async_clients.pop(loop, None)
+                loop.run_until_complete(guard.aclose())
+
+    async def aclose(self):
+        """
+         Closes the async client of the running event loop.
+
+        :return: None
+        """
+        if entry := self._async_clients.pop(asyncio.get_running_loop(), None):
+            await entry[1].aclose()
+
+
+influx = InfluxClientManager(settings.DATABASES["influx"], settings.INFLUX_TIMEOUT, settings.INFLUX_POOL_SIZE,
+                             settings.INFLUX_SLOW_QUERY)
+atexit.register(influx.close)
@@ -0,0 +1,178 @@
+import asyncio
+import datetime
+import os
+import threading
+import time
+
+from asyncua import Client, ua
+
+from buerkert import settings
+from buerkert_app.utils.collector_utils import is_container_running
+from buerkert_app.utils.utils import ConfigFile, io_to_ident, wait_event
+
+
+class LivePoller:
+    """
+    Process wide reader of the live values. One background thread keeps a connection to the OPC-UA server, browses
+    the address space once and reads all values every interval into a snapshot, which all clients of the live view
+    render. The load on the PLC doesn´t depend on the number of open live views. Without clients the thread
+    stops after the idle timeout and starts again with the next request.
+    While a collector is recording, the values are taken from its snapshot file instead and the web app holds no
+    connection to the OPC-UA server.
+    """
+    # seconds between two checks of the docker host whether the collector is running
+    running_check_interval = 30
+
+    def __init__(self, url, interval=2, idle_timeout=60, snapshot_path=settings.COLLECTOR_SNAPSHOT):
+        """
+        :param url: The URL of the OPC-UA server.
+        :param interval: Seconds between two reads.
+        :param idle_timeout: Seconds without request after which the polling stops.
+        :param snapshot_path: Path of the snapshot file of the collector.
+        """
+        self.url = url
+        self.interval = interval
+        self.idle_timeout = idle_timeout
+        self.collector_snapshot = ConfigFile(snapshot_path, default={})
+        # batch id of the running collector and when it was checked
+        self._collector_batch = None
+        self._running_checked = None
+        self.snapshot = {"values": [], "messages": [], "time": None}
+        self._client = None
+        # variable nodes and their idents with 'node_name', 'namespace_index', 'identifier' and 'variable_name'
+        self._nodes = []
+        self._idents = []
+        self._thread = None
+        self._lock = threading.Lock()
+        self._updated = threading.Event()
+        self._last_access = 0
+
+    def get_snapshot(self, wait=5):
+        """
+         Returns the latest values, starts the polling if it is not running.
+
+        :param wait: Seconds to wait for the first snapshot after the start.
+        :return: Dictionary with 'values' as list of dictionaries with the ident, 'value' and 'time' of every
+            variable, 'messages' with the exceptions of the last read and 'time' of the last read.
+        """
+        self._start()
+        self._updated.wait(wait)
+        return self.snapshot
+
+    async def aget_snapshot(self, wait=5):
+        """
+         Like get_snapshot, but waits for the first snapshot without blocking a thread of the async views.
+
+        :param wait: Seconds to wait for the first snapshot after the start.
+        :return: The latest snapshot, see get_snapshot.
+        """
+        self._start()
+        await wait_event(self._updated, wait)
+        return self.snapshot
+
+    def _start(self):
+        self._last_access = time.monotonic()
+        with self._lock:
+            if self._thread is None:
+                self._updated.clear()
+                self._thread = threading.Thread(target=asyncio.run, args=(self._run(),), name="live-poller",
+                                                daemon=True)
+                self._thread.start()
+
+    async def _run(self):
+        try:
+            while True:
+                with self._lock:
+                    if time.monotonic() - self._last_access > self.idle_timeout:
+                        # next request starts a new thread
+                        self._thread = None
+                        break
+                started = time.monotonic()
+                self.snapshot = await self.poll()
+                self._updated.set()
+                await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+        finally:
+            await self._disconnect()
+
+    async def poll(self):
+        """
+         Reads all values in one request, connects and browses first if there is no connection.
+
+        :return: The new snapshot, see get_snapshot.
+        """
+        if snapshot := await asyncio.to_thread(self.read_collector):
+            # the collector reads the same values, no second connection to the PLC
+            await self._disconnect()
+            return snapshot
+        values = []
+        messages = []
+        try:
+            if not self._client:
+                await self._connect()
+            data_values = await self._client.uaclient.read_attributes([node.nodeid for node in self._nodes],
+                                                                      ua.AttributeIds.Value)
+            now = datetime.datetime.now(datetime.timezone.utc)
+            values = [{**ident, "value": data_value.Value.Value, "time": data_value.SourceTimestamp or now}
+                      for ident, data_value in zip(self._idents, data_values)]
+        except TimeoutError:
+            messages.append(f"TimeoutError: Can´t Connect to OPC-UA Server {self.url}")
+            await self._disconnect()
+        except Exception as e:
+            messages.append(e)
+            await self._disconnect()
+        return {"values": values, "messages": messages, "time": datetime.datetime.now(datetime.timezone.utc)}
+
+    def read_collector(self):
+        """
+         Reads the latest cycle of the running collector.
+
+        :return: A snapshot like poll, None if no collector is running or it didn´t publish values yet.
+        """
+        if not os.path.isfile(self.collector_snapshot.path):
+            return None
+        now = time.monotonic()
+        if self._running_checked is None or now - self._running_checked > self.running_check_interval:
+            self._running_checked = now
+            try:
+                batch, running = is_container_running()
+            except Exception:
+                batch, running = None, False
+            self._collector_batch = str(batch['batch_id']) if running else None
+        data = self.collector_snapshot.rows()
+        if not self._collector_batch or data.get('batch_id') != self._collector_batch:
+            return None
+        values = []
+        for row in data['values']:
+            if ident := io_to_ident(row['sps_port']):
+                values.append({"namespace_index": ident[0], "identifier": ident[1], "value": row['value'],
+                               "time": datetime.datetime.fromtimestamp(row['time'], datetime.timezone.utc)})
+        return {"values": values, "messages": data['messages'],
+                "time": datetime.datetime.fromtimestamp(data['time'], datetime.timezone.utc)}
+
+    async def _connect(self):
+        client = Client(url=self.url)
+        await client.connect()
+        self._client = client
+        nodes = []
+        idents = []
+        # first two irrelevant, just generic data
+        for node in (await client.get_objects_node().get_children())[2:]:
+            br_name = await node.read_browse_name()
+            for var in await node.get_variables():
+                name = await var.read_browse_name()
+                nodes.append(var)
+                idents.append({"node_name": br_name.Name, "namespace_index": br_name.NamespaceIndex,
+                               "identifier": var.nodeid.Identifier, "variable_name": name.Name})
+        self._nodes, self._idents = nodes, idents
+
+    async def _disconnect(self):
+        if self._client:
+            try:
+                await self._client.disconnect()
+            except Exception:
+                # connection is already lost
+                pass
+            self._client = None
+
+
+live_poller = LivePoller(settings.OPCUA_URL, settings.LIVE_POLL_INTERVAL, settings.LIVE_POLL_IDLE_TIMEOUT)
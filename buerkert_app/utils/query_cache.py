@@ -0,0 +1,106 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from buerkert import settings
+
+
+def result_size(result):
+    """
+    :param result: A query result, a DataFrame or a list of DataFrames.
+    :return: Approximate size of the result in bytes.
+    """
+    if isinstance(result, pd.DataFrame):
+        return int(result.memory_usage(deep=True).sum())
+    if isinstance(result, (list, tuple)):
+        return sum(result_size(item) for item in result)
+    return sys.getsizeof(result)
+
+
+class QueryCache:
+    """
+    Process wide LRU cache of query results, limited by their size in memory. Results of ended batches never expire,
+    they only leave the cache if it is full, results of a running batch expire after the ttl.
+    """
+
+    def __init__(self, max_size=256 * 1024 * 1024, ttl=30):
+        """
+        :param max_size: Maximal size of all cached results in bytes.
+        :param ttl: Seconds until a result of a running batch expires.
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        # key -> (result, size, expiry as monotonic time or None)
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :param key: The key of the result, e.g. (batch_id, resolution, fields).
+        :return: The cached result, None if it isn´t cached or expired.
+        """
+        with self._lock:
+            if (entry := self._entries.get(key)) is None:
+                self.misses += 1
+                return None
+            result, _, expires = entry
+            if expires is not None and time.monotonic() >= expires:
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return result
+
+    def put(self, key, result, final=False):
+        """
+        :param key: The key of the result.
+        :param result: The query result.
+        :param final: True if the result can´t change anymore, e.g. of an ended batch, it doesn´t expire.
+        :return: None
+        """
+        size = result_size(result)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_size:
+                # would evict everything else
+                return
+            self._entries[key] = (result, size, None if final else time.monotonic() + self.ttl)
+            self.size += size
+            while self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def get_or_query(self, key, query, final=False):
+        """
+        :param key: The key of the result.
+        :param query: Function without arguments which returns the result, called if it isn´t cached.
+        :param final: True if the result can´t change anymore.
+        :return: The cached or queried result.
+        """
+        if (result := self.get(key)) is None:
+            result = query()
+            self.put(key, result, final)
+        return result
+
+    def invalidate(self, batch_id=None):
+        """
+        :param batch_id: Removes only the results whose key starts with this batch ID, None removes all.
+        :return: None
+        """
+        with self._lock:
+            for key in [key for key in self._entries if batch_id is None or key[0] == batch_id]:
+                self._remove(key)
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self.size -= size
+
+
+batch_cache = QueryCache(settings.BATCH_CACHE_SIZE, settings.BATCH_CACHE_TTL)
@@ -0,0 +1,159 @@
+import datetime
+import re
+
+from django.utils import timezone
+
+from buerkert import settings
+from buerkert.settings import DATABASES
+from buerkert_app.models import Batch
+from buerkert_app.utils.influx import influx
+
+UNITS = {"ms": 0.001, "s": 1, "m": 60, "h": 3600, "d": 86400}
+# hours of raw data per run of a batch, halved after a failed run, e.g. by the timeout of the InfluxDB, and doubled
+# after a successful one up to ROLLUP_CHUNK
+chunk_hours = {}
+
+
+def duration_seconds(duration):
+    """
+    :param duration: Flux duration with one unit, e.g. '10s' or '100ms'.
+    :return: The duration in seconds.
+    """
+    value, unit = re.fullmatch(r"(\d+)(ms|s|m|h|d)", duration).groups()
+    return int(value) * UNITS[unit]
+
+
+def rollup_bucket(resolution):
+    """
+    :param resolution: One of ROLLUP_RESOLUTIONS.
+    :return: Name of the rollup bucket of the resolution.
+    """
+    return f'{DATABASES["influx"]["bucket"]}_{resolution}'
+
+
+def is_rolled_up(batch):
+    """
+    :param batch: The Batch.
+    :return: True if the rollup buckets contain the whole batch.
+    """
+    return bool(batch.end and batch.rolled_up and batch.rolled_up >= batch.end and
+                batch.status in (Batch.FINISHED, Batch.STOPPED))
+
+
+def rollup_for(resolution):
+    """
+    :param resolution: Requested width of the windows.
+    :return: The coarsest rollup resolution whose windows fit into the requested ones, None if the raw data is needed.
+    """
+    seconds = duration_seconds(resolution)
+    fitting = [rollup for rollup in settings.ROLLUP_RESOLUTIONS
+               if seconds >= duration_seconds(rollup) and seconds % duration_seconds(rollup) == 0]
+    return max(fitting, key=duration_seconds) if fitting else None
+
+
+def ensure_buckets():
+    """
+     Creates the missing rollup buckets.
+
+    :return: None
+    """
+    buckets_api = influx.client.buckets_api()
+    for resolution in settings.ROLLUP_RESOLUTIONS:
+        if not buckets_api.find_bucket_by_name(rollup_bucket(resolution)):
+            buckets_api.create_bucket(bucket_name=rollup_bucket(resolution), org=DATABASES["influx"]["org"])
+
+
+def rollup_query(batch_id, resolution, start, stop):
+    """
+    :param batch_id: The ID of the batch.
+    :param resolution: One of ROLLUP_RESOLUTIONS.
+    :param start: Start of the raw data.
+    :param stop: Stop of the raw data, exclusive.
+    :return: Flux query which writes mean, min, max and count of every window as tag 'stat' into the rollup bucket,
+     the written rows aren´t returned.
+    """
+    stats = []
+    for fn in ("mean", "min", "max", "count"):
+        # windows are stamped with their start, so reading them with aggregateWindow gives the times of the raw data,
+        # all values as float, a field can only have one type
+        stats.append(f"""data
+                        |> aggregateWindow(every: {resolution}, fn: {fn}, timeSrc: "_start", createEmpty: false)
+                        |> toFloat()
+                        |> set(key: "stat", value: "{fn}")""")
+    return f"""data = from(bucket: "{DATABASES["influx"]["bucket"]}")
+                  |> range(start: {start.isoformat()}, stop: {stop.isoformat()})
+                  |> filter(fn: (r) => r._measurement == "{batch_id}")
+             union(tables: [{", ".join(stats)}])
+                  |> group(columns: ["_measurement", "_field", "sensor_id", "display", "stat"])
+                  |> to(bucket: "{rollup_bucket(resolution)}")
+                  |> filter(fn: (r) => false)
+             """
+
+
+def batch_end(batch):
+    """
+    :param batch: The Batch.
+    :return: Time of the last point of the batch, its start without points.
+    """
+    query = f"""from(bucket: "{DATABASES["influx"]["bucket"]}")
+                  |> range(start: {batch.start.isoformat()})
+                  |> filter(fn: (r) => r._measurement == "{batch.batch_id}")
+                  |> last()
+                  |> keep(columns: ["_time"])
+                  |> group()
+                  |> max(column: "_time")
+             """
+    if result := influx.query(query, "batch_end"):
+        return result[0].records[0].get_time()
+    return batch.start
+
+
+def rollup_batch(batch, now=None, hours=None):
+    """
+     Writes the rollups of the batch since the last run. The last window of every resolution is written again in the
+    next run, so windows of a running batch are complete in the end.
+
+    :param batch: The Batch.
+    :param now: Current time, for tests.
+    :param hours: Hours of raw data which are rolled up at most, ROLLUP_CHUNK by default.
+    :return: Time up to which the batch is rolled up.
+    """
+    now = now or timezone.now()
+    if not batch.end and batch.status in (Batch.FINISHED, Batch.STOPPED):
+        # without end an ended batch would be rolled up again in every run
+        batch.end = batch_end(batch)
+        batch.save(update_fields=["end"])
+    start = batch.rolled_up or batch.start
+    # the collector may write slightly after the planned end
+    target = min(batch.end + datetime.timedelta(minutes=1), now) if batch.end else now
+    stop = min(target, start + datetime.timedelta(hours=hours or settings.ROLLUP_CHUNK))
+    for resolution in settings.ROLLUP_RESOLUTIONS:
+        step = duration_seconds(resolution)
+        window_start = datetime.datetime.fromtimestamp(start.timestamp() // step * step, datetime.timezone.utc)
+        influx.query(rollup_query(batch.batch_id, resolution, window_start, stop), "rollup")
+    batch.rolled_up = stop
+    batch.save(update_fields=["rolled_up"])
+    return stop
+
+
+def update_rollups():
+    """
+     Rolls up the running batches and the ended batches which aren´t rolled up completely.
+
+    :return: Number of rolled up batches.
+    """
+    ensure_buckets()
+    updated = 0
+    for batch in Batch.objects.exclude(status=Batch.SCHEDULED):
+        if batch.end and batch.rolled_up and batch.rolled_up >= batch.end:
+            continue
+        hours = chunk_hours.get(batch.batch_id, settings.ROLLUP_CHUNK)
+        try:
+            rollup_batch(batch, hours=hours)
+            chunk_hours[batch.batch_id] = min(hours * 2, settings.ROLLUP_CHUNK)
+            updated += 1
+        except Exception as e:
+            # next run tries again with less data, down to one minute
+            chunk_hours[batch.batch_id] = max(hours / 2, 1 / 60)
+            print(f"can´t roll up batch {batch.batch_id}: {e}")
+    return updated
@@ -0,0 +1,78 @@
+import operator
+
+from pandas.api.types import is_numeric_dtype
+
+# operators of the filter_query of a dash DataTable, the symbols are written by the filter cells
+OPERATORS = [("ge", ">="), ("le", "<="), ("lt", "<"), ("gt", ">"), ("ne", "!="), ("eq", "="), ("contains",),
+             ("datestartswith",)]
+
+
+def split_filter_part(filter_part):
+    """
+    :param filter_part: One condition of a filter_query, e.g. '{display} contains "Druck"'.
+    :return: Tuple of column, operator and value as string, (None, None, None) if the condition is unknown.
+    """
+    for names in OPERATORS:
+        for name in names:
+            if f"{name} " not in filter_part:
+                continue
+            column_part, value = filter_part.split(f"{name} ", 1)
+            column = column_part[column_part.find("{") + 1:column_part.rfind("}")]
+            value = value.strip()
+            if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"`":
+                value = value[1:-1].replace("\\" + value[0], value[0])
+            return column, names[0], value
+    return None, None, None
+
+
+def filter_frame(df, filter_query):
+    """
+    :param df: The DataFrame of the table.
+    :param filter_query: filter_query of the DataTable, conditions joined by ' && '.
+    :return: The rows of the DataFrame which fulfill all conditions, unknown conditions are ignored.
+    """
+    for part in filter_query.split(" && ") if filter_query else []:
+        column, name, value = split_filter_part(part)
+        if column not in df:
+            continue
+        series = df[column]
+        if name == "contains":
+            df = df[series.astype(str).str.contains(value, case=False, regex=False)]
+        elif name == "datestartswith":
+            df = df[series.astype(str).str.startswith(value)]
+        else:
+            if is_numeric_dtype(series):
+                try:
+                    value = float(value)
+                except ValueError:
+                    # number column compared with text, no row fits
+                    return df.iloc[0:0]
+            else:
+                series = series.astype(str)
+            df = df[getattr(operator, name)(series, value)]
+    return df
+
+
+def sort_frame(df, sort_by):
+    """
+    :param df: The DataFrame of the table.
+    :param sort_by: sort_by of the DataTable, list of dictionaries with 'column_id' and 'direction'.
+    :return: The sorted DataFrame.
+    """
+    sort_by = [sort for sort in sort_by or [] if sort['column_id'] in df]
+    if not sort_by:
+        return df
+    return df.sort_values([sort['column_id'] for sort in sort_by],
+                          ascending=[sort['direction'] == "asc" for sort in sort_by], kind="stable")
+
+
+def table_page(df, page, page_size):
+    """
+    :param df: The filtered and sorted DataFrame of the table.
+    :param page: Index of the page, starting with 0, a page after the last one shows the last one.
+    :param page_size: Number of rows per page.
+    :return: Tuple of the rows of the page as records and the number of pages.
+    """
+    page_count = max(1, -(-len(df) // page_size))
+    page = min(page or 0, page_count - 1)
+    return df.iloc[page * page_size:(page + 1) * page_size].to_dict('records'), page_count
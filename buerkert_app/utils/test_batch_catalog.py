@@ -0,0 +1,68 @@
+import datetime
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from django.test import TestCase
+from django.utils import timezone
+from influxdb_client.client.flux_table import FluxRecord
+
+from buerkert_app.models import Batch
+from buerkert_app.utils.batch_catalog import record_batch_start, finalize_batch, finalize_ended_batches, \
+    get_next_batch_id, import_batches
+
+
+class TestBatchCatalog(TestCase):
+
+    def test_record_batch_start(self):
+        batch = record_batch_start({"batch_id": 5, "start": "2023-01-01T10:00:00Z", "end": None},
+                                   [{"sps_port": "I-1", "display": "Druck", "unit": "PRESSURE", "deadband": None}])
+        self.assertEqual(batch.batch_id, "5")
+        self.assertEqual(batch.status, Batch.RECORDING)
+        self.assertEqual(batch.start, timezone.make_aware(datetime.datetime(2023, 1, 1, 10)))
+        self.assertEqual(batch.channels, [{"sps_port": "I-1", "display": "Druck", "unit": "PRESSURE"}])
+
+        future = (datetime.datetime.now() + datetime.timedelta(days=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        batch = record_batch_start({"batch_id": 5, "start": future}, [])
+        self.assertEqual(batch.status, Batch.SCHEDULED)
+        self.assertEqual(Batch.objects.count(), 1)
+
+    @patch('buerkert_app.utils.batch_catalog.count_points', return_value=120)
+    def test_finalize_batch(self, _):
+        Batch.objects.create(batch_id="1", start=timezone.now(), status=Batch.RECORDING)
+
+        batch = finalize_batch("1", Batch.STOPPED)
+        self.assertEqual(batch.status, Batch.STOPPED)
+        self.assertEqual(batch.point_count, 120)
+        self.assertIsNotNone(batch.end)
+        self.assertIsNone(finalize_batch("2"))
+
+    @patch('buerkert_app.utils.batch_catalog.acount_points', side_effect=ConnectionError())
+    async def test_finalize_ended_batches(self, _):
+        now = timezone.now()
+        await Batch.objects.acreate(batch_id="1", start=now - datetime.timedelta(hours=2),
+                                    end=now - datetime.timedelta(hours=1), status=Batch.RECORDING)
+        await Batch.objects.acreate(batch_id="2", start=now - datetime.timedelta(hours=1), status=Batch.SCHEDULED)
+
+        await finalize_ended_batches()
+        self.assertEqual((await Batch.objects.aget(batch_id="1")).status, Batch.FINISHED)
+        self.assertIsNone((await Batch.objects.aget(batch_id="1")).point_count)
+        self.assertEqual((await Batch.objects.aget(batch_id="2")).status, Batch.RECORDING)
+
+    async def test_get_next_batch_id(self):
+        self.assertEqual(await get_next_batch_id(), 1)
+        for batch_id in ("9", "10", "test"):
+            await Batch.objects.acreate(batch_id=batch_id, start=timezone.now())
+        self.assertEqual(await get_next_batch_id(), 11)
+
+    @patch('buerkert_app.utils.batch_catalog.influx')
+    async def test_import_batches(self, mock_influx):
+        start = timezone.make_aware(datetime.datetime(2023, 1, 1))
+        end = timezone.make_aware(datetime.datetime(2023, 1, 2))
+        mock_influx.aquery = AsyncMock(return_value=[
+            MagicMock(records=[FluxRecord(0, {"result": "start", "_measurement": "3", "_time": start})]),
+            MagicMock(records=[FluxRecord(0, {"result": "end", "_measurement": "3", "_time": end})]),
+            MagicMock(records=[FluxRecord(0, {"result": "point_count", "_measurement": "3", "_time": 4200})])])
+
+        self.assertEqual(await import_batches(), 1)
+        self.assertEqual(await import_batches(), 0)
+        batch = await Batch.objects.aget(batch_id="3")
+        self.assertEqual((batch.status, batch.start, batch.end, batch.point_count), (Batch.FINISHED, start, end, 4200))
@@ -0,0 +1,21 @@
+import numpy as np
+from django.test import TestCase
+
+from buerkert_app.utils.downsampling import lttb
+
+
+class TestLTTB(TestCase):
+
+    def test_keeps_spike(self):
+        x = np.arange(1000)
+        y = np.zeros(1000)
+        # short spike, a mean of 100 points would hide it
+        y[503] = 50
+        indexes = lttb(x, y, 20)
+        self.assertEqual(len(indexes), 20)
+        self.assertEqual((indexes[0], indexes[-1]), (0, 999))
+        self.assertIn(503, indexes)
+        self.assertTrue(np.all(np.diff(indexes) > 0))
+
+    def test_short_series(self):
+        self.assertEqual(list(lttb([1, 2, 3], [1, 2, 3], 10)), [0, 1, 2])
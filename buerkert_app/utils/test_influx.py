@@ -0,0 +1,71 @@
+import asyncio
+import threading
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from django.test import TestCase
+
+from buerkert_app.utils.influx import InfluxClientManager
+
+CONFIG = {"url": "http://localhost:8086", "org": "org", "token": "token", "bucket": "bucket"}
+
+
+class TestInfluxClientManager(TestCase):
+
+    @patch('buerkert_app.utils.influx.InfluxDBClient')
+    def test_shared_client(self, mock_client):
+        manager = InfluxClientManager(CONFIG, timeout=5000, pool_size=4)
+        mock_client.return_value.query_api.return_value.query.return_value = ["table"]
+
+        self.assertEqual(manager.query("from()", "test"), ["table"])
+        manager.query("from()", "test")
+        # one client with its connection pool for all queries, the bucket is no client option
+        mock_client.assert_called_once_with(url="http://localhost:8086", org="org", token="token", timeout=5000,
+                                            connection_pool_maxsize=4)
+        self.assertEqual(manager.latency["test"]["count"], 2)
+
+        manager.close()
+        mock_client.return_value.close.assert_called_once()
+        manager.query("from()", "test")
+        self.assertEqual(mock_client.call_count, 2)
+
+    @patch('buerkert_app.utils.influx.InfluxDBClient')
+    def test_latency_recorded_on_error(self, mock_client):
+        manager = InfluxClientManager(CONFIG)
+        mock_client.return_value.query_api.return_value.query_data_frame.side_effect = TimeoutError()
+        with self.assertRaises(TimeoutError):
+            manager.query_data_frame("from()", "df")
+        self.assertEqual(manager.latency["df"]["count"], 1)
+
+    @patch('buerkert_app.utils.influx.InfluxDBClientAsync')
+    async def test_async_client_per_loop(self, mock_client):
+        manager = InfluxClientManager(CONFIG)
+        query_api = MagicMock(query=AsyncMock(return_value=["table"]))
+        mock_client.return_value.query_api = MagicMock(return_value=query_api)
+        mock_client.return_value.close = AsyncMock()
+
+        self.assertEqual(await manager.aquery("from()"), ["table"])
+        await manager.aquery("from()")
+        mock_client.assert_called_once()
+        self.assertEqual(manager.latency["query"]["count"], 2)
+
+        await manager.aclose()
+        mock_client.return_value.close.assert_awaited_once()
+
+    @patch('buerkert_app.utils.influx.InfluxDBClientAsync')
+    def test_async_client_closed_with_loop(self, mock_client):
+        manager = InfluxClientManager(CONFIG)
+        mock_client.return_value.query_api = MagicMock(return_value=MagicMock(query=AsyncMock()))
+        mock_client.return_value.close = AsyncMock()
+
+        # like the port scanner, a thread with its own loop
+        thread = threading.Thread(target=asyncio.run, args=(manager.aquery("from()"),))
+        thread.start()
+        thread.join()
+        mock_client.return_value.close.assert_awaited_once()
+
+        # loops which are stopped but not closed, like the loop of the server at exit
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        loop.run_until_complete(manager.aquery("from()"))
+        manager.close()
+        self.assertEqual(mock_client.return_value.close.await_count, 2)
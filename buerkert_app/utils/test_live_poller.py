@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+import tempfile
+import time
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from django.test import TestCase
+
+from buerkert_app.utils.live_poller import LivePoller
+
+
+class TestLivePoller(TestCase):
+
+    @patch('buerkert_app.utils.live_poller.Client')
+    def test_poll(self, mock_client):
+        var = MagicMock(nodeid=MagicMock(Identifier=5))
+        var.read_browse_name = AsyncMock(return_value=MagicMock(Name='MyVariable1'))
+        node = MagicMock(get_variables=AsyncMock(return_value=[var]))
+        node.read_browse_name = AsyncMock(return_value=MagicMock(Name='Druck', NamespaceIndex=2))
+        client = mock_client.return_value
+        client.connect = AsyncMock()
+        client.get_objects_node.return_value.get_children = AsyncMock(return_value=[MagicMock(), MagicMock(), node])
+        client.uaclient.read_attributes = AsyncMock(return_value=[MagicMock(Value=MagicMock(Value=1.5),
+                                                                            SourceTimestamp=None)])
+        poller = LivePoller("opc.tcp://test")
+
+        snapshot = asyncio.get_event_loop().run_until_complete(poller.poll())
+        self.assertEqual(snapshot['messages'], [])
+        self.assertEqual(len(snapshot['values']), 1)
+        self.assertDictContainsSubset({"node_name": "Druck", "namespace_index": 2, "identifier": 5,
+                                       "variable_name": "MyVariable1", "value": 1.5}, snapshot['values'][0])
+
+        # connection and browse are reused
+        asyncio.get_event_loop().run_until_complete(poller.poll())
+        client.connect.assert_awaited_once()
+        self.assertEqual(client.uaclient.read_attributes.await_count, 2)
+
+    @patch('buerkert_app.utils.live_poller.Client')
+    def test_poll_timeout(self, mock_client):
+        mock_client.return_value.connect = AsyncMock(side_effect=TimeoutError())
+        mock_client.return_value.disconnect = AsyncMock()
+        poller = LivePoller("opc.tcp://test")
+
+        snapshot = asyncio.get_event_loop().run_until_complete(poller.poll())
+        self.assertEqual(snapshot['values'], [])
+        self.assertEqual(snapshot['messages'], ["TimeoutError: Can´t Connect to OPC-UA Server opc.tcp://test"])
+
+    def test_get_snapshot_shared(self):
+        poller = LivePoller("opc.tcp://test", interval=60)
+        snapshot = {"values": [{"value": 1}], "messages": [], "time": None}
+        with patch.object(poller, 'poll', AsyncMock(return_value=snapshot)) as mock_poll:
+            self.assertEqual(poller.get_snapshot(), snapshot)
+            self.assertEqual(poller.get_snapshot(), snapshot)
+            # all requests read the same snapshot
+            mock_poll.assert_awaited_once()
+
+    def test_idle_stop(self):
+        poller = LivePoller("opc.tcp://test", interval=0, idle_timeout=0)
+        with patch.object(poller, 'poll', AsyncMock(return_value=poller.snapshot)):
+            poller.get_snapshot()
+            deadline = time.monotonic() + 5
+            while poller._thread is not None and time.monotonic() < deadline:
+                time.sleep(0.01)
+        self.assertIsNone(poller._thread)
+
+    @patch('buerkert_app.utils.live_poller.io_to_ident', side_effect=lambda port: (2, 5) if port == "I-1" else None)
+    @patch('buerkert_app.utils.live_poller.is_container_running', return_value=({"batch_id": "7"}, True))
+    def test_read_collector(self, mock_running, _):
+        fd, path = tempfile.mkstemp(suffix=".json")
+        self.addCleanup(os.remove, path)
+        with os.fdopen(fd, "w") as file:
+            json.dump({"batch_id": "7", "time": 1700000000.0, "messages": [],
+                       "values": [{"sps_port": "I-1", "value": 1.5, "time": 1700000000.0},
+                                  {"sps_port": "X-1", "value": 2.5, "time": 1700000000.0}]}, file)
+        poller = LivePoller("opc.tcp://test", snapshot_path=path)
+
+        snapshot = asyncio.get_event_loop().run_until_complete(poller.poll())
+        self.assertEqual(len(snapshot['values']), 1)
+        self.assertDictContainsSubset({"namespace_index": 2, "identifier": 5, "value": 1.5}, snapshot['values'][0])
+
+        # snapshot of another batch is ignored
+        mock_running.return_value = ({"batch_id": "8"}, True)
+        poller._running_checked = None
+        self.assertIsNone(poller.read_collector())
@@ -0,0 +1,50 @@
+from unittest.mock import patch, MagicMock
+
+import pandas as pd
+from django.test import TestCase
+
+from buerkert_app.utils.query_cache import QueryCache, result_size
+
+
+class TestQueryCache(TestCase):
+
+    def test_get_or_query(self):
+        cache = QueryCache()
+        query = MagicMock(return_value=pd.DataFrame({"_value": [1.0, 2.0]}))
+        first = cache.get_or_query(("1", "1m", None), query, final=True)
+        second = cache.get_or_query(("1", "1m", None), query, final=True)
+        self.assertIs(first, second)
+        query.assert_called_once()
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertEqual(cache.size, result_size(first))
+
+    def test_lru_eviction_by_size(self):
+        df = pd.DataFrame({"_value": range(100)})
+        cache = QueryCache(max_size=result_size(df) * 2)
+        cache.put("a", df, final=True)
+        cache.put("b", df, final=True)
+        # a was used last, b is evicted
+        cache.get("a")
+        cache.put("c", df, final=True)
+        self.assertIsNotNone(cache.get("a"))
+        self.assertIsNone(cache.get("b"))
+        self.assertIsNotNone(cache.get("c"))
+        self.assertLessEqual(cache.size, cache.max_size)
+
+        # too large results aren´t cached
+        cache.put("d", pd.concat([df] * 3), final=True)
+        self.assertIsNone(cache.get("d"))
+
+    @patch('buerkert_app.utils.query_cache.time.monotonic')
+    def test_ttl_of_running_batch(self, mock_time):
+        mock_time.return_value = 100
+        cache = QueryCache(ttl=30)
+        cache.put(("1", "1m", None), 1, final=False)
+        cache.put(("2", "1m", None), 2, final=True)
+        mock_time.return_value = 131
+        self.assertIsNone(cache.get(("1", "1m", None)))
+        self.assertEqual(cache.get(("2", "1m", None)), 2)
+
+        cache.invalidate("2")
+        self.assertIsNone(cache.get(("2", "1m", None)))
+        self.assertEqual(cache.size, 0)
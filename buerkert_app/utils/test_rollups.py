@@ -0,0 +1,87 @@
+import datetime
+from unittest.mock import patch, MagicMock
+
+from django.test import TestCase
+from django.utils import timezone
+
+from buerkert_app.models import Batch
+from buerkert_app.utils.rollups import duration_seconds, rollup_for, rollup_batch, update_rollups, is_rolled_up, \
+    chunk_hours
+
+
+class TestRollups(TestCase):
+
+    def test_rollup_for(self):
+        self.assertEqual(duration_seconds("100ms"), 0.1)
+        self.assertIsNone(rollup_for("1s"))
+        self.assertIsNone(rollup_for("5s"))
+        self.assertEqual(rollup_for("30s"), "10s")
+        self.assertEqual(rollup_for("2m"), "1m")
+        self.assertEqual(rollup_for("30m"), "10m")
+        self.assertEqual(rollup_for("1d"), "1h")
+
+    @patch('buerkert_app.utils.rollups.influx')
+    def test_rollup_batch_incremental(self, mock_influx):
+        start = timezone.make_aware(datetime.datetime(2023, 1, 1, 10, 0, 5))
+        batch = Batch.objects.create(batch_id="1", start=start, status=Batch.RECORDING)
+
+        now = start + datetime.timedelta(minutes=30)
+        self.assertEqual(rollup_batch(batch, now), now)
+        # one query per resolution, the first window starts at the full resolution
+        self.assertEqual(mock_influx.query.call_count, 4)
+        query = mock_influx.query.call_args_list[0][0][0]
+        self.assertIn("range(start: 2023-01-01T09:00:00+00:00", query)
+        self.assertIn('to(bucket: "sample-bucket2_10s")', query)
+        # the written rows aren´t sent back
+        self.assertTrue(query.rstrip().endswith("|> filter(fn: (r) => false)"))
+
+        # the next run continues from the last run
+        rollup_batch(batch, now + datetime.timedelta(minutes=1))
+        self.assertIn("range(start: 2023-01-01T09:30:00+00:00", mock_influx.query.call_args_list[4][0][0])
+        self.assertEqual(Batch.objects.get(batch_id="1").rolled_up, now + datetime.timedelta(minutes=1))
+
+    @patch('buerkert_app.utils.rollups.rollup_batch')
+    @patch('buerkert_app.utils.rollups.ensure_buckets')
+    def test_update_rollups(self, _, mock_rollup):
+        now = timezone.now()
+        Batch.objects.create(batch_id="1", start=now, status=Batch.SCHEDULED)
+        Batch.objects.create(batch_id="2", start=now - datetime.timedelta(hours=1), status=Batch.RECORDING)
+        done = Batch.objects.create(batch_id="3", start=now - datetime.timedelta(hours=2), end=now,
+                                    rolled_up=now, status=Batch.FINISHED)
+
+        self.assertEqual(update_rollups(), 1)
+        self.assertEqual(mock_rollup.call_args[0][0].batch_id, "2")
+        self.assertTrue(is_rolled_up(done))
+
+    @patch('buerkert_app.utils.rollups.influx')
+    def test_ended_batch_without_end(self, mock_influx):
+        start = timezone.make_aware(datetime.datetime(2023, 1, 1, 10, 0, 5))
+        end = start + datetime.timedelta(hours=2)
+        last_point = MagicMock(records=[MagicMock(get_time=MagicMock(return_value=end))])
+        mock_influx.query.side_effect = lambda query, name: [last_point] if name == "batch_end" else []
+        batch = Batch.objects.create(batch_id="1", start=start, status=Batch.FINISHED)
+
+        # the end is taken from the last point, so the batch is rolled up once
+        rollup_batch(batch, start + datetime.timedelta(days=1))
+        batch = Batch.objects.get(batch_id="1")
+        self.assertEqual(batch.end, end)
+        self.assertEqual(batch.rolled_up, end + datetime.timedelta(minutes=1))
+        self.assertTrue(is_rolled_up(batch))
+
+    @patch('buerkert_app.utils.rollups.rollup_batch')
+    @patch('buerkert_app.utils.rollups.ensure_buckets')
+    @patch('buerkert_app.utils.rollups.settings.ROLLUP_CHUNK', 24)
+    def test_chunk_after_failure(self, _, mock_rollup):
+        self.addCleanup(chunk_hours.clear)
+        Batch.objects.create(batch_id="1", start=timezone.now(), status=Batch.RECORDING)
+
+        mock_rollup.side_effect = TimeoutError()
+        update_rollups()
+        update_rollups()
+        self.assertEqual(mock_rollup.call_args.kwargs['hours'], 12)
+        # after a successful run the chunk grows again
+        mock_rollup.side_effect = None
+        self.assertEqual(update_rollups(), 1)
+        self.assertEqual(mock_rollup.call_args.kwargs['hours'], 6)
+        update_rollups()
+        self.assertEqual(mock_rollup.call_args.kwargs['hours'], 12)
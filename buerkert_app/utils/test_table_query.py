@@ -0,0 +1,40 @@
+import pandas as pd
+from django.test import TestCase
+
+from buerkert_app.utils.table_query import split_filter_part, filter_frame, sort_frame, table_page
+
+
+class TestTableQuery(TestCase):
+
+    def setUp(self):
+        self.df = pd.DataFrame({"sensor_id": ["I-1", "I-2", "I-1", "I-3"],
+                                "display": ["Druck", "Temp", "Druck", "Druck 2"],
+                                "_time": ["2023-01-01 10:00:00", "2023-01-01 10:00:00", "2023-01-01 11:00:00",
+                                          "2023-01-02 10:00:00"],
+                                "_value": [1.0, 20.0, 2.5, 3.0]})
+
+    def test_split_filter_part(self):
+        self.assertEqual(split_filter_part('{display} contains "Druck 2"'), ("display", "contains", "Druck 2"))
+        self.assertEqual(split_filter_part("{_value} >= 2"), ("_value", "ge", "2"))
+        self.assertEqual(split_filter_part("{_value} is blank"), (None, None, None))
+
+    def test_filter_frame(self):
+        self.assertEqual(list(filter_frame(self.df, "{display} contains druck && {_value} > 1").index), [2, 3])
+        self.assertEqual(list(filter_frame(self.df, '{sensor_id} = "I-1"').index), [0, 2])
+        self.assertEqual(list(filter_frame(self.df, "{_time} datestartswith 2023-01-01").index), [0, 1, 2])
+        self.assertTrue(filter_frame(self.df, "{_value} = abc").empty)
+        self.assertEqual(len(filter_frame(self.df, "{unknown} = 1")), 4)
+        self.assertEqual(len(filter_frame(self.df, None)), 4)
+
+    def test_sort_and_page(self):
+        df = sort_frame(self.df, [{"column_id": "sensor_id", "direction": "asc"},
+                                  {"column_id": "_value", "direction": "desc"}])
+        self.assertEqual(list(df["_value"]), [2.5, 1.0, 20.0, 3.0])
+
+        rows, page_count = table_page(df, 1, 3)
+        self.assertEqual(page_count, 2)
+        self.assertEqual(rows, [{"sensor_id": "I-3", "display": "Druck 2", "_time": "2023-01-02 10:00:00",
+                                 "_value": 3.0}])
+        # a page after the last shows the last page, e.g. after a filter
+        self.assertEqual(table_page(df, 5, 3), (rows, 2))
+        self.assertEqual(table_page(df.iloc[0:0], 0, 3), ([], 1))
@@ -1,11 +1,51 @@
 import asyncio
-from unittest.mock import patch, mock_open, MagicMock
+import datetime
+import json
+import os
+import tempfile
+import threading
+from unittest.mock import patch, mock_open, MagicMock, AsyncMock
 
 from django.test import TestCase
+from django.utils import timezone
+from influxdb_client.client.exceptions import InfluxDBError
 
 from buerkert import settings
+from buerkert_app.models import Batch
+from buerkert_app.utils import utils
 from buerkert_app.utils.utils import io_to_ident, get_io_ident, ident_to_io, idents_to_ios, \
-    io_to_display, ios_to_displays, get_opcua_data, get_possible_sps_conf_list, get_batch_ids, get_last_batch_id
+    io_to_display, ios_to_displays, get_opcua_data, get_possible_sps_conf_list, get_batch_ids, get_last_batch_id, \
+    ConfigFile, save_conf_list, scan_sps_ports, SpsPortScanner
+
+
+def config_file(rows, template):
+    """
+    :param rows: Rows of the temporary json file.
+    :param template: ConfigFile whose indexes are used.
+    :return: A ConfigFile on a temporary json file with the rows.
+    """
+    fd, path = tempfile.mkstemp(suffix=".json")
+    with os.fdopen(fd, "w") as file:
+        json.dump(rows, file)
+    return ConfigFile(path, template.default, **template.key_functions)
+
+
+class ConfigFileMixin:
+
+    def use_config_file(self, name, rows):
+        """
+         Replaces a ConfigFile of utils with a temporary one for the test.
+
+        :param name: Name of the ConfigFile in utils, e.g. 'io_ident_config'.
+        :param rows: Rows of the temporary json file.
+        :return: The temporary ConfigFile.
+        """
+        config = config_file(rows, getattr(utils, name))
+        patcher = patch.object(utils, name, config)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(os.remove, config.path)
+        return config
 
 
 class TestGetOpcUaData(TestCase):
@@ -33,20 +73,56 @@ class TestGetOpcUaData(TestCase):
 
 class TestGetIoIdent(TestCase):
 
-    @patch('builtins.open', return_value=mock_open(read_data='{"key": "value"}').return_value)
-    def test_get_io_ident(self, mock_open):
-        self.assertEqual(get_io_ident(), {'key': 'value'})
-        mock_open.assert_called_once_with(settings.IO_IDENT, 'r')
+    @patch('os.stat', return_value=MagicMock(st_mtime_ns=1))
+    @patch('builtins.open', return_value=mock_open(read_data='[{"sps_port": "I-1"}]').return_value)
+    def test_get_io_ident(self, mock_open, _):
+        with patch.object(utils, 'io_ident_config', ConfigFile(settings.IO_IDENT)):
+            self.assertEqual(get_io_ident(), [{'sps_port': 'I-1'}])
+            mock_open.assert_called_once_with(settings.IO_IDENT, 'r')
+
+
+class TestConfigFile(TestCase):
+
+    def test_reload_on_mtime_change(self):
+        config = config_file([{'sps_port': 'I-1'}], utils.sps_conf_config)
+        self.assertEqual(config.index('sps_port')['I-1'], {'sps_port': 'I-1'})
 
+        # unchanged file is not parsed again
+        with patch('json.load') as mock_load:
+            config.rows()
+            mock_load.assert_not_called()
 
-class TestIOToIdent(TestCase):
+        with open(config.path, "w") as fd:
+            json.dump([{'sps_port': 'I-2'}], fd)
+        os.utime(config.path, ns=(0, os.stat(config.path).st_mtime_ns + 1))
+        self.assertEqual(config.rows(), [{'sps_port': 'I-2'}])
+        self.assertNotIn('I-1', config.index('sps_port'))
+        os.remove(config.path)
 
-    @patch('buerkert_app.utils.utils.get_io_ident', autospec=True)
-    def test_io_to_ident(self, mock_get_io_ident):
-        mock_get_io_ident.return_value = [
+    def test_missing_file_default(self):
+        config = ConfigFile("does_not_exist.json", default={}, sps_port=lambda row: row['sps_port'])
+        self.assertEqual(config.rows(), {})
+        self.assertEqual(config.index('sps_port'), {})
+
+    def test_save_conf_list_invalidates(self):
+        config = config_file([], utils.sps_conf_config)
+        with patch.object(utils, 'sps_conf_config', config), patch.object(utils, 'SPS_CONF', config.path), \
+                patch('os.stat', return_value=MagicMock(st_mtime_ns=1)):
+            self.assertEqual(io_to_display('I-1'), {})
+            save_conf_list([{'sps_port': 'I-1', 'display': 'Druck'}])
+            self.assertEqual(io_to_display('I-1'), {'sps_port': 'I-1', 'display': 'Druck'})
+        os.remove(config.path)
+
+
+class TestIOToIdent(ConfigFileMixin, TestCase):
+
+    def setUp(self):
+        self.use_config_file('io_ident_config', [
             {'sps_port': 'port1', 'namespace_index': 'index1', 'identifier': 'identifier1'},
             {'sps_port': 'port2', 'namespace_index': 'index2', 'identifier': 'identifier2'},
-        ]
+        ])
+
+    def test_io_to_ident(self):
 
         result = io_to_ident('port1')
         self.assertEqual(result, ('index1', 'identifier1'))
@@ -58,14 +134,15 @@ class TestIOToIdent(TestCase):
         self.assertIsNone(result)
 
 
-class TestIdentToIO(TestCase):
+class TestIdentToIO(ConfigFileMixin, TestCase):
 
-    @patch('buerkert_app.utils.utils.get_io_ident')
-    def test_ident_to_io(self, mock_get_io_ident):
-        mock_get_io_ident.return_value = [
+    def setUp(self):
+        self.use_config_file('io_ident_config', [
             {'namespace_index': 1, 'identifier': 'A', 'sps_port': 'P1'},
             {'namespace_index': 2, 'identifier': 'B', 'sps_port': 'P2'},
-        ]
+        ])
+
+    def test_ident_to_io(self):
 
         sps_port = ident_to_io(1, 'A')
         self.assertEqual(sps_port, 'P1')
@@ -74,18 +151,19 @@ class TestIdentToIO(TestCase):
         self.assertIsNone(sps_port)
 
 
-class TestIdentsToIos(TestCase):
+class TestIdentsToIos(ConfigFileMixin, TestCase):
 
-    @patch('buerkert_app.utils.utils.get_io_ident')
-    def test_idents_to_ios(self, mock_get_io_ident):
-        idents = [
-            {"namespace_index": 1, "identifier": "a", "value": 123},
-            {"namespace_index": 2, "identifier": "b", "value": 456},
-        ]
-
-        mock_get_io_ident.return_value = [
+    def setUp(self):
+        self.use_config_file('io_ident_config', [
             {"namespace_index": 1, "identifier": "a", "sps_port": "port1"},
             {"namespace_index": 2, "identifier": "b", "sps_port": "port2"},
+        ])
+
+    def test_idents_to_ios(self):
+        idents = [
+            {"namespace_index": 2, "identifier": "b", "value": 456},
+            {"namespace_index": 1, "identifier": "a", "value": 123},
+            {"namespace_index": 3, "identifier": "c", "value": 789},
         ]
 
         expected_output = [
@@ -97,14 +175,15 @@ class TestIdentsToIos(TestCase):
         self.assertEqual(result, expected_output)
 
 
-class TestIOTODISPLAY(TestCase):
-    @patch('buerkert_app.utils.utils.get_sps_conf_list')
-    def test_io_to_display(self, get_sps_conf_list):
-        get_sps_conf_list.return_value = [
+class TestIOTODISPLAY(ConfigFileMixin, TestCase):
+    def setUp(self):
+        self.use_config_file('sps_conf_config', [
             {'sps_port': 1, 'display': 'display1'},
             {'sps_port': 2, 'display': 'display2'},
             {'sps_port': 3, 'display': 'display3'},
-        ]
+        ])
+
+    def test_io_to_display(self):
 
         self.assertDictEqual(io_to_display(1), {'sps_port': 1, 'display': 'display1'})
         self.assertDictEqual(io_to_display(2), {'sps_port': 2, 'display': 'display2'})
@@ -112,12 +191,12 @@ class TestIOTODISPLAY(TestCase):
         self.assertDictEqual(io_to_display(4), {})
 
 
-class TestIosToDisplays(TestCase):
-    @patch('buerkert_app.utils.utils.get_sps_conf_list')
-    def test_ios_to_displays(self, mock_get_sps_conf_list):
-        # Set the return value of the function mock
-        mock_get_sps_conf_list.return_value = [{'sps_port': 1, 'display': 'display1'},
-                                               {'sps_port': 2, 'display': 'display2'}]
+class TestIosToDisplays(ConfigFileMixin, TestCase):
+    def setUp(self):
+        self.use_config_file('sps_conf_config', [{'sps_port': 1, 'display': 'display1'},
+                                                 {'sps_port': 2, 'display': 'display2'}])
+
+    def test_ios_to_displays(self):
 
         test_data = [{'sps_port': 1, 'value': 'value1'},
                      {'sps_port': 2, 'value': 'value2'}]
@@ -125,77 +204,118 @@ class TestIosToDisplays(TestCase):
         expected_data = [{'sps_port': 1, 'display': 'display1', 'value': 'value1'},
                          {'sps_port': 2, 'display': 'display2', 'value': 'value2'}]
 
-        result = ios_to_displays(test_data)
-
-        # Mock function is called once
-        mock_get_sps_conf_list.assert_called_once()
+        # file is parsed once for all ios
+        with patch('json.load', wraps=json.load) as mock_load:
+            result = ios_to_displays(test_data)
+            mock_load.assert_called_once()
 
         self.assertEqual(result, expected_data)
 
 
-class TestGetPossibleSPSConfList(TestCase):
+class TestGetPossibleSPSConfList(ConfigFileMixin, TestCase):
+    def setUp(self):
+        self.use_config_file('sps_conf_config', [{'use': True, 'sps_port': '123', 'display': 'Druck',
+                                                  'unit': 'PRESSURE'}])
 
-    @patch('buerkert_app.utils.utils.get_opcua_data',
-           return_value=([{'namespace_index': 1, 'identifier': '123'}], None))
-    @patch('buerkert_app.utils.utils.ident_to_io', return_value='123')
-    @patch('json.load')
-    @patch('builtins.open', new_callable=mock_open, read_data='[]')
-    @patch('os.path.isfile', return_value=True)
-    def test_get_possible_sps_conf_list_with_file(self, *_):
+    @patch('buerkert_app.utils.utils.sps_port_scanner')
+    def test_get_possible_sps_conf_list_with_scan(self, mock_scanner):
+        mock_scanner.get.return_value = ['123', '456']
         result = get_possible_sps_conf_list()
-        self.assertEqual(result, [{'use': False, 'sps_port': '123', 'display': '', 'unit': ''}])
-
-    @patch('buerkert_app.utils.utils.get_opcua_data',
-           return_value=([{'namespace_index': 1, 'identifier': '123'}], None))
-    @patch('buerkert_app.utils.utils.ident_to_io', return_value=None)
-    @patch('json.load')
-    @patch('builtins.open', new_callable=mock_open, read_data='[]')
-    @patch('os.path.isfile', return_value=False)
-    def test_get_possible_sps_conf_list_without_file(self, *_):
+        self.assertEqual(result, [{'use': True, 'sps_port': '123', 'display': 'Druck', 'unit': 'PRESSURE'},
+                                  {'use': False, 'sps_port': '456', 'display': '', 'unit': ''}])
+
+    @patch('buerkert_app.utils.utils.sps_port_scanner')
+    def test_get_possible_sps_conf_list_without_scan(self, mock_scanner):
+        # not scanned yet, last config
+        mock_scanner.get.return_value = None
         result = get_possible_sps_conf_list()
-        self.assertEqual(result, [])
+        self.assertEqual(result, [{'use': True, 'sps_port': '123', 'display': 'Druck', 'unit': 'PRESSURE'}])
+
+
+class TestScanSpsPorts(TestCase):
+
+    @patch('buerkert_app.utils.utils.get_opcua_data', new_callable=AsyncMock,
+           return_value=([{'namespace_index': 1, 'identifier': '123'}, {'namespace_index': 1, 'identifier': '9'}],
+                         []))
+    @patch('buerkert_app.utils.utils.ident_to_io', side_effect=lambda nsidx, ident: ident if ident == '123' else None)
+    async def test_scan_sps_ports(self, *_):
+        self.assertEqual(await scan_sps_ports(), ['123'])
+
+    @patch('buerkert_app.utils.utils.get_opcua_data', new_callable=AsyncMock, return_value=([], ["TimeoutError"]))
+    async def test_scan_sps_ports_unreachable(self, _):
+        with self.assertRaises(ConnectionError):
+            await scan_sps_ports()
+
+
+class TestSpsPortScanner(TestCase):
+
+    @patch('buerkert_app.utils.utils.scan_sps_ports', new_callable=AsyncMock)
+    def test_scan_in_background(self, mock_scan):
+        release = threading.Event()
+        mock_scan.side_effect = lambda: release.wait(5) and ['I-1']
+        scanner = SpsPortScanner(ttl=60)
+        # first access doesn´t wait for the PLC
+        self.assertIsNone(scanner.get())
+        self.assertTrue(scanner.stale)
+        release.set()
+        scanner.rescan(wait=5)
+        self.assertEqual(scanner.get(), ['I-1'])
+        self.assertFalse(scanner.stale)
+        self.assertIsNotNone(scanner.scanned)
+        mock_scan.assert_called_once()
+
+    @patch('buerkert_app.utils.utils.scan_sps_ports', new_callable=AsyncMock, side_effect=ConnectionError("timeout"))
+    def test_scan_failed_keeps_last_ports(self, mock_scan):
+        scanner = SpsPortScanner(ttl=60)
+        scanner.sps_ports = ['I-1']
+        scanner.rescan(wait=5)
+        self.assertEqual(scanner.get(), ['I-1'])
+        self.assertTrue(scanner.stale)
+        self.assertIsInstance(scanner.error, ConnectionError)
+
+    @patch('buerkert_app.utils.utils.scan_sps_ports', new_callable=AsyncMock, return_value=['I-2'])
+    async def test_arescan(self, mock_scan):
+        scanner = SpsPortScanner(ttl=60)
+        # scans in the event loop of the request, a second rescan doesn´t start another scan
+        await asyncio.gather(scanner.arescan(wait=5), scanner.arescan(wait=5))
+        self.assertEqual(scanner.sps_ports, ['I-2'])
+        self.assertFalse(scanner.stale)
+        mock_scan.assert_awaited_once()
 
 
 class TestGetBatchIds(TestCase):
 
-    @patch('buerkert_app.utils.utils.InfluxDBClient')
-    def test_get_batch_ids(self, MockInfluxDBClient):
-        # Arrange
-        mock_influx_client = MagicMock()
-        mock_query_api = MagicMock()
-        mock_data_frame = MagicMock()
-
-        mock_influx_client.query_api.return_value = mock_query_api
-        mock_query_api.query_data_frame.return_value = mock_data_frame
-        MockInfluxDBClient.return_value.__enter__.return_value = mock_influx_client
+    @patch('buerkert_app.utils.utils.import_batches', new_callable=AsyncMock)
+    async def test_get_batch_ids(self, mock_import):
+        await Batch.objects.acreate(batch_id="1", start=timezone.make_aware(datetime.datetime(2023, 1, 1)),
+                                    status=Batch.FINISHED)
+        await Batch.objects.acreate(batch_id="2", start=timezone.make_aware(datetime.datetime(2023, 2, 1)),
+                                    status=Batch.FINISHED)
 
-        mock_data_frame.empty = False
-        mock_data_frame.rename.return_value = mock_data_frame
-        mock_data_frame.sort_values.return_value = mock_data_frame
-        mock_data_frame.drop_duplicates.return_value = mock_data_frame  # you need to mock this method as well
-        batch_list_dict = [{'batch_id': 'id1', 'time': '2023-01-01'}]
-        mock_data_frame.get.return_value.to_dict.return_value = batch_list_dict
+        result = await get_batch_ids()
 
-        # Act
-        result = get_batch_ids()
+        self.assertEqual(result, [{'batch_id': '2', 'time': timezone.make_aware(datetime.datetime(2023, 2, 1)),
+                                   'status': 'Beendet'}])
+        self.assertEqual([batch['batch_id'] for batch in await get_batch_ids(10)], ['2', '1'])
+        mock_import.assert_not_called()
 
-        # Assert
-        self.assertEqual(result, [{'batch_id': 'id1', 'time': '2023-01-01'}])
-        mock_influx_client.query_api.assert_called_once()
-        mock_query_api.query_data_frame.assert_called_once()
-        mock_data_frame.rename.assert_called_once_with(columns={"_time": "time", '_measurement': "batch_id"})
-        mock_data_frame.sort_values.assert_called_once_with(by=['time'], ascending=False)
+    @patch('buerkert_app.utils.utils.import_batches', new_callable=AsyncMock)
+    async def test_get_batch_ids_empty(self, mock_import):
+        # empty catalog is filled from the InfluxDB once
+        with self.assertRaises(InfluxDBError):
+            await get_batch_ids()
+        mock_import.assert_awaited_once()
 
 
 class TestGetLastBatchID(TestCase):
 
-    @patch('buerkert_app.utils.utils.get_batch_ids')
-    def test_get_last_batch_id(self, mock_get_batch_ids):
+    @patch('buerkert_app.utils.utils.get_batch_ids', new_callable=AsyncMock)
+    async def test_get_last_batch_id(self, mock_get_batch_ids):
         # Arrange
         mock_get_batch_ids.return_value = [{'batch_id': '10'}, {'batch_id': '20'}, {'batch_id': '30'}]
 
         # Act
-        result = get_last_batch_id()
+        result = await get_last_batch_id()
 
         # Assert
         self.assertEqual(result, 10)
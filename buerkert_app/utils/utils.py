@@ -1,15 +1,19 @@
 import asyncio
+import datetime
 import json
 import os
+import threading
+import time
 import warnings
 
 from asyncua import Client
-from influxdb_client import InfluxDBClient
 from influxdb_client.client.exceptions import InfluxDBError
 from influxdb_client.client.warnings import MissingPivotFunction
 
 from buerkert import settings
-from buerkert.settings import DATABASES, IO_IDENT, SPS_CONF, F_SCHEMA_PATH
+from buerkert.settings import IO_IDENT, SPS_CONF, F_SCHEMA_PATH
+from buerkert_app.models import Batch
+from buerkert_app.utils.batch_catalog import finalize_ended_batches, import_batches
 
 warnings.simplefilter("ignore", MissingPivotFunction)
 
@@ -51,14 +55,92 @@ async def get_opcua_data():
     return results, excs
 
 
+class ConfigFile:
+    """
+    Json file with a list of rows, which is parsed only again when its modification time changes. The rows are
+    indexed once per load, so lookups don´t search the list.
+    """
+
+    def __init__(self, path, default=None, **indexes):
+        """
+        :param path: Path of the json file.
+        :param default: Rows if the file doesn´t exist, None raises FileNotFoundError.
+        :param indexes: Functions which return the key of a row, e.g. sps_port=lambda row: row['sps_port'].
+            The first row of a key wins.
+        """
+        self.path = path
+        self.default = default
+        self.key_functions = indexes
+        self._mtime = None
+        self._loaded = False
+        self._rows = default
+        self._indexes = {}
+        self._lock = threading.Lock()
+
+    def load(self):
+        """
+         Reads the file again if its modification time changed since the last load, else only one stat call.
+
+        :return: None
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            if self.default is None:
+                raise
+            mtime = None
+        if self._loaded and mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime is None:
+                rows = self.default
+            else:
+                with open(self.path, "r") as fd:
+                    rows = json.load(fd)
+            indexes = {name: {} for name in self.key_functions}
+            for row in rows:
+                for name, key in self.key_functions.items():
+                    indexes[name].setdefault(key(row), row)
+            # replace all at once, concurrent requests see either the old or the new rows
+            self._rows, self._indexes, self._mtime, self._loaded = rows, indexes, mtime, True
+
+    def rows(self):
+        """
+        :return: The rows of the file, shared by all callers and must not be changed.
+        """
+        self.load()
+        return self._rows
+
+    def index(self, name):
+        """
+        :param name: Name of the index.
+        :return: Dictionary with the keys of the index and the first row of each key.
+        """
+        self.load()
+        return self._indexes[name]
+
+    def invalidate(self):
+        """
+         Forces a reload on the next access, e.g. after the file was written.
+
+        :return: None
+        """
+        self._loaded = False
+
+
+# registry of the config files, loaded once and reloaded when they change
+io_ident_config = ConfigFile(IO_IDENT, sps_port=lambda row: row['sps_port'],
+                             ident=lambda row: (row['namespace_index'], row['identifier']))
+sps_conf_config = ConfigFile(SPS_CONF, default={}, sps_port=lambda row: row.get('sps_port'))
+
+
 def get_io_ident():
     """
-    Reads the IO_IDENT file and returns its contents as a JSON object.
+    Returns the contents of the IO_IDENT file, parsed again only if the file changed.
 
-    :return: The contents of the IO_IDENT file as a JSON object.t
+    :return: The contents of the IO_IDENT file as a JSON object.
     """
-    with open(IO_IDENT, "r") as fd:
-        return json.load(fd)
+    return io_ident_config.rows()
 
 
 def io_to_ident(io, **kwargs):
@@ -67,10 +149,8 @@ def io_to_ident(io, **kwargs):
     :param kwargs: Additional keyword arguments if needed (not used in this method)
     :return: A tuple containing the 'namespace_index' and 'identifier' values for the matched 'sps_port' in the io_list
     """
-    io_list = get_io_ident()
-    for row in io_list:
-        if io == row['sps_port']:
-            return row['namespace_index'], row['identifier']
+    if row := io_ident_config.index("sps_port").get(io):
+        return row['namespace_index'], row['identifier']
 
 
 def ident_to_io(namespace_index, identifier, **kwargs):
@@ -82,10 +162,8 @@ def ident_to_io(namespace_index, identifier, **kwargs):
     :param kwargs: Additional keyword arguments.
     :return: The SPS port associated with the identifier and namespace index.
     """
-    io_list = get_io_ident()
-    for row in io_list:
-        if namespace_index == row['namespace_index'] and identifier == row['identifier']:
-            return row['sps_port']
+    if row := io_ident_config.index("ident").get((namespace_index, identifier)):
+        return row['sps_port']
 
 
 def idents_to_ios(idents):
@@ -96,17 +174,14 @@ def idents_to_ios(idents):
         Each dictionary must have the following keys:
         - 'namespace_index': The namespace index of the identifier.
         - 'identifier': The identifier value.
-    :return: A list of dictionaries representing the converted I/O values. Each dictionary will have the following keys:
+    :return: A list of dictionaries representing the converted I/O values in the order of the IO_IDENT file.
+        Each dictionary will have the following keys:
         - 'value': The value of the identifier.
         - 'sps_port': The corresponding SPS port for the identifier.
     """
-    io_list = get_io_ident()
-    results = []
-    for row in io_list:
-        for ident in idents:
-            if ident['namespace_index'] == row['namespace_index'] and ident['identifier'] == row['identifier']:
-                results.append({"value": ident['value'], "sps_port": row['sps_port']})
-    return results
+    values = {(ident['namespace_index'], ident['identifier']): ident['value'] for ident in idents}
+    return [{"value": values[key], "sps_port": row['sps_port']} for key, row in io_ident_config.index("ident").items()
+            if key in values]
 
 
 def save_conf_list(conf_list):
@@ -118,6 +193,7 @@ def save_conf_list(conf_list):
     """
     with open(SPS_CONF, "w") as fd:
         json.dump(conf_list, fd, indent=1)
+    sps_conf_config.invalidate()
 
 
 def io_to_display(sps_port, **kwargs):
@@ -129,11 +205,7 @@ def io_to_display(sps_port, **kwargs):
     corresponding to the given SPS port number in the configuration list. Returns an empty dictionary if no match is
     found.
     """
-    conf_list = get_sps_conf_list()
-    if disp_list := list(filter(lambda conf: conf.get('sps_port') == sps_port, conf_list)):
-        return disp_list[0]
-    else:
-        return {}
+    return sps_conf_config.index("sps_port").get(sps_port, {})
 
 
 def ios_to_displays(io_list, **kwargs):
@@ -142,106 +214,192 @@ def ios_to_displays(io_list, **kwargs):
     :param kwargs: Optional keyword arguments.
     :return: List of dictionaries representing displays.
     """
-    conf_list = get_sps_conf_list()
-    results = []
-    for ios in io_list:
-        if disp_list := list(filter(lambda conf: conf.get('sps_port') == ios.get("sps_port"), conf_list)):
-            display = {**disp_list[0], "value": ios['value']}
-            results.append(display)
-    return results
+    displays = sps_conf_config.index("sps_port")
+    return [{**displays[ios.get("sps_port")], "value": ios['value']} for ios in io_list
+            if ios.get("sps_port") in displays]
 
 
 def get_sps_conf_list():
     """
-     Returns a dictionary containing the contents of the SPS_CONF file.
+     Returns the contents of the SPS_CONF file, parsed again only if the file changed.
 
     :return: A dictionary with the contents of the SPS_CONF file.
     """
-    if os.path.isfile(SPS_CONF):
-        with open(SPS_CONF, "r") as fd:
-            return json.load(fd)
-    return {}
+    return sps_conf_config.rows()
+
+
+async def scan_sps_ports():
+    """
+     Browses the OPC-UA server for the sps ports, which are in the namespace of the server and connected to a
+    namespace in io_ident.json.
+
+    :return: A list of the found sps ports.
+    :raises ConnectionError: If the OPC-UA server returned no values.
+    """
+    # connect to opcua and get data
+    values, excs = await get_opcua_data()
+    if not values:
+        raise ConnectionError(excs[0] if excs else "OPC-UA Server lieferte keine Werte")
+    # get sps port from namespace if given
+    return [ident for value in values if (ident := ident_to_io(value['namespace_index'], value['identifier']))]
+
+
+async def wait_event(event, timeout):
+    """
+     Waits for a threading.Event of a background thread, without blocking the event loop.
+
+    :param event: The threading.Event.
+    :param timeout: Seconds to wait at most.
+    :return: True if the event is set.
+    """
+    deadline = time.monotonic() + timeout
+    while not event.is_set() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    return event.is_set()
+
+
+def merge_sps_conf(sps_ports):
+    """
+    :param sps_ports: List of sps ports.
+    :return: A list of SPS configurations, with the settings of the last config or as new unused sps port.
+    """
+    last_conf = sps_conf_config.index("sps_port")
+    return [dict(last_conf.get(sps_port) or {"use": False, "sps_port": sps_port, "display": "", "unit": ""})
+            for sps_port in sps_ports]
+
+
+class SpsPortScanner:
+    """
+    Cache of the sps ports found on the OPC-UA server. The browse runs in a background thread and is repeated after
+    the ttl, so pages never wait for the PLC. Until the first successful scan or while the PLC is unreachable the
+    last result, or the last saved config, is used and marked as stale.
+    """
+
+    def __init__(self, ttl=300, retry=30):
+        """
+        :param ttl: Seconds a successful scan is valid.
+        :param retry: Seconds until a failed scan is repeated.
+        """
+        self.ttl = ttl
+        self.retry = retry
+        self.sps_ports = None
+        # time of the last successful scan and exception of the last scan, if it failed
+        self.scanned = None
+        self.error = None
+        self._expires = 0
+        self._scanning = False
+        self._done = threading.Event()
+        # reference of a scan running in an event loop of a request
+        self._task = None
+        self._lock = threading.Lock()
+
+    @property
+    def stale(self):
+        return self.sps_ports is None or self.error is not None or time.monotonic() >= self._expires
+
+    def get(self):
+        """
+         Returns the cached sps ports and starts a new scan in the background if they expired.
+
+        :return: The list of the found sps ports, None if there was no successful scan yet.
+        """
+        if time.monotonic() >= self._expires:
+            self.rescan()
+        return self.sps_ports
+
+    def rescan(self, wait=0):
+        """
+         Starts a scan in a background thread, if none is running.
+
+        :param wait: Seconds to wait for the scan.
+        :return: None
+        """
+        if self._begin():
+            threading.Thread(target=asyncio.run, args=(self._scan(),), name="sps-port-scanner", daemon=True).start()
+        if wait:
+            self._done.wait(wait)
+
+    async def arescan(self, wait=0):
+        """
+         Starts a scan in the running event loop, if none is running, and waits for it without blocking a thread.
+
+        :param wait: Seconds to wait for the scan.
+        :return: None
+        """
+        if self._begin():
+            self._task = asyncio.create_task(self._scan())
+        if wait:
+            await wait_event(self._done, wait)
+
+    def _begin(self):
+        with self._lock:
+            if self._scanning:
+                return False
+            self._scanning = True
+            self._done.clear()
+            return True
+
+    async def _scan(self):
+        try:
+            self.sps_ports = await scan_sps_ports()
+            self.scanned = datetime.datetime.now()
+            self.error = None
+            self._expires = time.monotonic() + self.ttl
+        except Exception as e:
+            self.error = e
+            self._expires = time.monotonic() + self.retry
+        finally:
+            with self._lock:
+                self._scanning = False
+                self._task = None
+            self._done.set()
+
+
+sps_port_scanner = SpsPortScanner(settings.SPS_SCAN_TTL)
 
 
 def get_possible_sps_conf_list():
     """
     Get every possible sps, possible sps are which are in namespace from opcua server and
-     connection from namespace to sps in io_ident.json. saves the last config in last_config.json, and updates
-     these if necessary
+     connection from namespace to sps in io_ident.json. The sps ports are cached by the sps_port_scanner,
+     the settings come from the last config
 
-    :return: A list of possible SPS configurations.
+    :return: A list of possible SPS configurations, the last config if the OPC-UA server wasn´t scanned yet.
     """
-    # connect to opcua and get data
-    loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(loop)
-    loop = asyncio.get_event_loop()
-    values, _ = loop.run_until_complete(get_opcua_data())
-    loop.close()
-
-    # open last config or create
-    if os.path.isfile(SPS_CONF):
-        with open(SPS_CONF, "r") as fd:
-            last_conf = json.load(fd)
-    else:
-        last_conf = []
-    sps_conf = []
-
-    for value in values:
-        # get sps port from namespace if given
-        if not (ident := ident_to_io(value['namespace_index'], value['identifier'])):
-            continue
-        # check if the sps port has a display name from last time
-        if last_confs := list(filter(lambda conf: conf.get('sps_port') == ident, last_conf)):
-            sps_conf.extend(last_confs)
-        else:
-            # else, append as new sps port
-            sps_conf.append({"use": False, "sps_port": ident, "display": "", "unit": ""})
-
-    # if connection to opcua server, return new conf, else last config
-    if values:
-        return sps_conf
-    else:
-        return last_conf
-
-
-def get_batch_ids(max_ids=1):
-    """
-     Retrieve a list of batch IDs from InfluxDB.
+    if (sps_ports := sps_port_scanner.get()) is None:
+        # if no connection to opcua server yet, last config
+        return [dict(conf) for conf in get_sps_conf_list()]
+    return merge_sps_conf(sps_ports)
+
+
+async def get_batch_ids(max_ids=1):
+    """
+     Retrieve a list of the latest batch IDs from the batch catalog. Batches which ended are finalized first, an empty
+    catalog is filled once with the batches in the InfluxDB.
 
     :param max_ids: Maximum number of batch IDs to retrieve. Default is 1.
     :type max_ids: int
-    :return: List of dictionaries containing batch IDs and times.
+    :return: List of dictionaries containing batch IDs and start times.
     :rtype: list[dict]
-    :raises InfluxDBError: If no data is found in InfluxDB.
-    """
-    with InfluxDBClient(**DATABASES["influx"]) as client:
-        query_api = client.query_api()
-        query = f'''
-        from(bucket: "{DATABASES["influx"]["bucket"]}")
-          |> range(start: -6mo)
-          |> group(columns: ["_measurement"])
-          |> min(column: "_time")
-          |> sort(columns: ["_time"], desc: true)
-        '''
-        # if the is no data, raise error to display in message
-        if (df := query_api.query_data_frame(query)).empty:
-            raise InfluxDBError(message="No Data found")
-        # rename columns for better usage and sort after the newest
-        df = df.rename(columns={"_time": "time", '_measurement': "batch_id"})
-        df = df.sort_values(by=['time'], ascending=False).drop_duplicates(subset=['batch_id'])
-        # return as many id as needed or all
-        if len(batch_list := df.get(["batch_id", "time"]).to_dict('records')) > max_ids:
-            batch_list = batch_list[:max_ids]
-        return batch_list
-
-
-def get_last_batch_id():
+    :raises InfluxDBError: If there are no batches.
+    """
+    await finalize_ended_batches()
+    if not await Batch.objects.aexists():
+        await import_batches()
+    # if the is no data, raise error to display in message
+    if not (batches := [batch async for batch in Batch.objects.all()[:max_ids]]):
+        raise InfluxDBError(message="No Data found")
+    return [{"batch_id": batch.batch_id, "time": batch.start, "status": batch.get_status_display()}
+            for batch in batches]
+
+
+async def get_last_batch_id():
     """
     Retrieve the last batch ID from the list of batch IDs.
 
     :return: The last batch ID as an integer.
     """
-    return int(get_batch_ids()[0]["batch_id"])
+    return int((await get_batch_ids())[0]["batch_id"])
 
 
 def handle_uploaded_file(file):
@@ -256,4 +414,4 @@ def handle_uploaded_file(file):
 
 # for test usage
 if __name__ == "__main__":
-    get_last_batch_id()
+    asyncio.run(get_last_batch_id())
@@ -1,50 +1,53 @@
-import asyncio
-
+from asgiref.sync import sync_to_async
 from django import forms
 from django.contrib import messages
 from django.core.exceptions import ValidationError
 from django.shortcuts import render
 from django.views import View
 
-from buerkert_app.utils.collector_utils import is_container_running
-from buerkert_app.utils.utils import get_opcua_data, ios_to_displays, idents_to_ios, handle_uploaded_file
+from buerkert_app.utils.collector_utils import is_container_running, get_collector_metrics
+from buerkert_app.utils.live_poller import live_poller
+from buerkert_app.utils.utils import ios_to_displays, idents_to_ios, handle_uploaded_file
 
 
 class LiveView(View):
 
-    def get(self, request):
+    async def get(self, request):
         """
          Method to render the live view page or return live data as table for htmx request.
 
         :param request: The HTTP request object.
         :return: The rendered HTML for the live view page or datatable snippet.
         """
+        if request.htmx and request.GET.get("metrics"):
+            # runtime metrics of the running collector
+            try:
+                context = {"metrics": await get_collector_metrics()}
+            except Exception as e:
+                context = {"metrics_message": f"Collector Metriken nicht erreichbar: {e}"}
+            return render(request, "snippets/collector_metrics.html", context)
         if request.htmx:
-            # establish Connection to opcua server, read data and return rendered table
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop = asyncio.get_event_loop()
-            values, opc_messages = loop.run_until_complete(get_opcua_data())
-            loop.close()
-            io_list = idents_to_ios(values)
+            # render the latest values of the shared poller, no connection to the opcua server per request
+            snapshot = await live_poller.aget_snapshot()
+            io_list = idents_to_ios(snapshot['values'])
             display_list = ios_to_displays(io_list)
             display_list = sorted(display_list, key=lambda x: x['sps_port'])
-            context = {"values": display_list, "opc_messages": opc_messages}
+            context = {"values": display_list, "opc_messages": snapshot['messages'], "updated": snapshot['time']}
             return render(request, "snippets/data_values.html", context)
 
         context = {}
         batch = None
         running = None
         try:
-            # check if container is running, for title
-            batch, running = is_container_running()
+            # check if container is running, for title, the docker client is blocking
+            batch, running = await sync_to_async(is_container_running, thread_sensitive=False)()
         except Exception as e:
             messages.error(request, e)
         form = UploadFileForm()
         context.update({"batch": batch, "running": running, "form": form})
         return render(request, "buerkert_app/live_view.html", context)
 
-    def post(self, request):
+    async def post(self, request):
         """
          Method to save File and reloads page with new file.
 
@@ -59,7 +62,7 @@ class LiveView(View):
         else:
             for error in form.errors['file']:
                 messages.error(request, error)
-        return self.get(request)
+        return await self.get(request)
 
 
 class UploadFileForm(forms.Form):
@@ -1,5 +1,6 @@
 import datetime
 
+from asgiref.sync import sync_to_async
 from bootstrap_datepicker_plus.widgets import DateTimePickerInput
 from django import forms
 from django.contrib import messages
@@ -10,12 +11,13 @@ from django.views import View
 from buerkert.settings import DATE_FORMAT
 from buerkert_app.utils.collector_utils import stop_container, is_container_running, create_container, \
     create_config_file, start_container
-from buerkert_app.utils.utils import save_conf_list, get_batch_ids, get_possible_sps_conf_list
+from buerkert_app.utils.batch_catalog import get_next_batch_id
+from buerkert_app.utils.utils import save_conf_list, get_batch_ids, get_possible_sps_conf_list, sps_port_scanner
 from res.units import Units
 
 
 class StartView(View):
-    def get(self, request):
+    async def get(self, request):
         """
          Method to render the start view page, with option to stop container.
 
@@ -24,33 +26,36 @@ class StartView(View):
         """
         # if stop, stop container and reload
         if request.GET.get("stop"):
-            stop_container()
+            await sync_to_async(stop_container)()
+            return redirect('start')
+        # browse the opcua server again, wait shortly so the result is shown after the reload
+        if request.GET.get("rescan"):
+            await sps_port_scanner.arescan(wait=5)
             return redirect('start')
         context = {}
         recent_batches = []
         batch = None
-        new_id = ""
         running = None
         # check if container is running, for title
         try:
-            batch, running = is_container_running()
+            batch, running = await sync_to_async(is_container_running, thread_sensitive=False)()
         except Exception as e:
             messages.error(request, e)
         try:
-            # get last batches, for last batch list and next batch_id
-            recent_batches = get_batch_ids(10)
-            last_id = int(max([batch['batch_id'] for batch in recent_batches]))
-            new_id = last_id + 1
+            # get last batches from the batch catalog, for last batch list
+            recent_batches = await get_batch_ids(10)
         except Exception as e:
             messages.error(request, e)
+        # next batch_id, also if there are no batches yet
+        new_id = await get_next_batch_id()
         form = BatchForm(initial={"batch_id": new_id, "start": datetime.datetime.now()})
         # fill sps form with data from the last run
         formset = ConfFormSet(initial=get_possible_sps_conf_list())
         context.update({"form": form, "formset": formset, "batch": batch, "running": running,
-                        "recent_batches": recent_batches})
+                        "recent_batches": recent_batches, "scanner": sps_port_scanner})
         return render(request, "buerkert_app/start_view.html", context)
 
-    def post(self, request):
+    async def post(self, request):
         """
          Method to redirect the start view page, with option to save sps-settings and start container.
 
@@ -76,6 +81,8 @@ class StartView(View):
             batch_id = form.cleaned_data['batch_id']
             # create new dict, to not change original dict
             batch_dict = form.cleaned_data.copy()
+            # sample interval is only part of the collector config, not of the container labels
+            batch_dict.pop('sample_interval')
             # format time für collector usage
             batch_dict['start'] = batch_dict['start'].strftime(DATE_FORMAT)
             batch_dict['end'] = batch_dict['end'].strftime(DATE_FORMAT) if batch_dict['end'] else None
@@ -85,11 +92,11 @@ class StartView(View):
             try:
                 # create container config and create and start container, then show live page
                 create_config_file(form.cleaned_data, formset.cleaned_data)
-                created, _ = create_container(**form.cleaned_data)
+                created, _ = await sync_to_async(create_container)(**form.cleaned_data)
                 if not created:
                     raise Exception("Ein Batch befindet sich in der Warteschlange")
 
-                start_container(batch_dict=batch_dict)
+                await sync_to_async(start_container)(batch_dict=batch_dict)
                 messages.success(request, f"Aufzeichnung für Batch-ID {batch_id} gestartet")
                 return redirect('live')
             except Exception as e:
@@ -98,13 +105,14 @@ class StartView(View):
             messages.error(request, "Ungültige Eingabe")
 
         context.update({"form": form, "formset": formset})
-        return self.get(request)
+        return await self.get(request)
 
 
 class BatchForm(forms.Form):
     batch_id = forms.CharField(label="Batch-ID", required=False)
     start = forms.DateTimeField(label="Beginn", widget=DateTimePickerInput())
     end = forms.DateTimeField(label="Ende", widget=DateTimePickerInput(range_from='start'), required=False)
+    sample_interval = forms.IntegerField(label="Abtastintervall [ms]", min_value=100, initial=1000)
 
 
 class ConfForm(forms.Form):
@@ -113,6 +121,11 @@ class ConfForm(forms.Form):
     sps_port = forms.CharField(label="SPS I/O PORT")
     display = forms.CharField(label="Anzeige Name")
     unit = forms.ChoiceField(label="Einheit", choices=[x.choice() for x in Units])
+    # values are only written if they change more than the deadband, empty for every change,
+    # states and angles are always written on every change
+    deadband = forms.FloatField(label="Totband", min_value=0, required=False)
+    deadband_type = forms.ChoiceField(label="Totband Typ", initial="absolute", required=False,
+                                      choices=[("absolute", "Absolut"), ("percent", "Relativ [%]")])
 
 
 # creates as many copy of ConfForm as namespace with sps-config are in io_ident.json defined
@@ -1,4 +1,4 @@
-from unittest.mock import patch
+from unittest.mock import patch, AsyncMock
 
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase, RequestFactory
@@ -11,22 +11,43 @@ class TestLiveView(TestCase):
         self.factory = RequestFactory()
         self.view = LiveView()
 
-    @patch("buerkert_app.views.live_view.get_opcua_data")
-    def test_get_htmx(self, mock_get_data):
-        mock_get_data.return_value = ([], [])
+    @patch("buerkert_app.views.live_view.live_poller")
+    async def test_get_htmx(self, mock_poller):
+        mock_poller.aget_snapshot = AsyncMock(return_value={"values": [], "messages": [], "time": None})
         request = self.factory.get('/')
         request.htmx = True
-        response = self.view.get(request)
+        response = await self.view.get(request)
         self.assertEqual(response.status_code, 200)
+        mock_poller.aget_snapshot.assert_awaited_once()
 
-    def test_get_not_htmx(self):
+    @patch("buerkert_app.views.live_view.get_collector_metrics", new_callable=AsyncMock)
+    async def test_get_htmx_metrics(self, mock_get_metrics):
+        mock_get_metrics.return_value = {"stages": {"opc_read": 1.5, "mapping": 0.1, "influx_write": 3.0},
+                                         "cycles": 10, "overruns": 1, "skipped_ticks": 2, "points_written": 120,
+                                         "points_dropped": 0, "spool_lines": 0, "reconnects": 0, "last_sample": None}
+        request = self.factory.get('/', {"metrics": 1})
+        request.htmx = True
+        response = await self.view.get(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Überläufe: 1 (2 übersprungen)", response.content.decode())
+
+    @patch("buerkert_app.views.live_view.get_collector_metrics", new_callable=AsyncMock)
+    async def test_get_htmx_metrics_unreachable(self, mock_get_metrics):
+        mock_get_metrics.side_effect = ConnectionError("refused")
+        request = self.factory.get('/', {"metrics": 1})
+        request.htmx = True
+        response = await self.view.get(request)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Collector Metriken nicht erreichbar: refused", response.content.decode())
+
+    async def test_get_not_htmx(self):
         request = self.factory.get('/')
         request.htmx = False
-        response = self.view.get(request)
+        response = await self.view.get(request)
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'buerkert_app/live_view.html')
 
-    def test_post_valid_form(self):
+    async def test_post_valid_form(self):
         file_data = b'This is a test file.'
         test_file = SimpleUploadedFile('test_file.png', file_data)
         data = {"file": test_file}
@@ -34,12 +55,12 @@ class TestLiveView(TestCase):
         request = self.factory.post('/', data)
         request.FILES["file"] = test_file
 
-        response = self.view.post(request)
+        response = await self.view.post(request)
         self.assertEqual(response.status_code, 200)
 
-    def test_post_invalid_form(self):
+    async def test_post_invalid_form(self):
         data = {"file": ""}
 
         request = self.factory.post('/', data)
-        response = self.view.post(request)
+        response = await self.view.post(request)
         self.assertEqual(response.status_code, 200)
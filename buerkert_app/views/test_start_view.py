@@ -9,18 +9,18 @@ class StartViewTest(TestCase):
         self.factory = RequestFactory()
         self.url = reverse('start')
 
-    def test_start_view_get(self):
+    async def test_start_view_get(self):
         request = self.factory.get(self.url)
 
-        response = StartView.as_view()(request)
+        response = await StartView.as_view()(request)
 
         self.assertEqual(response.status_code, 200)
         self.assertTemplateUsed(response, 'buerkert_app/start_view.html')
 
-    def test_start_view_post(self):
+    async def test_start_view_post(self):
         data = {}
         request = self.factory.post(self.url, data)
 
-        response = StartView.as_view()(request)
+        response = await StartView.as_view()(request)
 
         self.assertEqual(response.status_code, 302)
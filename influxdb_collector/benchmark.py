@@ -0,0 +1,266 @@
+import argparse
+import asyncio
+import datetime
+import gzip
+import json
+import os
+import platform
+import resource
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from collector import collector
+from simulator import expand_io_ident, IO_IDENT
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BATCH_ID = "1"
+
+
+class InfluxSink:
+    """
+    Local HTTP server which answers like the write endpoint of InfluxDB. Instead of keeping the request bodies it
+    records per timestamp the number of points and the time the last point arrived, so the end-to-end latency of
+    every cycle is known.
+    """
+
+    def __init__(self, precision="ms"):
+        """
+        :param precision: Write precision of the collector, to convert the timestamps of the lines.
+        """
+        self.divisor = {"ns": 1e9, "us": 1e6, "ms": 1e3, "s": 1}[precision]
+        self.points = 0
+        self.bytes = 0
+        # timestamp of the line -> [points, arrival of the last point in unix seconds]
+        self.cycles = {}
+        self._lock = threading.Lock()
+        sink = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                arrival = time.time()
+                if self.headers.get('Content-Encoding') == "gzip":
+                    body = gzip.decompress(body)
+                sink.record(body, arrival)
+                self.send_response(204)
+                self.end_headers()
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_port}"
+        threading.Thread(target=self.server.serve_forever, name="sink", daemon=True).start()
+
+    def record(self, body, arrival):
+        """
+        :param body: Decompressed line protocol of one write request.
+        :param arrival: Unix time the request arrived.
+        :return: None
+        """
+        lines = body.splitlines()
+        with self._lock:
+            self.points += len(lines)
+            self.bytes += len(body)
+            for line in lines:
+                cycle = self.cycles.setdefault(line.rsplit(b" ", 1)[1], [0, 0])
+                cycle[0] += 1
+                cycle[1] = arrival
+
+    def latencies(self):
+        """
+        :return: List of seconds from every tick until its last point arrived.
+        """
+        with self._lock:
+            return [arrival - int(timestamp) / self.divisor for timestamp, (_, arrival) in self.cycles.items()]
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def scrape(port):
+    """
+    :param port: Metrics port of the collector.
+    :return: Dictionary with the samples of the metrics endpoint, e.g. 'collector_cycles_total' or
+        'collector_stage_seconds_sum{stage="opc_read"}'.
+    """
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics", timeout=5) as response:
+        text = response.read().decode()
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    return samples
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, round(percent / 100 * (len(values) - 1)))]
+
+
+async def run_case(io_ident, channels, sample_interval, duration, mode, compression, trace_memory):
+    """
+     Runs the collector against the simulator and the sink for one channel count and sample interval.
+
+    :param io_ident: io_ident.json of the plant, scaled to the channel count.
+    :param channels: Number of channels.
+    :param sample_interval: Sample interval of the collector in milliseconds.
+    :param duration: Seconds the collector runs.
+    :param mode: Acquisition mode, 'poll' or 'subscription'.
+    :param compression: True to enable the deadband compression.
+    :param trace_memory: True to measure the allocations with tracemalloc, slows down the collector.
+    :return: Dictionary with the results of the case.
+    """
+    io_ident = expand_io_ident(io_ident, channels)
+    # stop request of the last case
+    if os.path.isfile("res/collector_control.json"):
+        os.remove("res/collector_control.json")
+    with open("res/io_ident.json", "w") as fd:
+        json.dump(io_ident, fd)
+    endpoint = f"opc.tcp://127.0.0.1:{free_port()}/freeopcua/server/"
+    # simulator in its own process, so it doesn´t share the event loop and the GIL with the collector
+    simulator = subprocess.Popen([sys.executable, "-u", os.path.join(HERE, "simulator.py"), "--io-ident",
+                                  "res/io_ident.json", "--endpoint", endpoint,
+                                  "--rate", str(1000 / sample_interval)],
+                                 stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    sink = InfluxSink()
+    metrics_port = free_port()
+    try:
+        # wait until the address space is served
+        await asyncio.to_thread(simulator.stdout.readline)
+        sps_list = [{"use": True, "sps_port": row['sps_port'], "display": row['sps_port'], "unit": "VALUE"}
+                    for row in io_ident]
+        conf = dict(batch_id=BATCH_ID, sps_list=sps_list, io_ident=io_ident, url=endpoint,
+                    db={"url": sink.url, "org": "benchmark", "token": "benchmark", "bucket": "benchmark"},
+                    acquisition={"mode": mode, "publishing_interval": sample_interval, "precision": "ms",
+                                 "compression": compression, "heartbeat": 60},
+                    sample_interval=sample_interval, metrics_port=metrics_port)
+
+        async def stop():
+            await asyncio.sleep(duration)
+            samples = await asyncio.to_thread(scrape, metrics_port)
+            with open("res/collector_control.json", "w") as fd:
+                json.dump({"batch_id": BATCH_ID, "stop": True}, fd)
+            return samples
+
+        if trace_memory:
+            tracemalloc.start()
+        memory_start = tracemalloc.get_traced_memory()[0]
+        started = time.monotonic()
+        _, samples = await asyncio.gather(collector(**conf), stop())
+        elapsed = time.monotonic() - started
+        memory_end, memory_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        # the writer flushes its remaining points on close, give the sink time to receive them
+        await asyncio.sleep(0.5)
+    finally:
+        simulator.terminate()
+        simulator.wait()
+        sink.close()
+
+    cycles = samples.get('collector_cycles_total', 0)
+    latencies = sink.latencies()
+    stages = {}
+    for stage in ("opc_read", "mapping", "influx_write"):
+        count = samples.get(f'collector_stage_seconds_count{{stage="{stage}"}}')
+        stages[stage] = samples[f'collector_stage_seconds_sum{{stage="{stage}"}}'] / count if count else None
+    # rate over the scheduled time of the cycles including skipped ticks, the tick after the stop request doesn´t
+    # read values anymore
+    ticks = cycles + samples.get('collector_skipped_ticks_total', 0)
+    points_per_second = sink.points / (ticks * sample_interval / 1000) if ticks else 0.0
+    return {
+        "channels": channels,
+        "sample_interval_ms": sample_interval,
+        "mode": mode,
+        "compression": compression,
+        "duration_s": round(elapsed, 3),
+        "cycles": cycles,
+        "overruns": samples.get('collector_overruns_total', 0),
+        "skipped_ticks": samples.get('collector_skipped_ticks_total', 0),
+        "points": sink.points,
+        "points_per_second": round(points_per_second, 1),
+        "expected_points_per_second": round(channels * 1000 / sample_interval, 1),
+        "bytes_per_point": round(sink.bytes / sink.points, 1) if sink.points else None,
+        "cycle_latency_s": {"p50": percentile(latencies, 50), "p95": percentile(latencies, 95),
+                            "max": max(latencies, default=None),
+                            "mean": statistics.fmean(latencies) if latencies else None},
+        "stage_mean_s": stages,
+        "memory_per_cycle_bytes": round((memory_end - memory_start) / cycles) if trace_memory and cycles else None,
+        "memory_peak_bytes": memory_peak - memory_start if trace_memory else None,
+        # overruns mean the collector can´t keep the rate, the points are then stamped with later ticks
+        "sustained": not samples.get('collector_overruns_total') and
+        points_per_second >= 0.95 * channels * 1000 / sample_interval,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=HERE, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args):
+    with open(args.io_ident, "r") as fd:
+        io_ident = json.load(fd)
+    # control file, spool and io_ident of the runs stay in a temporary directory instead of the shared res volume
+    os.chdir(tempfile.mkdtemp(prefix="collector_benchmark_"))
+    os.makedirs("res")
+    results = []
+    for channels in args.channels:
+        for sample_interval in args.intervals:
+            print(f"benchmark {channels} channels every {sample_interval}ms for {args.duration}s")
+            result = await run_case(io_ident, channels, sample_interval, args.duration, args.mode,
+                                    args.compression, not args.no_memory)
+            print(json.dumps(result))
+            results.append(result)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput benchmark of the collector against the plant simulator")
+    parser.add_argument("--io-ident", default=IO_IDENT,
+                        help="io_ident.json which is scaled to the channel counts")
+    parser.add_argument("--channels", type=int, nargs="+", default=[12, 1000, 10000])
+    parser.add_argument("--intervals", type=int, nargs="+", default=[1000, 100], help="sample intervals in ms")
+    parser.add_argument("--duration", type=float, default=30, help="seconds per case")
+    parser.add_argument("--mode", choices=["poll", "subscription"], default="poll")
+    parser.add_argument("--compression", action="store_true", help="enable the deadband compression")
+    parser.add_argument("--no-memory", action="store_true", help="don´t trace allocations, less overhead")
+    parser.add_argument("--output", default=os.path.join(HERE, "benchmark_results.jsonl"),
+                        help="results are appended as one json line per run")
+    args = parser.parse_args()
+    args.io_ident = os.path.abspath(args.io_ident)
+    args.output = os.path.abspath(args.output)
+
+    results = asyncio.run(run(args))
+    record = {"commit": git_commit(), "date": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+              "python": platform.python_version(), "machine": platform.machine(), "cpus": os.cpu_count(),
+              "max_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024, "results": results}
+    with open(args.output, "a") as fd:
+        fd.write(json.dumps(record) + "\n")
+    print(f"results appended to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
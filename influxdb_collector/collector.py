@@ -1,125 +1,123 @@
 import asyncio
 import datetime
 import json
+import signal
 import time
 
-import docker
 import pytz
-from asyncua import Client
-from influxdb_client import InfluxDBClient
-from influxdb_client.client.write_api import SYNCHRONOUS
+
+from compression import Compressor
+from control import ControlFile
+from influx_writer import InfluxWriter
+from line_protocol import encode_lines
+from metrics import Metrics
+from opcua_session import OpcUaSession
+from routing import compile_routes
+from scheduler import FixedRateScheduler
+from snapshot import SnapshotFile
 
 berlin_timezone = pytz.timezone('Europe/Berlin')
 DATE_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
 
 
-def ident_to_io(io_list, obj, ident):
-    """
-    :param io: Input/output value to match against the 'sps_port' field in the io_list
-    :param kwargs: Additional keyword arguments if needed (not used in this method)
-    :return: A tuple containing the 'namespace_index' and 'identifier' values for the matched 'sps_port' in the io_list
+def parse_date(value, default):
     """
-    for row in io_list:
-        if obj == row['namespace_index'] and ident == row['identifier']:
-            return row['sps_port']
-
-
-async def get_opcua_data(url):
+    :param value: Date string in DATE_FORMAT and local time, or None.
+    :param default: Naive datetime used if no value is given.
+    :return: The localized datetime.
     """
-    This method asynchronously retrieves data from an OPC-UA server using the provided URL. It returns a tuple
-    containing the results and any exceptions encountered during the process.
-
-    :param url: The URL of the OPC-UA server.
-    :return: A tuple containing the results and exceptions.
-    """
-    results = []
-    excs = []
+    date = datetime.datetime.strptime(value, DATE_FORMAT) if value else default
+    return berlin_timezone.localize(date)
+
+
+async def collector(batch_id, sps_list, io_ident, url, db, acquisition=None, sample_interval=1000, start=None,
+                    end=None, metrics_port=None):
+    acquisition = acquisition or {"mode": "poll"}
+    subscribe = acquisition['mode'] == "subscription"
+    # schedule is read once, changes and stop requests come through the control file
+    start = parse_date(start, datetime.datetime.min + datetime.timedelta(days=1))
+    end = parse_date(end, datetime.datetime.max - datetime.timedelta(days=1))
+    control = ControlFile(batch_id)
+    # docker stop sends SIGTERM, stop like a request to write the remaining points
+    stopping = asyncio.Event()
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, stopping.set)
+    # same default as COLLECTOR_ACQUISITION of the web app
+    precision = acquisition.get('precision', "ms")
+    # one opcua session for the whole batch, nodes are browsed once, resolved with the routing table and cached
+    session = OpcUaSession(url, compile_routes(io_ident, sps_list, int(batch_id)),
+                           publishing_interval=acquisition.get('publishing_interval') if subscribe else None,
+                           sampling_interval=acquisition.get('sampling_interval'))
+    # points are written in the background, spooled to disk while the database is down
+    writer = InfluxWriter(db, precision=precision)
+    writer.start()
+    # drops unchanged values, None writes every value
+    compressor = Compressor(acquisition['heartbeat']) if acquisition.get('compression') else None
+    # fixed rate ticks, the duration of a cycle doesn´t shift the next one
+    scheduler = FixedRateScheduler(sample_interval / 1000)
+    # stage durations and counters, served on the metrics port
+    metrics = Metrics(batch_id, session, writer, scheduler)
+    if metrics_port:
+        metrics.serve(metrics_port)
+    # latest cycle for the live view of the web app
+    snapshot = SnapshotFile(batch_id)
     try:
-        async with Client(url=url) as client:
-            loop = asyncio.get_event_loop()
-            nodes = await client.get_objects_node().get_children()
-            # first two irrelevant, just generic data
-            for node in nodes[2:]:
-                # read node_name and namespace from node
-                br_name = await node.read_browse_name()
-                node_name = br_name.Name
-                nsidx = br_name.NamespaceIndex
-                # get var name and value from every var in node and append them
-                for var in await node.get_variables():
-                    identifier = var.nodeid.Identifier
-                    name = await var.read_browse_name()
-                    value = await var.read_value()
-                    results.append({"node_name": node_name, "namespace_index": nsidx, "identifier": identifier,
-                                    "variable_name": name.Name, "value": value})
-    except TimeoutError:
-        excs.append(f"TimeoutError: Can´t Connect to OPC-UA Server {url}")
-    except Exception as e:
-        excs.append(e)
-
-    return results, excs
-
-
-def collector(batch_id, sps_list, io_ident, url, db):
-    # connect to docker host
-    client = docker.DockerClient(base_url='unix://var/run/docker.sock')
-    # start loop, break if end time exceeded
-    while True:
-        # get first (and only) influxdb_collector
-        container = list(filter(lambda con: con.name.startswith("influxdb_collector"),
-                                client.containers.list(all=True)))[0]
-        # get and reformat labels
-        name, labels = container.name, container.labels
-        start = datetime.datetime.strptime(labels['start'], DATE_FORMAT)
-        end = datetime.datetime.strptime(labels['end'], DATE_FORMAT) if labels['end'] else \
-            datetime.datetime.max - datetime.timedelta(days=1)
-        start = berlin_timezone.localize(start)
-        end = berlin_timezone.localize(end)
-        now = datetime.datetime.now(berlin_timezone)
-
-        # check if it is time to start the collection
-        if start <= now < end:
-            try:
-                # establish Connection to opcua server and read data
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                loop = asyncio.get_event_loop()
-                values, opc_messages = loop.run_until_complete(get_opcua_data(url))
-                if opc_messages:
-                    raise Exception(opc_messages)
-                loop.close()
-
-                points = []
-                for value in values:
-                    # check if namespace is needed or available
-                    sps_port = ident_to_io(io_ident, value['namespace_index'], value['identifier'])
-                    display_name = list(filter(lambda row: row['sps_port'] == sps_port, sps_list))
-                    # prepare measurement point with batch, display_name, sensor_id, unit and value
-                    if not sps_port or not display_name:
-                        continue
+        # start loop, break if end time exceeded or stop is requested
+        while not stopping.is_set():
+            # wait for the next tick, polled values are stamped with its scheduled time
+            tick = await scheduler.wait()
+            # apply changes from the web app, only a stat call if nothing changed
+            if request := control.poll():
+                if request.get('stop'):
+                    print(f"stop requested for {batch_id}")
+                    break
+                if 'end' in request:
+                    end = parse_date(request['end'], datetime.datetime.max - datetime.timedelta(days=1))
+                    print(f"{batch_id} stops at {end}")
+            now = datetime.datetime.now(berlin_timezone)
+
+            # check if it is time to start the collection
+            if start <= now < end:
+                try:
+                    # read data from the cached nodes or the changes since the last cycle,
+                    # reconnects if the session dropped
+                    with metrics.read_seconds.time():
+                        if subscribe:
+                            values, opc_messages = await session.read_changes()
+                        else:
+                            values, opc_messages = await session.read_values()
+                    if opc_messages:
+                        # changes received before the session dropped are still written
+                        print(opc_messages)
                     else:
-                        display_name = display_name[0]
-                    tags = {"display": display_name['display'], "sensor_id": sps_port}
-                    fields = {display_name['unit']: value['value']}
-                    points.append({"measurement": int(batch_id), "tags": tags, "fields": fields})
-
-                # write all collected Points at once in db
-                with InfluxDBClient(**db) as influxdb_client:
-                    write_api = influxdb_client.write_api(write_options=SYNCHRONOUS)
-                    write_api.write(bucket=db['bucket'], org=db['org'], record=points)
-                    print("Added:")
-                    print(points)
-
-            except Exception as e:
-                print(e)
-        elif end < now:
-            # if end time exceedes, break loop and remove contianer
-            print(f"ending {batch_id}")
-            if container.status == "running":
-                container.kill()
-            else:
-                container.remove()
-        # wait 1 second and restart inside loop
-        time.sleep(1)
+                        metrics.last_sample = time.time()
+                    # latest values for the live view, before unchanged values are dropped
+                    snapshot.update(values, tick)
+
+                    with metrics.mapping_seconds.time():
+                        if compressor:
+                            # unchanged channels of a connected subscription get heartbeats without new value
+                            values = compressor.compress(values, tick, live=subscribe and not opc_messages)
+                        # encode line protocol with batch, display_name, sensor_id, unit and value,
+                        # changes of a subscription have the source timestamp, polled values the tick time
+                        lines = encode_lines(values, tick, precision)
+
+                    # hand all collected lines to the writer, doesn´t wait for the db
+                    if lines:
+                        writer.write(lines)
+                    snapshot.publish(tick, opc_messages)
+
+                except Exception as e:
+                    print(e)
+            elif end < now:
+                # if end time exceedes, break loop, the container removes itself after exiting
+                print(f"ending {batch_id}")
+                break
+    finally:
+        # write remaining points before exiting
+        await session.close()
+        writer.close()
+        metrics.close()
+        snapshot.close()
 
 
 if __name__ == "__main__":
@@ -127,4 +125,4 @@ if __name__ == "__main__":
     with open("res/collector_conf.json", "r") as fd:
         data = json.load(fd)
     print(f"container {data['batch_id']} startet and idle")
-    collector(**data)
+    asyncio.run(collector(**data))
@@ -0,0 +1,64 @@
+from line_protocol import to_ns
+
+# units which only change in steps, every change is written regardless of a deadband
+EXACT_UNITS = {"STATE", "ANGLE"}
+
+
+def is_changed(channel, last, value):
+    """
+    :param channel: The Channel of the value, with unit, deadband and deadband_type.
+    :param last: The last written value of the channel.
+    :param value: The new value.
+    :return: True if the value differs more than the deadband from the last written value.
+    """
+    if channel.unit in EXACT_UNITS or not channel.deadband or isinstance(value, bool) \
+            or not isinstance(value, (int, float)) or not isinstance(last, (int, float)):
+        return value != last
+    if channel.deadband_type == "percent":
+        return abs(value - last) > abs(last) * channel.deadband / 100
+    return abs(value - last) > channel.deadband
+
+
+class Compressor:
+    """
+    Drops values which did not change more than the deadband of their channel since the last written value.
+    Every channel is written again at least once per heartbeat interval with its current value, so a missing
+    heartbeat shows an outage and not a constant value.
+    """
+
+    def __init__(self, heartbeat=60):
+        """
+        :param heartbeat: Maximum seconds between two written values of a channel.
+        """
+        self.heartbeat = round(heartbeat * 1e9)
+        # sps_port -> [channel, current value, last written value, time of last write in ns]
+        self.state = {}
+
+    def compress(self, values, tick, live=False):
+        """
+        :param values: List of dictionaries with 'channel', 'value' and optional 'time' of one cycle.
+        :param tick: Time of the cycle in nanoseconds since epoch.
+        :param live: True if channels without value in this cycle still have their current value, i.e. the
+            subscription is connected. False for polled values and cycles with read errors, then only the channels
+            read in this cycle get a heartbeat.
+        :return: List of the values to write, including heartbeats of unchanged channels.
+        """
+        results = []
+        for value in values:
+            channel = value['channel']
+            time_ns = to_ns(value['time']) if value.get('time') else tick
+            state = self.state.get(channel.sps_port)
+            if state is None or is_changed(channel, state[2], value['value']) or time_ns - state[3] >= self.heartbeat:
+                self.state[channel.sps_port] = [channel, value['value'], value['value'], time_ns]
+                results.append(value)
+            else:
+                state[1] = value['value']
+        if not live:
+            # an outage must stay a gap, not a repeated stale value
+            return results
+        # channels without new value in this cycle, unchanged channels of a subscription
+        for state in self.state.values():
+            if tick - state[3] >= self.heartbeat:
+                state[2], state[3] = state[1], tick
+                results.append({"channel": state[0], "value": state[1]})
+        return results
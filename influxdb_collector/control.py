@@ -0,0 +1,45 @@
+import json
+import os
+
+CONTROL_PATH = "res/collector_control.json"
+
+
+class ControlFile:
+    """
+    Local channel from the web app to the running collector. The web app writes schedule changes and stop requests
+    into a small json file in the shared res volume, the collector only checks its modification time every cycle
+    and reads it again when it changed.
+    """
+
+    def __init__(self, batch_id, path=CONTROL_PATH):
+        """
+        :param batch_id: The ID of the batch, requests for other batches are ignored.
+        :param path: Path of the control file.
+        """
+        self.batch_id = str(batch_id)
+        self.path = path
+        self._mtime = None
+
+    def poll(self):
+        """
+         Checks if the control file changed since the last call.
+
+        :return: Dictionary with the requested changes, e.g. 'end' or 'stop', None if nothing changed.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime == self._mtime:
+            return None
+        self._mtime = mtime
+        try:
+            with open(self.path, "r") as fd:
+                control = json.load(fd)
+        except ValueError:
+            # file is written right now, read again next cycle
+            self._mtime = None
+            return None
+        if str(control.get('batch_id')) != self.batch_id:
+            return None
+        return control
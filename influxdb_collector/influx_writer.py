@@ -0,0 +1,163 @@
+import os
+import queue
+import threading
+import time
+
+from influxdb_client import InfluxDBClient
+from influxdb_client.client.write_api import SYNCHRONOUS
+from influxdb_client.rest import ApiException
+
+from metrics import Histogram
+
+# one spool per precision, the timestamps of spooled lines are written with the precision of the file
+SPOOL_PATH = "res/influx_spool_{precision}.lp"
+
+
+class InfluxWriter(threading.Thread):
+    """
+    Writes points in a background thread, so the acquisition does not wait for the database.
+    Points are buffered and written as gzip compressed line protocol, if the buffer is full or the flush interval
+    is over. If the database can´t be reached, the batch is appended to a spool file, which is replayed in order
+    as soon as the database is back.
+    """
+
+    def __init__(self, db, precision="ns", batch_size=5000, flush_interval=1.0, retry_interval=5.0,
+                 spool_path=SPOOL_PATH):
+        """
+        :param db: Dictionary with url, org, token and bucket of the InfluxDB.
+        :param precision: Precision of the timestamps in the written lines.
+        :param batch_size: Maximum number of lines written in one request.
+        :param flush_interval: Maximum seconds a point stays in the buffer.
+        :param retry_interval: Seconds to wait after a failed write before the database is tried again.
+        :param spool_path: Path of the append-only spool file for the time the database can´t be reached.
+        """
+        super().__init__(name="influx_writer", daemon=True)
+        self.db = db
+        self.precision = precision
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.retry_interval = retry_interval
+        self.spool_path = spool_path.format(precision=precision)
+        self.queue = queue.Queue()
+        self._closed = threading.Event()
+        self._retry_at = 0
+        # counters for the metrics
+        self.write_seconds = Histogram()
+        self.written = 0
+        self.dropped = 0
+        self.spooled = 0
+        if os.path.isfile(self.spool_path):
+            with open(self.spool_path, "rb") as fd:
+                self.spooled = sum(1 for _ in fd)
+
+    def write(self, lines):
+        """
+         Adds lines to the buffer, returns immediately.
+
+        :param lines: List of line protocol lines as bytes, all with timestamp.
+        :return: None
+        """
+        self.queue.put(lines)
+
+    def run(self):
+        with InfluxDBClient(**self.db, enable_gzip=True) as client:
+            write_api = client.write_api(write_options=SYNCHRONOUS)
+            buffer = []
+            flush_at = time.monotonic() + self.flush_interval
+            while not (self._closed.is_set() and self.queue.empty()):
+                try:
+                    buffer.extend(self.queue.get(timeout=max(0.0, flush_at - time.monotonic())))
+                except queue.Empty:
+                    pass
+                # flush if buffer is full, time is over or the writer is closed
+                if len(buffer) >= self.batch_size or time.monotonic() >= flush_at or self._closed.is_set():
+                    self.flush(write_api, buffer)
+                    buffer = []
+                    flush_at = time.monotonic() + self.flush_interval
+
+    def flush(self, write_api, lines):
+        """
+         Writes the lines in the database, older spooled lines first. Appends them to the spool file if the
+        database can´t be reached.
+
+        :param write_api: The synchronous write api of the InfluxDB client.
+        :param lines: List of line protocol lines as bytes.
+        :return: None
+        """
+        if time.monotonic() >= self._retry_at and self.replay(write_api):
+            for idx in range(0, len(lines), self.batch_size):
+                try:
+                    self._write(write_api, lines[idx:idx + self.batch_size])
+                except Exception as e:
+                    print(f"InfluxDB not reachable, spooling: {e}")
+                    self._retry_at = time.monotonic() + self.retry_interval
+                    # written lines must not be spooled again
+                    lines = lines[idx:]
+                    break
+            else:
+                return
+        self.spool(lines)
+
+    def replay(self, write_api):
+        """
+         Writes the lines of the spool file in order and removes them from the file.
+
+        :param write_api: The synchronous write api of the InfluxDB client.
+        :return: True if the spool file is empty afterward, else False.
+        """
+        if not os.path.isfile(self.spool_path):
+            return True
+        with open(self.spool_path, "rb") as fd:
+            lines = fd.read().splitlines()
+        for idx in range(0, len(lines), self.batch_size):
+            try:
+                self._write(write_api, lines[idx:idx + self.batch_size])
+            except Exception as e:
+                print(f"InfluxDB not reachable, {len(lines) - idx} spooled lines left: {e}")
+                self._retry_at = time.monotonic() + self.retry_interval
+                # keep only the lines not written yet
+                with open(f"{self.spool_path}.tmp", "wb") as fd:
+                    fd.writelines(line + b"\n" for line in lines[idx:])
+                os.replace(f"{self.spool_path}.tmp", self.spool_path)
+                self.spooled = len(lines) - idx
+                return False
+        os.remove(self.spool_path)
+        self.spooled = 0
+        print(f"Replayed {len(lines)} spooled lines")
+        return True
+
+    def spool(self, lines):
+        """
+         Appends the lines to the spool file.
+
+        :param lines: List of line protocol lines as bytes.
+        :return: None
+        """
+        if lines:
+            with open(self.spool_path, "ab") as fd:
+                fd.writelines(line + b"\n" for line in lines)
+            self.spooled += len(lines)
+
+    def close(self):
+        """
+         Stops the writer after all buffered points are written or spooled.
+
+        :return: None
+        """
+        if self.is_alive():
+            self._closed.set()
+            self.join()
+
+    def _write(self, write_api, lines):
+        try:
+            with self.write_seconds.time():
+                write_api.write(bucket=self.db['bucket'], org=self.db['org'], record=b"\n".join(lines),
+                                write_precision=self.precision)
+            self.written += len(lines)
+        except ApiException as e:
+            # rejected lines (e.g. conflicting field type) would block the spool forever, so they are dropped
+            if e.status in (400, 422):
+                print(f"InfluxDB rejected {len(lines)} lines: {e.body}")
+                self.dropped += len(lines)
+                return
+            raise
@@ -0,0 +1,80 @@
+import calendar
+import math
+
+# divisor from nanoseconds to the write precision
+PRECISIONS = {"ns": 1, "us": 1_000, "ms": 1_000_000, "s": 1_000_000_000}
+
+
+def escape_measurement(value):
+    """
+    :param value: Name of the measurement.
+    :return: The measurement escaped for line protocol.
+    """
+    return str(value).replace("\\", "\\\\").replace(",", "\\,").replace(" ", "\\ ")
+
+
+def escape_key(value):
+    """
+    :param value: Tag key, tag value or field key.
+    :return: The value escaped for line protocol.
+    """
+    return escape_measurement(value).replace("=", "\\=")
+
+
+def encode_prefix(measurement, tags, field):
+    """
+     Encodes everything of a line which stays the same for a channel, done once when the routes are compiled.
+
+    :param measurement: Name of the measurement.
+    :param tags: Dictionary with the tags of the channel.
+    :param field: Key of the field.
+    :return: The line up to the field value as bytes, e.g. b'7,display=Druck\\ 1,sensor_id=I-1 PRESSURE='.
+    """
+    tag_set = "".join(f",{escape_key(key)}={escape_key(value)}" for key, value in sorted(tags.items()) if value)
+    return f"{escape_measurement(measurement)}{tag_set} {escape_key(field)}=".encode()
+
+
+def encode_value(value):
+    """
+    :param value: Value read from the OPC-UA server.
+    :return: The field value as bytes, None if the value can´t be written.
+    """
+    # bool before int, bool is a subclass of int
+    if isinstance(value, bool):
+        return b"true" if value else b"false"
+    if isinstance(value, int):
+        return b"%di" % value
+    if isinstance(value, float):
+        return repr(value).encode() if math.isfinite(value) else None
+    if isinstance(value, str):
+        return b'"%s"' % value.replace("\\", "\\\\").replace('"', '\\"').encode()
+    return None
+
+
+def to_ns(date):
+    """
+    :param date: Datetime, naive datetimes are UTC like the timestamps from asyncua.
+    :return: Nanoseconds since epoch.
+    """
+    return calendar.timegm(date.utctimetuple()) * 1_000_000_000 + date.microsecond * 1000
+
+
+def encode_lines(values, tick, precision="ns"):
+    """
+     Encodes the values of one cycle to line protocol. Values without own source timestamp share the time of the
+    tick, so all channels of a cycle have the same time.
+
+    :param values: List of dictionaries with 'channel', 'value' and optional 'time'.
+    :param tick: Time of the cycle in nanoseconds since epoch.
+    :param precision: Write precision of the timestamps, one of PRECISIONS.
+    :return: List of lines as bytes.
+    """
+    divisor = PRECISIONS[precision]
+    tick_time = b" %d" % (tick // divisor)
+    lines = []
+    for value in values:
+        if (field := encode_value(value['value'])) is None:
+            continue
+        timestamp = b" %d" % (to_ns(value['time']) // divisor) if value.get('time') else tick_time
+        lines.append(value['channel'].prefix + field + timestamp)
+    return lines
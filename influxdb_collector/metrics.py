@@ -0,0 +1,154 @@
+import bisect
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class Histogram:
+    """
+    Cumulative histogram of durations in seconds, like a Prometheus histogram.
+    """
+    BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        """
+        :param seconds: The measured duration.
+        :return: None
+        """
+        idx = bisect.bisect_left(self.buckets, seconds)
+        with self._lock:
+            if idx < len(self.buckets):
+                self.counts[idx] += 1
+            self.sum += seconds
+            self.count += 1
+
+    def time(self):
+        """
+         Measures the duration of a with block.
+
+        :return: Context manager which observes the duration on exit.
+        """
+        return _Timer(self)
+
+    def render(self, name, labels):
+        """
+        :param name: Name of the metric.
+        :param labels: Label string without braces, e.g. 'stage="opc_read"'.
+        :return: List of lines in Prometheus text format.
+        """
+        with self._lock:
+            counts, total, count = list(self.counts), self.sum, self.count
+        lines = []
+        cumulative = 0
+        for bucket, bucket_count in zip(self.buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{labels},le="{bucket}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{{labels}}} {total}')
+        lines.append(f'{name}_count{{{labels}}} {count}')
+        return lines
+
+
+class _Timer:
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *args):
+        self.histogram.observe(time.perf_counter() - self.start)
+
+
+class Metrics:
+    """
+    Runtime metrics of the collector, served in Prometheus text format on a local HTTP port. Counters of the
+    session, writer and scheduler are read from them when the metrics are requested.
+    """
+
+    def __init__(self, batch_id, session, writer, scheduler):
+        """
+        :param batch_id: The ID of the batch.
+        :param session: The OpcUaSession, for the reconnects.
+        :param writer: The InfluxWriter, for written and dropped points, spool depth and write durations.
+        :param scheduler: The FixedRateScheduler, for cycles, overruns and skipped ticks.
+        """
+        self.batch_id = batch_id
+        self.session = session
+        self.writer = writer
+        self.scheduler = scheduler
+        self.read_seconds = Histogram()
+        self.mapping_seconds = Histogram()
+        # unix time of the last cycle with values from the OPC-UA server
+        self.last_sample = 0.0
+        self.server = None
+
+    def render(self):
+        """
+        :return: All metrics in Prometheus text format.
+        """
+        lines = ["# HELP collector_stage_seconds Duration of the acquisition stages.",
+                 "# TYPE collector_stage_seconds histogram"]
+        for stage, histogram in (("opc_read", self.read_seconds), ("mapping", self.mapping_seconds),
+                                 ("influx_write", self.writer.write_seconds)):
+            lines.extend(histogram.render("collector_stage_seconds", f'stage="{stage}"'))
+        for name, kind, value, description in (
+                ("collector_cycles_total", "counter", self.scheduler.ticks, "Acquisition cycles."),
+                ("collector_overruns_total", "counter", self.scheduler.overruns, "Cycles longer than the interval."),
+                ("collector_skipped_ticks_total", "counter", self.scheduler.skipped, "Ticks skipped by overruns."),
+                ("collector_points_written_total", "counter", self.writer.written, "Points written to InfluxDB."),
+                ("collector_points_dropped_total", "counter", self.writer.dropped, "Points rejected by InfluxDB."),
+                ("collector_spool_lines", "gauge", self.writer.spooled, "Points waiting in the spool file."),
+                ("collector_reconnects_total", "counter", self.session.reconnects, "Reconnects to the OPC-UA server."),
+                ("collector_last_sample_timestamp_seconds", "gauge", self.last_sample,
+                 "Unix time of the last successful sample.")):
+            lines.extend([f"# HELP {name} {description}", f"# TYPE {name} {kind}", f"{name} {value}"])
+        lines.extend(["# HELP collector_batch_info Batch of the collector.", "# TYPE collector_batch_info gauge",
+                      f'collector_batch_info{{batch_id="{self.batch_id}"}} 1'])
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port):
+        """
+         Starts the HTTP server for /metrics in a background thread.
+
+        :param port: The local port of the HTTP server.
+        :return: None
+        """
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = metrics.render().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                # no access log for every scrape
+                pass
+
+        self.server = ThreadingHTTPServer(("", port), Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, name="metrics", daemon=True).start()
+
+    def close(self):
+        """
+         Stops the HTTP server.
+
+        :return: None
+        """
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
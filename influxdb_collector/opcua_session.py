@@ -0,0 +1,211 @@
+import datetime
+import math
+import time
+
+from asyncua import Client, ua
+
+
+class OpcUaSession:
+    """
+    Long-lived connection to the OPC-UA server. The address space is browsed once after connecting and the
+    variable nodes of the used sps ports are cached, so every cycle only reads values from the server.
+    If the connection drops, it is reestablished with an exponential backoff.
+    With a publishing interval, the session subscribes to the cached nodes instead and the server reports
+    only changed values with their source timestamps.
+    """
+
+    def __init__(self, url, routes, timeout=4, backoff_min=1, backoff_max=60, publishing_interval=None,
+                 sampling_interval=None):
+        """
+        :param url: The URL of the OPC-UA server.
+        :param routes: Routing table from compile_routes, variables without route are ignored.
+        :param timeout: Timeout in seconds for every request to the OPC-UA server.
+        :param backoff_min: Seconds to wait before the first reconnect attempt.
+        :param backoff_max: Maximum seconds to wait between two reconnect attempts.
+        :param publishing_interval: Publishing interval of the subscription in milliseconds, None to poll.
+        :param sampling_interval: Sampling interval of the monitored items in milliseconds (default: publishing
+            interval). Channels with an absolute deadband report only changes bigger than the deadband.
+        """
+        self.url = url
+        self.routes = routes
+        self.timeout = timeout
+        self.backoff_min = backoff_min
+        self.backoff_max = backoff_max
+        self.client = None
+        # resolved variable nodes and their channels, both sps_port -> node/channel in the same order
+        self.nodes = {}
+        self.channels = {}
+        self.publishing_interval = publishing_interval
+        self.sampling_interval = sampling_interval or publishing_interval
+        # changed values reported by the subscription since the last read
+        self.changes = []
+        # monitored items, client handle -> channel
+        self._handles = {}
+        self.reconnects = 0
+        self._connected = False
+        self._backoff = 0
+        self._retry_at = 0
+
+    async def connect(self):
+        """
+         Connects to the OPC-UA server and browses the address space once, if not already connected.
+        Does nothing until the backoff time of the last failed attempt is over.
+
+        :return: True if the session is connected, else False.
+        """
+        if self.client:
+            return True
+        if time.monotonic() < self._retry_at:
+            return False
+        client = Client(url=self.url, timeout=self.timeout)
+        try:
+            await client.connect()
+            self.nodes, self.channels = await self.browse(client)
+            if self.publishing_interval:
+                await self.subscribe(client)
+        except Exception:
+            await self._disconnect(client)
+            # double waiting time with every failed attempt
+            self._backoff = min(self.backoff_max, self._backoff * 2 if self._backoff else self.backoff_min)
+            self._retry_at = time.monotonic() + self._backoff
+            raise
+        self.client = client
+        self._backoff = 0
+        if self._connected:
+            self.reconnects += 1
+        self._connected = True
+        return True
+
+    async def browse(self, client):
+        """
+         Browses all object nodes and resolves their variables to channels with the routing table.
+
+        :param client: The connected asyncua client.
+        :return: A tuple of two dictionaries with sps ports as keys and the variable nodes and channels as values.
+        """
+        nodes = {}
+        channels = {}
+        objects = await client.get_objects_node().get_children()
+        # first two irrelevant, just generic data
+        for node in objects[2:]:
+            nsidx = (await node.read_browse_name()).NamespaceIndex
+            for var in await node.get_variables():
+                if channel := self.routes.get((nsidx, var.nodeid.Identifier)):
+                    nodes[channel.sps_port] = var
+                    channels[channel.sps_port] = channel
+        return nodes, channels
+
+    async def read_values(self):
+        """
+        Reads the values of all cached nodes in one request. Reconnects if there is no session.
+
+        :return: A tuple containing the results as list of dictionaries with 'channel' and 'value' and exceptions.
+        """
+        results = []
+        excs = []
+        try:
+            if not await self.connect():
+                excs.append(f"Waiting {self._backoff}s to reconnect to OPC-UA Server {self.url}")
+                return results, excs
+            values = await self.client.read_values(list(self.nodes.values()))
+            results = [{"channel": channel, "value": value} for channel, value in zip(self.channels.values(), values)]
+        except TimeoutError:
+            excs.append(f"TimeoutError: Can´t Connect to OPC-UA Server {self.url}")
+            await self.drop()
+        except Exception as e:
+            excs.append(e)
+            await self.drop()
+        return results, excs
+
+    async def subscribe(self, client):
+        """
+         Creates a subscription with one monitored item per cached node. Channels with an absolute deadband get a
+        data change filter, so the server only reports values which differ more than the deadband from the last
+        reported one. Relative deadbands are only applied by the collector.
+
+        :param client: The connected asyncua client.
+        :return: None
+        """
+        subscription = await client.create_subscription(self.publishing_interval, self)
+        # keep every sample of a publishing interval, not only the last one
+        queue_size = math.ceil(self.publishing_interval / self.sampling_interval)
+        self._handles = {}
+        items = []
+        for handle, (node, channel) in enumerate(zip(self.nodes.values(), self.channels.values()), 1):
+            params = ua.MonitoringParameters(ClientHandle=handle, SamplingInterval=self.sampling_interval,
+                                             QueueSize=queue_size, DiscardOldest=True)
+            if channel.deadband and channel.deadband_type == "absolute":
+                params.Filter = ua.DataChangeFilter(Trigger=ua.DataChangeTrigger.StatusValue,
+                                                    DeadbandType=ua.DeadbandType.Absolute,
+                                                    DeadbandValue=channel.deadband)
+            item = ua.MonitoredItemCreateRequest()
+            item.ItemToMonitor.NodeId = node.nodeid
+            item.ItemToMonitor.AttributeId = ua.AttributeIds.Value
+            item.MonitoringMode = ua.MonitoringMode.Reporting
+            item.RequestedParameters = params
+            items.append(item)
+            self._handles[handle] = channel
+        for sps_port, result in zip(self.nodes, await subscription.create_monitored_items(items)):
+            if isinstance(result, ua.StatusCode):
+                print(f"Can´t subscribe {sps_port}: {result}")
+
+    def datachange_notification(self, node, val, data):
+        """
+         Called by the subscription for every changed value, buffers the value until the next read.
+
+        :param node: The changed node.
+        :param val: The new value.
+        :param data: The notification with the source timestamp of the value.
+        :return: None
+        """
+        value = data.monitored_item.Value
+        timestamp = value.SourceTimestamp or value.ServerTimestamp or datetime.datetime.utcnow()
+        self.changes.append({"channel": self._handles[data.subscription_data.client_handle], "value": val,
+                             "time": timestamp})
+
+    async def read_changes(self):
+        """
+         Returns the values reported by the subscription since the last call. Reconnects and subscribes again if
+        there is no session.
+
+        :return: A tuple containing the results as list of dictionaries with 'channel', 'value' and 'time' and
+            exceptions.
+        """
+        excs = []
+        try:
+            if not await self.connect():
+                excs.append(f"Waiting {self._backoff}s to reconnect to OPC-UA Server {self.url}")
+            else:
+                # raises the exception of the watchdog or publish loop, if the connection is lost
+                await self.client.check_connection()
+        except Exception as e:
+            excs.append(e)
+            await self.drop()
+        results, self.changes = self.changes, []
+        return results, excs
+
+    async def drop(self):
+        """
+         Drops the current session, the next read reconnects and browses again.
+
+        :return: None
+        """
+        if self.client:
+            await self._disconnect(self.client)
+            self.client = None
+
+    async def close(self):
+        """
+         Closes the session at the end of the collection.
+
+        :return: None
+        """
+        await self.drop()
+
+    @staticmethod
+    async def _disconnect(client):
+        try:
+            await client.disconnect()
+        except Exception:
+            # connection is already lost, nothing to close
+            pass
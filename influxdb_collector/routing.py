@@ -0,0 +1,30 @@
+from collections import namedtuple
+
+from line_protocol import encode_prefix
+
+# everything needed to build a point for one configured sps port, prefix is the escaped line protocol up to the value
+Channel = namedtuple("Channel", ["sps_port", "display", "unit", "deadband", "deadband_type", "prefix"])
+
+
+def compile_routes(io_ident, sps_list, measurement):
+    """
+     Builds the routing table once at startup, so the acquisition needs only one dictionary lookup per value
+    instead of searching io_ident and sps_list.
+
+    :param io_ident: List of dictionaries from io_ident.json with 'sps_port', 'namespace_index' and 'identifier'.
+    :param sps_list: List of dictionaries with the used sps ports and their 'display', 'unit', 'deadband' and
+        'deadband_type'.
+    :param measurement: Name of the measurement, the batch ID.
+    :return: A dictionary with (namespace_index, identifier) as keys and the Channel of the sps port as values.
+    """
+    sps_confs = {sps['sps_port']: sps for sps in sps_list}
+    routes = {}
+    for row in io_ident:
+        # only sps ports used in this batch are routed
+        if not (sps := sps_confs.get(row['sps_port'])):
+            continue
+        prefix = encode_prefix(measurement, {"display": sps['display'], "sensor_id": row['sps_port']}, sps['unit'])
+        routes[(row['namespace_index'], row['identifier'])] = Channel(row['sps_port'], sps['display'], sps['unit'],
+                                                                      sps.get('deadband'),
+                                                                      sps.get('deadband_type') or "absolute", prefix)
+    return routes
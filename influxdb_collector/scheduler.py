@@ -0,0 +1,51 @@
+import asyncio
+import math
+import time
+
+
+class FixedRateScheduler:
+    """
+    Triggers the acquisition at a fixed rate on the monotonic clock. Ticks are aligned to multiples of the interval
+    in wall clock time, so samples of different batches line up. The work of a cycle does not shift the following
+    ticks; if a cycle takes longer than the interval, the missed ticks are skipped and counted.
+    """
+
+    def __init__(self, interval):
+        """
+        :param interval: Interval between two ticks in seconds.
+        """
+        self.interval = interval
+        self.interval_ns = round(interval * 1e9)
+        self.ticks = 0
+        self.overruns = 0
+        self.skipped = 0
+        self._tick = None
+        self._origin = None
+        self._origin_ns = None
+
+    async def wait(self):
+        """
+         Waits for the next tick.
+
+        :return: The scheduled wall clock time of the tick in nanoseconds since epoch.
+        """
+        now = time.monotonic()
+        if self._tick is None:
+            # first tick at the next multiple of the interval in wall clock time
+            wall_ns = time.time_ns()
+            self._origin_ns = math.ceil(wall_ns / self.interval_ns) * self.interval_ns
+            self._origin = now + (self._origin_ns - wall_ns) / 1e9
+            tick = 0
+        else:
+            tick = self._tick + 1
+            if now > self._origin + tick * self.interval:
+                # cycle overran, continue with the next tick which is still in the future
+                late = math.floor((now - self._origin) / self.interval) + 1
+                self.overruns += 1
+                self.skipped += late - tick
+                print(f"Overrun: skipped {late - tick} ticks of {self.interval * 1000:.0f}ms")
+                tick = late
+        await asyncio.sleep(max(0.0, self._origin + tick * self.interval - time.monotonic()))
+        self._tick = tick
+        self.ticks += 1
+        return self._origin_ns + tick * self.interval_ns
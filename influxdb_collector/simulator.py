@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+
+from asyncua import Server, ua
+
+ENDPOINT = "opc.tcp://0.0.0.0:4840/freeopcua/server/"
+NAMESPACE = "http://examples.freeopcua.github.io"
+# io_ident.json of the plant in the checkout, independent of the working directory
+IO_IDENT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "res", "io_ident.json")
+# synthetic variables per object node when scaling beyond io_ident.json
+NODE_SIZE = 100
+# last values of the noise waveform
+_walks = {}
+
+
+def sine(t, period, phase):
+    return 50 + 50 * math.sin(2 * math.pi * (t / period + phase))
+
+
+def ramp(t, period, phase):
+    return 100 * ((t / period + phase) % 1)
+
+
+def square(t, period, phase):
+    # valves only know open and closed
+    return (t / period + phase) % 1 < 0.5
+
+
+def noise(t, period, phase):
+    # random walk, the phase is unique per variable and keys its last value
+    value = min(100.0, max(0.0, _walks.get(phase, 50.0) + random.gauss(0, 1)))
+    _walks[phase] = value
+    return value
+
+
+def constant(t, period, phase):
+    return 100 * phase
+
+
+WAVEFORMS = {"sine": sine, "ramp": ramp, "square": square, "noise": noise, "constant": constant}
+
+
+def expand_io_ident(io_ident, count=None):
+    """
+     Scales the address space of io_ident.json to the wanted number of variables. Missing variables are added as
+    synthetic sps ports 'SIM-<n>' in object nodes 'Sim<k>' with NODE_SIZE variables each, their identifiers
+    follow the highest identifier of io_ident.json.
+
+    :param io_ident: List of dictionaries from io_ident.json.
+    :param count: Number of variables, None for exactly the variables of io_ident.json.
+    :return: List of dictionaries in the format of io_ident.json.
+    """
+    if count is None or count <= len(io_ident):
+        return io_ident[:count] if count else list(io_ident)
+    rows = list(io_ident)
+    nsidx = io_ident[0]['namespace_index'] if io_ident else 2
+    identifier = max((row['identifier'] for row in io_ident), default=4)
+    for n in range(1, count - len(io_ident) + 1):
+        identifier += 1
+        rows.append({"sps_port": f"SIM-{n}", "node_name": f"Sim{(n - 1) // NODE_SIZE + 1}",
+                     "variable_name": f"SimVariable{n}", "namespace_index": nsidx, "identifier": identifier})
+    return rows
+
+
+class PlantSimulator:
+    """
+    Local OPC-UA server which imitates the plant for load tests and benchmarks. The address space is built from
+    io_ident.json with the same layout as the real server: the generic Server and Aliases objects first, then one
+    object node per node_name with its variables at the identifiers of io_ident.json.
+    Values follow a waveform and are updated with a fixed rate, only a share of the variables changes per update.
+    """
+
+    def __init__(self, io_ident, endpoint=ENDPOINT, waveform=None, period=60, rate=1, change=1.0):
+        """
+        :param io_ident: List of dictionaries in the format of io_ident.json, see expand_io_ident.
+        :param endpoint: Endpoint of the server.
+        :param waveform: Name of the waveform in WAVEFORMS for all variables, None for square waves on valves ('V-'
+            ports) and sine waves on all others.
+        :param period: Period of the waveforms in seconds.
+        :param rate: Updates of the values per second.
+        :param change: Share of the variables which change per update, between 0 and 1.
+        """
+        self.io_ident = io_ident
+        self.endpoint = endpoint
+        self.waveform = waveform
+        self.period = period
+        self.rate = rate
+        self.change = change
+        self.server = None
+        # (nodeid, waveform, phase) of every variable
+        self.variables = []
+        self.updates = 0
+
+    async def init(self):
+        """
+         Creates the server and its address space.
+
+        :return: None
+        """
+        self.server = Server()
+        await self.server.init()
+        self.server.set_endpoint(self.endpoint)
+        self.server.set_server_name("Buerkert Plant Simulator")
+        nsidx = await self.server.register_namespace(NAMESPACE)
+        objects = {}
+        for idx, row in enumerate(self.io_ident):
+            if row['namespace_index'] != nsidx:
+                raise ValueError(f"{row['sps_port']} has namespace index {row['namespace_index']}, "
+                                 f"the simulator only serves {nsidx}")
+            if not (obj := objects.get(row['node_name'])):
+                # string node ids, so objects never collide with the numeric identifiers of the variables
+                obj = await self.server.nodes.objects.add_object(ua.NodeId(f"obj.{row['node_name']}", nsidx),
+                                                                 ua.QualifiedName(row['node_name'], nsidx))
+                objects[row['node_name']] = obj
+            waveform = WAVEFORMS[self.waveform or ("square" if row['sps_port'].startswith("V") else "sine")]
+            phase = idx / max(len(self.io_ident), 1)
+            nodeid = ua.NodeId(row['identifier'], nsidx)
+            await obj.add_variable(nodeid, ua.QualifiedName(row['variable_name'], nsidx),
+                                   waveform(0, self.period, phase))
+            self.variables.append((nodeid, waveform, phase))
+
+    async def update(self, t):
+        """
+         Writes new values of the waveforms at time t.
+
+        :param t: Seconds since start of the simulation.
+        :return: None
+        """
+        if self.change < 1:
+            variables = random.sample(self.variables, round(len(self.variables) * self.change))
+        else:
+            variables = self.variables
+        for nodeid, waveform, phase in variables:
+            await self.server.write_attribute_value(nodeid, ua.DataValue(waveform(t, self.period, phase)))
+        self.updates += 1
+
+    async def run(self, duration=None):
+        """
+         Serves the address space and updates the values until cancelled or the duration is over.
+
+        :param duration: Seconds to run, None to run forever.
+        :return: None
+        """
+        if not self.server:
+            await self.init()
+        async with self.server:
+            print(f"simulating {len(self.variables)} variables on {self.endpoint}")
+            start = time.monotonic()
+            while duration is None or time.monotonic() - start < duration:
+                await self.update(time.monotonic() - start)
+                # next update on the fixed grid, independent of the update duration
+                await asyncio.sleep(max(0.0, 1 / self.rate - (time.monotonic() - start) % (1 / self.rate)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OPC-UA server which simulates the plant")
+    parser.add_argument("--io-ident", default=IO_IDENT, help="io_ident.json with the address space")
+    parser.add_argument("--count", type=int, help="number of variables, scaled with synthetic variables")
+    parser.add_argument("--write-io-ident", help="write the scaled address space as io_ident.json to this path")
+    parser.add_argument("--endpoint", default=ENDPOINT)
+    parser.add_argument("--waveform", choices=sorted(WAVEFORMS), help="waveform of all variables")
+    parser.add_argument("--period", type=float, default=60, help="period of the waveforms in seconds")
+    parser.add_argument("--rate", type=float, default=1, help="updates per second")
+    parser.add_argument("--change", type=float, default=1.0, help="share of variables changing per update")
+    parser.add_argument("--duration", type=float, help="seconds to run, default forever")
+    args = parser.parse_args()
+    if args.write_io_ident and os.path.realpath(args.write_io_ident) in (os.path.realpath(args.io_ident),
+                                                                          os.path.realpath(IO_IDENT)):
+        parser.error("--write-io-ident would overwrite the io_ident.json of the plant")
+
+    with open(args.io_ident, "r") as fd:
+        io_ident = expand_io_ident(json.load(fd), args.count)
+    if args.write_io_ident:
+        with open(args.write_io_ident, "w") as fd:
+            json.dump(io_ident, fd, indent=1)
+    simulator = PlantSimulator(io_ident, args.endpoint, args.waveform, args.period, args.rate, args.change)
+    asyncio.run(simulator.run(args.duration))
+
+
+if __name__ == "__main__":
+    main()
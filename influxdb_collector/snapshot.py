@@ -0,0 +1,61 @@
+import json
+import math
+import os
+
+from line_protocol import to_ns
+
+SNAPSHOT_PATH = "res/collector_snapshot.json"
+
+
+class SnapshotFile:
+    """
+    Latest value of every channel, published to the shared res volume after every cycle. The live view of the web
+    app reads it while the collector runs, instead of opening a second connection to the OPC-UA server.
+    """
+
+    def __init__(self, batch_id, path=SNAPSHOT_PATH):
+        """
+        :param batch_id: The ID of the batch.
+        :param path: Path of the snapshot file.
+        """
+        self.batch_id = str(batch_id)
+        self.path = path
+        # sps_port -> [value, time in ns]
+        self.values = {}
+
+    def update(self, values, tick):
+        """
+        :param values: List of dictionaries with 'channel', 'value' and optional 'time' of one cycle, a subscription
+            reports only changed values, the others keep their last value.
+        :param tick: Time of the cycle in nanoseconds since epoch.
+        :return: None
+        """
+        for value in values:
+            self.values[value['channel'].sps_port] = [value['value'], to_ns(value['time']) if value.get('time') else tick]
+
+    def publish(self, tick, messages=()):
+        """
+         Replaces the snapshot file at once, so the web app never reads a half written file.
+
+        :param tick: Time of the cycle in nanoseconds since epoch.
+        :param messages: Exceptions of the cycle.
+        :return: None
+        """
+        data = {"batch_id": self.batch_id, "time": tick / 1e9, "messages": [str(message) for message in messages],
+                "values": [{"sps_port": sps_port, "value": None if isinstance(value, float) and
+                            not math.isfinite(value) else value, "time": time_ns / 1e9}
+                           for sps_port, (value, time_ns) in self.values.items()]}
+        with open(f"{self.path}.tmp", "w") as fd:
+            json.dump(data, fd, default=str)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    def close(self):
+        """
+         Removes the snapshot, the web app reads the OPC-UA server again.
+
+        :return: None
+        """
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,93 @@
+import datetime
+from unittest import TestCase
+
+from compression import Compressor, is_changed
+from line_protocol import to_ns
+from routing import Channel
+
+SECOND = 1_000_000_000
+PRESSURE = Channel("I-1", "Druck", "PRESSURE", 0.5, "absolute", b"")
+LEVEL = Channel("I-2", "Fuellstand", "LEVEL", 10, "percent", b"")
+VALVE = Channel("I-3", "Ventil", "STATE", 0.5, "absolute", b"")
+
+
+def written(values):
+    return [(value['channel'].sps_port, value['value']) for value in values]
+
+
+class TestIsChanged(TestCase):
+
+    def test_absolute_deadband(self):
+        self.assertFalse(is_changed(PRESSURE, 1.0, 1.5))
+        self.assertTrue(is_changed(PRESSURE, 1.0, 1.6))
+        self.assertTrue(is_changed(PRESSURE, 1.0, 0.4))
+
+    def test_percent_deadband(self):
+        self.assertFalse(is_changed(LEVEL, 50.0, 55.0))
+        self.assertTrue(is_changed(LEVEL, 50.0, 44.0))
+
+    def test_exact(self):
+        # states, bools and strings are written on every change regardless of the deadband
+        self.assertTrue(is_changed(VALVE, 1, 2))
+        self.assertTrue(is_changed(PRESSURE, False, True))
+        self.assertTrue(is_changed(PRESSURE, "a", "b"))
+        self.assertFalse(is_changed(Channel("I-4", "", "PRESSURE", None, "absolute", b""), 1.0, 1.0))
+        self.assertTrue(is_changed(Channel("I-4", "", "PRESSURE", None, "absolute", b""), 1.0, 1.01))
+
+
+class TestCompressor(TestCase):
+
+    def setUp(self):
+        self.compressor = Compressor(heartbeat=2)
+
+    def test_deadband(self):
+        self.assertEqual(written(self.compressor.compress([{"channel": PRESSURE, "value": 1.0}], 0)), [('I-1', 1.0)])
+        self.assertEqual(self.compressor.compress([{"channel": PRESSURE, "value": 1.4}], SECOND // 2), [])
+        # compared to the last written value, small changes don´t add up unnoticed
+        self.assertEqual(written(self.compressor.compress([{"channel": PRESSURE, "value": 1.6}], SECOND)),
+                         [('I-1', 1.6)])
+
+    def test_heartbeat_polled(self):
+        self.compressor.compress([{"channel": PRESSURE, "value": 1.0}], 0)
+
+        self.assertEqual(self.compressor.compress([{"channel": PRESSURE, "value": 1.1}], SECOND), [])
+        self.assertEqual(written(self.compressor.compress([{"channel": PRESSURE, "value": 1.2}], 2 * SECOND)),
+                         [('I-1', 1.2)])
+        self.assertEqual(self.compressor.compress([{"channel": PRESSURE, "value": 1.2}], 3 * SECOND), [])
+
+    def test_heartbeat_subscription(self):
+        self.compressor.compress([{"channel": PRESSURE, "value": 1.0}, {"channel": LEVEL, "value": 50.0}], 0,
+                                 live=True)
+        self.compressor.compress([{"channel": PRESSURE, "value": 1.1}], SECOND, live=True)
+
+        # unchanged channels of a connected subscription get their current value
+        self.assertEqual(written(self.compressor.compress([], 2 * SECOND, live=True)),
+                         [('I-1', 1.1), ('I-2', 50.0)])
+        self.assertEqual(self.compressor.compress([], 3 * SECOND, live=True), [])
+
+    def test_source_timestamp(self):
+        source = datetime.datetime(2023, 6, 1, 12)
+        self.compressor.compress([{"channel": PRESSURE, "value": 1.0, "time": source}], to_ns(source), live=True)
+
+        values = [{"channel": PRESSURE, "value": 1.1, "time": source + datetime.timedelta(seconds=2)}]
+        self.assertEqual(self.compressor.compress(values, to_ns(source) + 2 * SECOND, live=True), values)
+
+    def test_outage(self):
+        self.compressor.compress([{"channel": PRESSURE, "value": 1.1}], 0)
+
+        # failed reads return no values, the outage stays a gap
+        for tick in range(1, 7):
+            self.assertEqual(self.compressor.compress([], tick * SECOND), [])
+
+        # first value after the outage is written
+        self.assertEqual(written(self.compressor.compress([{"channel": PRESSURE, "value": 1.1}], 7 * SECOND)),
+                         [('I-1', 1.1)])
+
+    def test_outage_subscription(self):
+        self.compressor.compress([{"channel": PRESSURE, "value": 1.0}, {"channel": LEVEL, "value": 50.0}], 0,
+                                 live=True)
+
+        # changes received before the session dropped are written, but no heartbeats of the other channels
+        self.assertEqual(written(self.compressor.compress([{"channel": PRESSURE, "value": 2.0}], 4 * SECOND)),
+                         [('I-1', 2.0)])
+        self.assertEqual(self.compressor.compress([], 6 * SECOND), [])
@@ -0,0 +1,44 @@
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from control import ControlFile
+
+
+class TestControlFile(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.control = ControlFile(7, path=os.path.join(directory.name, "collector_control.json"))
+
+    def write(self, content, mtime_ns):
+        with open(self.control.path, "w") as fd:
+            fd.write(content if isinstance(content, str) else json.dumps(content))
+        os.utime(self.control.path, ns=(mtime_ns, mtime_ns))
+
+    def test_missing_file(self):
+        self.assertIsNone(self.control.poll())
+
+    def test_read_on_change(self):
+        self.write({'batch_id': "7", 'end': "2023-06-01T12:00:00Z"}, 1)
+        self.assertEqual(self.control.poll(), {'batch_id': "7", 'end': "2023-06-01T12:00:00Z"})
+
+        # unchanged file is not read again
+        self.assertIsNone(self.control.poll())
+
+        self.write({'batch_id': 7, 'stop': True}, 2)
+        self.assertEqual(self.control.poll(), {'batch_id': 7, 'stop': True})
+
+    def test_other_batch(self):
+        self.write({'batch_id': "8", 'stop': True}, 1)
+        self.assertIsNone(self.control.poll())
+
+    def test_half_written(self):
+        self.write('{"batch_id": "7", "st', 1)
+        self.assertIsNone(self.control.poll())
+
+        # read again in the next cycle, even if the mtime didn´t change
+        self.write({'batch_id': "7", 'stop': True}, 1)
+        self.assertEqual(self.control.poll(), {'batch_id': "7", 'stop': True})
@@ -0,0 +1,135 @@
+import os
+import tempfile
+from unittest import TestCase
+
+from influxdb_client.rest import ApiException
+
+from benchmark import InfluxSink
+from influx_writer import InfluxWriter
+
+DB = {"url": "http://localhost:8086", "org": "org", "token": "token", "bucket": "bucket"}
+
+
+class FakeWriteApi:
+    """
+    Write api which keeps the written lines, fails with error while down is set.
+    """
+
+    def __init__(self, error=ConnectionError("connection refused")):
+        self.error = error
+        self.lines = []
+        self.calls = 0
+        self.down = False
+        # number of the call which fails once, e.g. in the middle of a flush
+        self.fail_call = None
+
+    def write(self, bucket, org, record, write_precision):
+        self.calls += 1
+        if self.down or self.calls == self.fail_call:
+            raise self.error
+        self.lines.extend(record.split(b"\n"))
+
+
+def lines(*timestamps):
+    return [b"7,sensor_id=I-1 PRESSURE=1.5 %d" % timestamp for timestamp in timestamps]
+
+
+class TestInfluxWriter(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool_path = os.path.join(directory.name, "spool_{precision}.lp")
+        self.writer = InfluxWriter(DB, precision="ms", batch_size=2, retry_interval=60, spool_path=self.spool_path)
+        self.api = FakeWriteApi()
+
+    def spool_lines(self):
+        with open(self.writer.spool_path, "rb") as fd:
+            return fd.read().splitlines()
+
+    def test_flush_in_batches(self):
+        self.writer.flush(self.api, lines(1, 2, 3))
+
+        self.assertEqual(self.api.lines, lines(1, 2, 3))
+        self.assertEqual(self.api.calls, 2)
+        self.assertEqual(self.writer.written, 3)
+        self.assertFalse(os.path.isfile(self.writer.spool_path))
+
+    def test_spool_while_down(self):
+        self.api.down = True
+        self.writer.flush(self.api, lines(1, 2))
+        self.assertEqual(self.spool_lines(), lines(1, 2))
+
+        # no new attempt until the retry interval is over
+        self.writer.flush(self.api, lines(3))
+        self.assertEqual(self.api.calls, 1)
+        self.assertEqual(self.spool_lines(), lines(1, 2, 3))
+        self.assertEqual(self.writer.spooled, 3)
+        self.assertEqual(self.writer.written, 0)
+
+    def test_replay_in_order(self):
+        self.api.down = True
+        self.writer.flush(self.api, lines(1, 2, 3))
+        self.api.down = False
+        self.writer._retry_at = 0
+
+        self.writer.flush(self.api, lines(4))
+
+        # spooled lines are written before the new ones
+        self.assertEqual(self.api.lines, lines(1, 2, 3, 4))
+        self.assertFalse(os.path.isfile(self.writer.spool_path))
+        self.assertEqual(self.writer.spooled, 0)
+
+    def test_partial_flush(self):
+        self.api.fail_call = 2
+        self.writer.flush(self.api, lines(1, 2, 3, 4, 5))
+
+        # written batch is not spooled again
+        self.assertEqual(self.api.lines, lines(1, 2))
+        self.assertEqual(self.spool_lines(), lines(3, 4, 5))
+
+        self.writer._retry_at = 0
+        self.writer.flush(self.api, lines(6))
+        self.assertEqual(self.api.lines, lines(1, 2, 3, 4, 5, 6))
+
+    def test_partial_replay(self):
+        self.writer.spool(lines(1, 2, 3, 4, 5))
+        self.api.fail_call = 2
+
+        self.writer.flush(self.api, lines(6))
+
+        # only the replayed lines are removed from the spool, new lines are appended after the rest
+        self.assertEqual(self.api.lines, lines(1, 2))
+        self.assertEqual(self.spool_lines(), lines(3, 4, 5, 6))
+        self.assertEqual(self.writer.spooled, 4)
+
+    def test_rejected_lines_dropped(self):
+        api = FakeWriteApi(ApiException(status=422))
+        api.down = True
+
+        self.writer.flush(api, lines(1, 2, 3))
+
+        self.assertEqual(self.writer.dropped, 3)
+        self.assertFalse(os.path.isfile(self.writer.spool_path))
+
+    def test_spool_counted_on_start(self):
+        self.writer.spool(lines(1, 2))
+
+        writer = InfluxWriter(DB, precision="ms", spool_path=self.spool_path)
+
+        self.assertEqual(writer.spooled, 2)
+
+    def test_write_endpoint(self):
+        sink = InfluxSink(precision="ms")
+        self.addCleanup(sink.close)
+        writer = InfluxWriter(dict(DB, url=sink.url), precision="ms", flush_interval=0.05, spool_path=self.spool_path)
+        writer.start()
+
+        writer.write(lines(1000, 2000))
+        writer.write(lines(3000))
+        writer.close()
+
+        # buffered lines are written gzip compressed when the writer is closed
+        self.assertEqual(sink.points, 3)
+        self.assertEqual(sorted(sink.cycles), [b"1000", b"2000", b"3000"])
+        self.assertEqual(writer.written, 3)
@@ -0,0 +1,68 @@
+import datetime
+from unittest import TestCase
+
+from line_protocol import encode_prefix, encode_value, encode_lines, to_ns
+from routing import Channel
+
+TICK = 1_685_620_800_123_456_789
+
+
+def channel(prefix=b"7,sensor_id=I-1 PRESSURE="):
+    return Channel("I-1", "Druck", "PRESSURE", None, "absolute", prefix)
+
+
+class TestEncodePrefix(TestCase):
+
+    def test_escaping(self):
+        prefix = encode_prefix("batch 7,a", {"display": "Druck, Tank=1", "sensor_id": "I\\1"}, "PRESS URE=")
+
+        self.assertEqual(prefix, b"batch\\ 7\\,a,display=Druck\\,\\ Tank\\=1,sensor_id=I\\\\1 PRESS\\ URE\\==")
+
+    def test_sorted_without_empty_tags(self):
+        prefix = encode_prefix(7, {"sensor_id": "I-1", "display": ""}, "PRESSURE")
+
+        self.assertEqual(prefix, b"7,sensor_id=I-1 PRESSURE=")
+
+
+class TestEncodeValue(TestCase):
+
+    def test_types(self):
+        # bool is no integer field
+        self.assertEqual(encode_value(True), b"true")
+        self.assertEqual(encode_value(False), b"false")
+        self.assertEqual(encode_value(3), b"3i")
+        self.assertEqual(encode_value(-3), b"-3i")
+        self.assertEqual(encode_value(1.5), b"1.5")
+        self.assertEqual(encode_value(1e-07), b"1e-07")
+        self.assertEqual(encode_value('say "hi"\\'), b'"say \\"hi\\"\\\\"')
+
+    def test_not_writable(self):
+        self.assertIsNone(encode_value(float("nan")))
+        self.assertIsNone(encode_value(float("inf")))
+        self.assertIsNone(encode_value(None))
+        self.assertIsNone(encode_value([1, 2]))
+
+
+class TestEncodeLines(TestCase):
+
+    def test_precision(self):
+        values = [{"channel": channel(), "value": 1.5}]
+
+        self.assertEqual(encode_lines(values, TICK, "ns"), [b"7,sensor_id=I-1 PRESSURE=1.5 1685620800123456789"])
+        self.assertEqual(encode_lines(values, TICK, "ms"), [b"7,sensor_id=I-1 PRESSURE=1.5 1685620800123"])
+        self.assertEqual(encode_lines(values, TICK, "s"), [b"7,sensor_id=I-1 PRESSURE=1.5 1685620800"])
+
+    def test_source_timestamp(self):
+        # naive timestamps from asyncua are UTC
+        source = datetime.datetime(2023, 6, 1, 12, 0, 0, 250000)
+        values = [{"channel": channel(), "value": 2, "time": source},
+                  {"channel": channel(b"7,sensor_id=I-2 STATE="), "value": True}]
+
+        self.assertEqual(encode_lines(values, TICK, "ms"), [b"7,sensor_id=I-1 PRESSURE=2i 1685620800250",
+                                                             b"7,sensor_id=I-2 STATE=true 1685620800123"])
+        self.assertEqual(to_ns(source.replace(tzinfo=datetime.timezone.utc)), to_ns(source))
+
+    def test_skip_not_writable(self):
+        values = [{"channel": channel(), "value": float("nan")}, {"channel": channel(), "value": None}]
+
+        self.assertEqual(encode_lines(values, TICK, "ms"), [])
@@ -0,0 +1,63 @@
+import types
+import urllib.error
+import urllib.request
+from unittest import TestCase
+
+from metrics import Histogram, Metrics
+
+
+class TestHistogram(TestCase):
+
+    def test_render(self):
+        histogram = Histogram(buckets=(0.01, 0.1))
+        for seconds in (0.005, 0.01, 0.05, 2):
+            histogram.observe(seconds)
+
+        self.assertEqual(histogram.render("stage_seconds", 'stage="opc_read"'), [
+            'stage_seconds_bucket{stage="opc_read",le="0.01"} 2',
+            'stage_seconds_bucket{stage="opc_read",le="0.1"} 3',
+            'stage_seconds_bucket{stage="opc_read",le="+Inf"} 4',
+            'stage_seconds_sum{stage="opc_read"} 2.065',
+            'stage_seconds_count{stage="opc_read"} 4'])
+
+    def test_time(self):
+        histogram = Histogram()
+        with histogram.time():
+            pass
+
+        self.assertEqual(histogram.count, 1)
+        self.assertEqual(histogram.counts[0], 1)
+
+
+class TestMetrics(TestCase):
+
+    def setUp(self):
+        session = types.SimpleNamespace(reconnects=2)
+        writer = types.SimpleNamespace(written=120, dropped=1, spooled=30, write_seconds=Histogram())
+        scheduler = types.SimpleNamespace(ticks=10, overruns=1, skipped=3)
+        self.metrics = Metrics("7", session, writer, scheduler)
+        self.metrics.last_sample = 1685620800.5
+
+    def test_render(self):
+        lines = self.metrics.render().splitlines()
+
+        for line in ("collector_cycles_total 10", "collector_overruns_total 1", "collector_skipped_ticks_total 3",
+                     "collector_points_written_total 120", "collector_points_dropped_total 1",
+                     "collector_spool_lines 30", "collector_reconnects_total 2",
+                     "collector_last_sample_timestamp_seconds 1685620800.5", 'collector_batch_info{batch_id="7"} 1',
+                     'collector_stage_seconds_count{stage="influx_write"} 0',
+                     "# TYPE collector_spool_lines gauge", "# TYPE collector_stage_seconds histogram"):
+            self.assertIn(line, lines)
+
+    def test_serve(self):
+        self.metrics.serve(0)
+        self.addCleanup(self.metrics.close)
+        url = f"http://127.0.0.1:{self.metrics.server.server_port}"
+
+        with urllib.request.urlopen(f"{url}/metrics") as response:
+            self.assertEqual(response.headers['Content-Type'], "text/plain; version=0.0.4; charset=utf-8")
+            self.assertIn(b"collector_cycles_total 10\n", response.read())
+        with self.assertRaises(urllib.error.HTTPError) as error:
+            urllib.request.urlopen(f"{url}/other")
+        self.assertEqual(error.exception.code, 404)
+        error.exception.close()
@@ -0,0 +1,191 @@
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch, MagicMock, AsyncMock
+
+from asyncua import ua
+
+from opcua_session import OpcUaSession
+from routing import compile_routes
+
+IO_IDENT = [{'sps_port': 'I-1', 'namespace_index': 2, 'identifier': 'pressure'},
+            {'sps_port': 'I-2', 'namespace_index': 2, 'identifier': 'temperature'}]
+SPS_LIST = [{'sps_port': 'I-1', 'display': 'Druck', 'unit': 'PRESSURE'},
+            {'sps_port': 'I-2', 'display': 'Temperatur', 'unit': 'TEMPERATURE'}]
+
+
+def opcua_node(identifier, namespace_index=2, variables=()):
+    """
+    :param identifier: Identifier of the node ID.
+    :param namespace_index: Namespace index of the browse name.
+    :param variables: Variable nodes of an object node.
+    :return: A mocked asyncua node.
+    """
+    node = MagicMock()
+    node.nodeid.Identifier = identifier
+    node.read_browse_name = AsyncMock(return_value=MagicMock(NamespaceIndex=namespace_index))
+    node.get_variables = AsyncMock(return_value=list(variables))
+    return node
+
+
+def opcua_client(values=(1.5, 20.0)):
+    """
+    :param values: Values returned by every read.
+    :return: A mocked asyncua client with the two generic nodes and one object with the variables of IO_IDENT and
+        one unknown variable.
+    """
+    variables = [opcua_node('pressure'), opcua_node('temperature'), opcua_node('unknown')]
+    client = MagicMock()
+    client.connect = AsyncMock()
+    client.disconnect = AsyncMock()
+    client.read_values = AsyncMock(return_value=list(values))
+    client.check_connection = AsyncMock()
+    client.get_objects_node.return_value.get_children = AsyncMock(
+        return_value=[opcua_node('server'), opcua_node('aliases'), opcua_node('plant', variables=variables)])
+    return client
+
+
+@patch('opcua_session.Client')
+class TestOpcUaSession(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.session = OpcUaSession("opc.tcp://localhost:4840", compile_routes(IO_IDENT, SPS_LIST, 7))
+
+    async def test_browse_once(self, mock_client):
+        mock_client.return_value = client = opcua_client()
+
+        for _ in range(3):
+            results, excs = await self.session.read_values()
+
+        self.assertEqual(excs, [])
+        self.assertEqual([(result['channel'].sps_port, result['value']) for result in results],
+                         [('I-1', 1.5), ('I-2', 20.0)])
+        # one session for all cycles, unrouted variables are not read
+        mock_client.assert_called_once()
+        client.get_objects_node.assert_called_once()
+        self.assertEqual(client.read_values.await_count, 3)
+        self.assertEqual(len(client.read_values.await_args.args[0]), 2)
+        self.assertEqual(self.session.reconnects, 0)
+
+    async def test_reconnect_after_failed_read(self, mock_client):
+        first, second = opcua_client(), opcua_client(values=(2.5, 21.0))
+        first.read_values.side_effect = ConnectionError("connection lost")
+        mock_client.side_effect = [first, second]
+
+        results, excs = await self.session.read_values()
+        self.assertEqual(results, [])
+        self.assertIsInstance(excs[0], ConnectionError)
+        first.disconnect.assert_awaited_once()
+        self.assertIsNone(self.session.client)
+
+        # the next read connects and browses again
+        results, excs = await self.session.read_values()
+        self.assertEqual(excs, [])
+        self.assertEqual([result['value'] for result in results], [2.5, 21.0])
+        second.get_objects_node.assert_called_once()
+        self.assertEqual(self.session.reconnects, 1)
+
+    async def test_timeout(self, mock_client):
+        mock_client.return_value = client = opcua_client()
+        client.read_values.side_effect = TimeoutError()
+
+        results, excs = await self.session.read_values()
+
+        self.assertEqual(results, [])
+        self.assertEqual(excs, ["TimeoutError: Can´t Connect to OPC-UA Server opc.tcp://localhost:4840"])
+        self.assertIsNone(self.session.client)
+
+    async def test_backoff(self, mock_client):
+        mock_client.return_value = client = opcua_client()
+        client.connect.side_effect = ConnectionRefusedError()
+
+        _, excs = await self.session.read_values()
+        self.assertIsInstance(excs[0], ConnectionRefusedError)
+        # no new attempt until the backoff is over
+        _, excs = await self.session.read_values()
+        self.assertEqual(excs, ["Waiting 1s to reconnect to OPC-UA Server opc.tcp://localhost:4840"])
+        self.assertEqual(mock_client.call_count, 1)
+
+        # waiting time doubles with every failed attempt up to the maximum
+        for backoff in (2, 4, 8, 16, 32, 60, 60):
+            self.session._retry_at = 0
+            await self.session.read_values()
+            self.assertEqual(self.session._backoff, backoff)
+
+        client.connect.side_effect = None
+        self.session._retry_at = 0
+        _, excs = await self.session.read_values()
+        self.assertEqual(excs, [])
+        self.assertEqual(self.session._backoff, 0)
+        # the first successful connect is no reconnect
+        self.assertEqual(self.session.reconnects, 0)
+
+    async def test_close(self, mock_client):
+        mock_client.return_value = client = opcua_client()
+        await self.session.read_values()
+
+        await self.session.close()
+
+        client.disconnect.assert_awaited_once()
+        self.assertIsNone(self.session.client)
+
+
+@patch('opcua_session.Client')
+class TestOpcUaSubscription(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        sps_list = [dict(SPS_LIST[0], deadband=0.5, deadband_type="absolute"),
+                    dict(SPS_LIST[1], deadband=5, deadband_type="percent")]
+        self.session = OpcUaSession("opc.tcp://localhost:4840", compile_routes(IO_IDENT, sps_list, 7),
+                                    publishing_interval=1000, sampling_interval=250)
+
+    def notify(self, handle, value, timestamp=None):
+        data = MagicMock()
+        data.subscription_data.client_handle = handle
+        data.monitored_item.Value.SourceTimestamp = timestamp
+        self.session.datachange_notification(MagicMock(), value, data)
+
+    async def test_subscribe(self, mock_client):
+        mock_client.return_value = client = opcua_client()
+        subscription = MagicMock(create_monitored_items=AsyncMock(return_value=[1, 2]))
+        client.create_subscription = AsyncMock(return_value=subscription)
+
+        self.assertEqual(await self.session.read_changes(), ([], []))
+
+        client.create_subscription.assert_awaited_once_with(1000, self.session)
+        absolute, percent = subscription.create_monitored_items.await_args.args[0]
+        # every sample of a publishing interval is kept
+        self.assertEqual(absolute.RequestedParameters.QueueSize, 4)
+        self.assertEqual(absolute.RequestedParameters.SamplingInterval, 250)
+        # only absolute deadbands are filtered by the server
+        self.assertEqual(absolute.RequestedParameters.Filter.DeadbandValue, 0.5)
+        self.assertNotIsInstance(percent.RequestedParameters.Filter, ua.DataChangeFilter)
+
+    async def test_read_changes(self, mock_client):
+        mock_client.return_value = client = opcua_client()
+        client.create_subscription = AsyncMock(return_value=MagicMock(create_monitored_items=AsyncMock()))
+        await self.session.read_changes()
+
+        self.notify(1, 1.5, timestamp="source")
+        self.notify(2, 20.0)
+        self.notify(1, 1.7, timestamp="source")
+        results, excs = await self.session.read_changes()
+
+        self.assertEqual(excs, [])
+        self.assertEqual([(result['channel'].sps_port, result['value']) for result in results],
+                         [('I-1', 1.5), ('I-2', 20.0), ('I-1', 1.7)])
+        self.assertEqual(results[0]['time'], "source")
+        # changes are returned once
+        self.assertEqual(await self.session.read_changes(), ([], []))
+
+    async def test_lost_connection(self, mock_client):
+        mock_client.return_value = client = opcua_client()
+        client.create_subscription = AsyncMock(return_value=MagicMock(create_monitored_items=AsyncMock()))
+        client.check_connection = AsyncMock(side_effect=ConnectionError("watchdog"))
+        await self.session.read_changes()
+
+        # changes received before the connection was lost are still returned
+        self.notify(1, 1.5)
+        results, excs = await self.session.read_changes()
+
+        self.assertEqual([result['value'] for result in results], [1.5])
+        self.assertIsInstance(excs[0], ConnectionError)
+        self.assertIsNone(self.session.client)
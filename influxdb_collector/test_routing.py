@@ -0,0 +1,37 @@
+from unittest import TestCase
+
+from routing import compile_routes
+
+IO_IDENT = [{'sps_port': 'I-1', 'namespace_index': 2, 'identifier': 'pressure'},
+            {'sps_port': 'I-2', 'namespace_index': 2, 'identifier': 'temperature'},
+            {'sps_port': 'I-3', 'namespace_index': 3, 'identifier': 1042}]
+
+
+class TestCompileRoutes(TestCase):
+
+    def test_only_used_ports(self):
+        routes = compile_routes(IO_IDENT, [{'sps_port': 'I-1', 'display': 'Druck', 'unit': 'PRESSURE'},
+                                           {'sps_port': 'I-3', 'display': 'Ventil', 'unit': 'STATE'}], 7)
+
+        self.assertEqual(set(routes), {(2, 'pressure'), (3, 1042)})
+        self.assertEqual(routes[(3, 1042)].sps_port, 'I-3')
+
+    def test_channel(self):
+        routes = compile_routes(IO_IDENT, [{'sps_port': 'I-1', 'display': 'Druck Tank', 'unit': 'PRESSURE',
+                                            'deadband': 0.5, 'deadband_type': 'percent'}], 7)
+
+        channel = routes[(2, 'pressure')]
+        self.assertEqual((channel.display, channel.unit, channel.deadband, channel.deadband_type),
+                         ('Druck Tank', 'PRESSURE', 0.5, 'percent'))
+        # tags are escaped and sorted once
+        self.assertEqual(channel.prefix, b"7,display=Druck\\ Tank,sensor_id=I-1 PRESSURE=")
+
+    def test_default_deadband(self):
+        routes = compile_routes(IO_IDENT, [{'sps_port': 'I-2', 'display': '', 'unit': 'TEMPERATURE',
+                                            'deadband_type': None}], 7)
+
+        channel = routes[(2, 'temperature')]
+        self.assertIsNone(channel.deadband)
+        self.assertEqual(channel.deadband_type, "absolute")
+        # empty tags are left out
+        self.assertEqual(channel.prefix, b"7,sensor_id=I-2 TEMPERATURE=")
@@ -0,0 +1,83 @@
+import types
+from unittest import IsolatedAsyncioTestCase
+from unittest.mock import patch
+
+import scheduler
+from scheduler import FixedRateScheduler
+
+
+class FakeClock:
+    """
+    Monotonic and wall clock which only advance by sleeping or working.
+    """
+
+    def __init__(self, wall):
+        """
+        :param wall: Wall clock time in seconds at monotonic time 0.
+        """
+        self.now = 0.0
+        self.wall_ns = round(wall * 1e9)
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time_ns(self):
+        return self.wall_ns + round(self.now * 1e9)
+
+    async def sleep(self, seconds):
+        self.sleeps.append(round(seconds, 6))
+        self.now += seconds
+
+    def work(self, seconds):
+        self.now += seconds
+
+
+class TestFixedRateScheduler(IsolatedAsyncioTestCase):
+
+    def setUp(self):
+        self.clock = FakeClock(wall=1000.25)
+        for name, fake in (("time", self.clock), ("asyncio", types.SimpleNamespace(sleep=self.clock.sleep))):
+            patcher = patch.object(scheduler, name, fake)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    async def test_aligned_first_tick(self):
+        ticks = FixedRateScheduler(0.5)
+
+        self.assertEqual(await ticks.wait(), 1000_500_000_000)
+        self.assertEqual(self.clock.sleeps, [0.25])
+
+    async def test_no_drift(self):
+        ticks = FixedRateScheduler(1)
+        times = []
+        for _ in range(5):
+            times.append(await ticks.wait())
+            # work of a cycle doesn´t shift the next tick
+            self.clock.work(0.3)
+
+        self.assertEqual(times, [1001_000_000_000 + idx * 1_000_000_000 for idx in range(5)])
+        self.assertEqual(self.clock.sleeps, [0.75, 0.7, 0.7, 0.7, 0.7])
+        self.assertEqual((ticks.ticks, ticks.overruns, ticks.skipped), (5, 0, 0))
+
+    async def test_overrun(self):
+        ticks = FixedRateScheduler(1)
+        first = await ticks.wait()
+        self.clock.work(2.5)
+
+        # ticks 1 and 2 are missed, continues with tick 3
+        self.assertEqual(await ticks.wait(), first + 3_000_000_000)
+        self.assertEqual(self.clock.sleeps[-1], 0.5)
+        self.assertEqual((ticks.ticks, ticks.overruns, ticks.skipped), (2, 1, 2))
+
+        self.clock.work(0.1)
+        self.assertEqual(await ticks.wait(), first + 4_000_000_000)
+        self.assertEqual((ticks.ticks, ticks.overruns, ticks.skipped), (3, 1, 2))
+
+    async def test_overrun_by_one_tick(self):
+        ticks = FixedRateScheduler(1)
+        first = await ticks.wait()
+        self.clock.work(1.2)
+
+        self.assertEqual(await ticks.wait(), first + 2_000_000_000)
+        self.assertEqual((ticks.overruns, ticks.skipped), (1, 1))
@@ -0,0 +1,54 @@
+import datetime
+import json
+import os
+import tempfile
+from unittest import TestCase
+
+from routing import Channel
+from snapshot import SnapshotFile
+
+PRESSURE = Channel("I-1", "Druck", "PRESSURE", None, "absolute", b"")
+LEVEL = Channel("I-2", "Fuellstand", "LEVEL", None, "absolute", b"")
+TICK = 1_685_620_800_000_000_000
+
+
+class TestSnapshotFile(TestCase):
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.snapshot = SnapshotFile(7, path=os.path.join(directory.name, "collector_snapshot.json"))
+
+    def read(self):
+        with open(self.snapshot.path, "r") as fd:
+            return json.load(fd)
+
+    def test_publish(self):
+        self.snapshot.update([{"channel": PRESSURE, "value": 1.5}, {"channel": LEVEL, "value": float("nan")}], TICK)
+
+        self.snapshot.publish(TICK, [TimeoutError("timeout")])
+
+        # values which aren´t valid json are published as null
+        self.assertEqual(self.read(), {"batch_id": "7", "time": 1685620800.0, "messages": ["timeout"],
+                                       "values": [{"sps_port": "I-1", "value": 1.5, "time": 1685620800.0},
+                                                  {"sps_port": "I-2", "value": None, "time": 1685620800.0}]})
+        self.assertFalse(os.path.exists(f"{self.snapshot.path}.tmp"))
+
+    def test_keep_unchanged(self):
+        self.snapshot.update([{"channel": PRESSURE, "value": 1.5}, {"channel": LEVEL, "value": 50}], TICK)
+
+        # a subscription reports only changed values, with their source timestamp
+        self.snapshot.update([{"channel": PRESSURE, "value": 1.7, "time": datetime.datetime(2023, 6, 1, 12, 0, 1)}],
+                             TICK + 2_000_000_000)
+        self.snapshot.publish(TICK + 2_000_000_000)
+
+        self.assertEqual(self.read()['values'], [{"sps_port": "I-1", "value": 1.7, "time": 1685620801.0},
+                                                 {"sps_port": "I-2", "value": 50, "time": 1685620800.0}])
+
+    def test_close(self):
+        self.snapshot.publish(TICK)
+
+        self.snapshot.close()
+        self.snapshot.close()
+
+        self.assertFalse(os.path.exists(self.snapshot.path))